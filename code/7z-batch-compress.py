@@ -1,13 +1,34 @@
 #!/usr/bin/env python3
+import json
 import os
 import subprocess
 import sys
+import time
+import zlib
 
 SEVEN_Z_PATH = r"C:\Program Files\7-Zip\7z.exe"
 
 TARGET_EXTS = {'.iso', '.cso'}
 
-SEVEN_Z_OPTS = ['a', '-t7z', '-mx=9', '-m0=LZMA2', '-mmt=on', '-ms=on']
+SEVEN_Z_BASE_OPTS = ['a', '-t7z', '-mmt=on', '-ms=on']
+
+PROFILE_OPTS = {
+    'store': ['-mx=0'],
+    'fast': ['-mx=1', '-m0=LZMA2'],
+    'max': ['-mx=9', '-m0=LZMA2'],
+}
+
+# Estimated ratio (compressed / original) of the zlib-1 sample pre-pass.
+AUTO_TUNE = True
+MAX_BELOW = 0.85
+FAST_BELOW = 0.97
+INCOMPRESSIBLE_ACTION = 'skip'
+DEFAULT_PROFILE = 'max'
+
+SAMPLE_CHUNKS = 32
+SAMPLE_CHUNK_SIZE = 256 * 1024
+
+TUNE_LOG = '7z-autotune.jsonl'
 
 def find_executable(path):
     if os.path.isfile(path) and os.access(path, os.X_OK):
@@ -28,7 +49,56 @@ def mb(n_bytes):
 def fmt_mb(n_bytes):
     return f"{mb(n_bytes):.2f} MB"
 
-def compress_file(sevenz, src_path, results):
+def sample_ratio(entries):
+    total = sum(size for _, size in entries)
+    if total == 0:
+        return None
+    chunk = min(SAMPLE_CHUNK_SIZE, total)
+    n = max(1, min(SAMPLE_CHUNKS, total // chunk))
+    step = (total - chunk) // n if n > 1 else 0
+
+    raw = comp = 0
+    idx = 0
+    base = 0
+    for i in range(n):
+        pos = i * step
+        while idx < len(entries) and base + entries[idx][1] <= pos:
+            base += entries[idx][1]
+            idx += 1
+        if idx >= len(entries):
+            break
+        path, size = entries[idx]
+        try:
+            with open(path, 'rb') as f:
+                f.seek(pos - base)
+                data = f.read(min(chunk, size - (pos - base)))
+        except OSError:
+            continue
+        if data:
+            raw += len(data)
+            comp += len(zlib.compress(data, 1))
+    return (comp / raw) if raw else None
+
+def pick_profile(est_ratio):
+    if not AUTO_TUNE or est_ratio is None:
+        return DEFAULT_PROFILE
+    if est_ratio < MAX_BELOW:
+        return 'max'
+    if est_ratio < FAST_BELOW:
+        return 'fast'
+    return INCOMPRESSIBLE_ACTION
+
+def fmt_ratio(ratio):
+    return "n/a" if ratio is None else f"{ratio * 100:.2f}%"
+
+def log_tuning(log_path, record):
+    try:
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Failed to write tuning log {log_path}: {e}")
+
+def compress_file(sevenz, src_path, results, log_path):
     src_dir = os.path.dirname(src_path)
     base = os.path.basename(src_path)
     dest_name = base + '.7z' 
@@ -41,14 +111,28 @@ def compress_file(sevenz, src_path, results):
 
     orig_size = sizeof_bytes(src_path)
 
-    cmd = [sevenz] + SEVEN_Z_OPTS + [dest_path, src_path]
+    est_ratio = sample_ratio([(src_path, orig_size)]) if AUTO_TUNE else None
+    profile = pick_profile(est_ratio)
+    record = {'path': src_path, 'profile': profile, 'estimated_ratio': est_ratio,
+              'original_size': orig_size, 'compressed_size': None, 'ratio': None, 'seconds': None}
+    if profile == 'skip':
+        print(f"Skipping (incompressible, est. {fmt_ratio(est_ratio)}): {src_path}")
+        results['failed'].append((src_path, f"incompressible_est_{fmt_ratio(est_ratio)}"))
+        results['tuning'].append(record)
+        log_tuning(log_path, record)
+        return
+    print(f"Profile: {profile} (est. ratio {fmt_ratio(est_ratio)})")
+
+    cmd = [sevenz] + SEVEN_Z_BASE_OPTS + PROFILE_OPTS[profile] + [dest_path, src_path]
     print("Running:", " ".join(f'"{c}"' if ' ' in c else c for c in cmd))
+    started = time.monotonic()
     try:
         proc = subprocess.run(cmd, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     except Exception as e:
         print(f"Error launching 7z for {src_path}: {e}")
         results['failed'].append((src_path, str(e)))
         return
+    record['seconds'] = round(time.monotonic() - started, 3)
 
     if proc.returncode == 0:
         verify_cmd = [sevenz, 'l', dest_path]
@@ -61,8 +145,12 @@ def compress_file(sevenz, src_path, results):
                     ratio = (comp_size / orig_size) if orig_size > 0 else 0
                     ratio_pct = ratio * 100
                     print(f"Compressed and removed: {src_path} -> {dest_path}")
-                    print(f"Original size: {fmt_mb(orig_size)} | Compressed size: {fmt_mb(comp_size)} | Ratio: {ratio_pct:.2f}%")
+                    print(f"Original size: {fmt_mb(orig_size)} | Compressed size: {fmt_mb(comp_size)} | Ratio: {ratio_pct:.2f}% | Time: {record['seconds']:.1f}s")
                     results['succeeded'].append((src_path, orig_size, comp_size))
+                    record['compressed_size'] = comp_size
+                    record['ratio'] = round(ratio, 4)
+                    results['tuning'].append(record)
+                    log_tuning(log_path, record)
                 except OSError as e:
                     print(f"Archive created but failed to remove original {src_path}: {e}")
                     comp_size = sizeof_bytes(dest_path)
@@ -95,6 +183,22 @@ def print_summary(results):
     print(f"Total compressed size (succeeded files): {fmt_mb(total_comp)}")
     print(f"Average compression ratio (weighted, succeeded files): {avg_ratio_pct:.2f}%")
 
+    tuning = results['tuning']
+    if tuning:
+        print("\nBy profile (estimated -> achieved ratio, time):")
+        for profile in ('max', 'fast', 'store', 'skip'):
+            recs = [r for r in tuning if r['profile'] == profile]
+            if not recs:
+                continue
+            done = [r for r in recs if r['ratio'] is not None]
+            est = [r['estimated_ratio'] for r in recs if r['estimated_ratio'] is not None]
+            avg_est = (sum(est) / len(est)) if est else None
+            orig = sum(r['original_size'] for r in done)
+            comp = sum(r['compressed_size'] for r in done)
+            secs = sum(r['seconds'] for r in done)
+            achieved = (comp / orig) if orig > 0 else None
+            print(f"- {profile}: {len(recs)} | est. {fmt_ratio(avg_est)} -> {fmt_ratio(achieved)} | {secs:.1f}s")
+
     if fail:
         print("\nFailed / Skipped files (reason):")
         for fpath, reason in fail:
@@ -108,16 +212,18 @@ def main():
 
     results = {
         'succeeded': [], 
-        'failed': []  
+        'failed': [],
+        'tuning': []
     }
 
     start_dir = os.path.abspath('.')
+    log_path = os.path.join(start_dir, TUNE_LOG)
     for root, dirs, files in os.walk(start_dir):
         for fname in files:
             _, ext = os.path.splitext(fname)
             if ext.lower() in TARGET_EXTS:
                 src = os.path.join(root, fname)
-                compress_file(sevenz, src, results)
+                compress_file(sevenz, src, results, log_path)
 
     print_summary(results)
 
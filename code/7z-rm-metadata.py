@@ -2,18 +2,38 @@
 normalize_archives.py
 
 Usage:
-  python normalize_archives.py [--path PATH] [--dry-run]
+  python normalize_archives.py [--path PATH] [--dry-run] [--workers N] [--recompress]
 
 - --path PATH : directory to scan for .zip and .7z (default: current dir)
 - --dry-run : show actions without replacing archives
+- --workers N : number of archives processed in parallel (default: 4)
+- --recompress : also send .zip through the 7z extract/recompress round trip
+- --force : ignore the manifest and normalize every archive again
+
+.zip archives are normalized in place by rewriting only the timestamp fields of
+the local and central directory headers; entry data is never decompressed.
+.7z archives (and zips the fast path cannot parse) are extracted and recompressed
+from a sorted file list with fixed timestamps and attributes.
+
+Each normalized archive is recorded in .rm-metadata.json under the scanned
+directory with a digest of its entry listing (names, sizes, CRCs, times and
+attributes). Later runs skip archives whose size and mtime match the manifest,
+or whose listing digest still matches, without extracting anything.
 """
 
 import argparse
+import hashlib
+import json
 import os
 import shutil
+import stat
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -27,6 +47,18 @@ except Exception:
 
 DEFAULT_TIMESTAMP = datetime(1970, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
 
+ZIP_LOCAL_SIG = b"PK\x03\x04"
+ZIP_CENTRAL_SIG = b"PK\x01\x02"
+ZIP_EXTRA_NTFS = 0x000A
+ZIP_EXTRA_UNIX_TIME = 0x5455
+ZIP_EXTRA_UNIX_OLD = 0x5855
+FILETIME_UNIX_EPOCH = 116444736000000000
+ZIP_UNIX_SYSTEM = 3
+DOS_ATTR_DIRECTORY = 0x10
+DOS_ATTR_ARCHIVE = 0x20
+
+MANIFEST_NAME = ".rm-metadata.json"
+
 def find_7z_exe():
     candidates = [
         Path(r"C:\Program Files\7-Zip\7z.exe"),
@@ -65,19 +97,221 @@ def set_file_times(path: Path, ts: datetime):
         finally:
             fh.Close()
 
+def set_file_attributes(path: Path):
+    if path.is_symlink():
+        return
+    if path.is_dir():
+        os.chmod(path, 0o755)
+    else:
+        executable = os.stat(path).st_mode & 0o111
+        os.chmod(path, 0o755 if executable else 0o644)
+    if WIN32_AVAILABLE and os.name == "nt":
+        attrs = win32con.FILE_ATTRIBUTE_DIRECTORY if path.is_dir() else win32con.FILE_ATTRIBUTE_NORMAL
+        win32file.SetFileAttributes(str(path), attrs)
+
 def normalize_directory_timestamps(root: Path, timestamp: datetime):
     for p in root.rglob("*"):
         if p.is_file():
+            set_file_attributes(p)
             set_file_times(p, timestamp)
         elif p.is_dir():
+            set_file_attributes(p)
             set_file_times(p, timestamp)
 
-def process_archive(archive_path: Path, sevenz_exe: str, dry_run=False):
+def sorted_file_list(root: Path):
+    return sorted(p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file() or p.is_symlink())
+
+def dos_datetime(ts: datetime):
+    if ts.year < 1980:
+        return 0, (1 << 5) | 1
+    dos_time = (ts.hour << 11) | (ts.minute << 5) | (ts.second // 2)
+    dos_date = ((ts.year - 1980) << 9) | (ts.month << 5) | ts.day
+    return dos_time, dos_date
+
+def patch_zip_extra(buf: bytearray, start: int, end: int, ts: datetime):
+    unix_time = int(ts.timestamp()) & 0xFFFFFFFF
+    filetime = FILETIME_UNIX_EPOCH + int(ts.timestamp()) * 10_000_000
+    p = start
+    while p + 4 <= end:
+        header_id, size = struct.unpack_from("<HH", buf, p)
+        body = p + 4
+        if body + size > end:
+            break
+        if header_id == ZIP_EXTRA_UNIX_TIME:
+            for q in range(body + 1, body + size - 3, 4):
+                struct.pack_into("<I", buf, q, unix_time)
+        elif header_id == ZIP_EXTRA_UNIX_OLD and size >= 8:
+            struct.pack_into("<II", buf, body, unix_time, unix_time)
+        elif header_id == ZIP_EXTRA_NTFS:
+            q = body + 4
+            while q + 4 <= body + size:
+                tag, tag_size = struct.unpack_from("<HH", buf, q)
+                if tag == 1 and tag_size >= 24 and q + 4 + tag_size <= body + size:
+                    struct.pack_into("<QQQ", buf, q + 4, filetime, filetime, filetime)
+                q += 4 + tag_size
+        p = body + size
+
+def normalized_external_attr(create_system: int, name: bytes, external_attr: int):
+    is_dir = name.endswith(b"/")
+    dos_attr = DOS_ATTR_DIRECTORY if is_dir else DOS_ATTR_ARCHIVE
+    if create_system != ZIP_UNIX_SYSTEM:
+        return dos_attr
+    mode = external_attr >> 16
+    file_type = stat.S_IFMT(mode) or (stat.S_IFDIR if is_dir else stat.S_IFREG)
+    perms = 0o755 if is_dir or mode & 0o111 else 0o644
+    return ((file_type | perms) << 16) | dos_attr
+
+def zip_header_patches(archive_path: Path, ts: datetime):
+    dos_time, dos_date = dos_datetime(ts)
+    patches = []
+    with zipfile.ZipFile(archive_path) as zf:
+        infos = zf.infolist()
+        cd_offset = zf.start_dir
+
+    with open(archive_path, "rb") as f:
+        f.seek(cd_offset)
+        original_cd = []
+        records = []
+        for _ in infos:
+            pos = f.tell()
+            fixed = f.read(46)
+            if len(fixed) != 46 or fixed[:4] != ZIP_CENTRAL_SIG:
+                raise zipfile.BadZipFile(f"bad central directory entry at offset {pos}")
+            name_len, extra_len, comment_len = struct.unpack_from("<HHH", fixed, 28)
+            original = fixed + f.read(name_len + extra_len + comment_len)
+            original_cd.append(original)
+            rec = bytearray(original)
+            name = bytes(rec[46:46 + name_len])
+            external_attr = struct.unpack_from("<I", rec, 38)[0]
+            struct.pack_into("<HH", rec, 12, dos_time, dos_date)
+            struct.pack_into("<I", rec, 38, normalized_external_attr(rec[5], name, external_attr))
+            patch_zip_extra(rec, 46 + name_len, 46 + name_len + extra_len, ts)
+            records.append((name, bytes(rec)))
+        # Central directory records are self-contained, so sorting them only
+        # reorders the listing; local headers and data stay where they are.
+        new_cd = b"".join(rec for _, rec in sorted(records, key=lambda r: r[0]))
+        if new_cd != b"".join(original_cd):
+            patches.append((cd_offset, new_cd))
+
+        for info in infos:
+            f.seek(info.header_offset)
+            fixed = f.read(30)
+            if len(fixed) != 30 or fixed[:4] != ZIP_LOCAL_SIG:
+                raise zipfile.BadZipFile(f"bad local header for {info.filename}")
+            name_len, extra_len = struct.unpack_from("<HH", fixed, 26)
+            original = fixed + f.read(name_len + extra_len)
+            rec = bytearray(original)
+            struct.pack_into("<HH", rec, 10, dos_time, dos_date)
+            patch_zip_extra(rec, 30 + name_len, 30 + name_len + extra_len, ts)
+            if rec != original:
+                patches.append((info.header_offset, bytes(rec)))
+    return patches
+
+def normalize_zip_in_place(archive_path: Path, dry_run=False):
+    patches = zip_header_patches(archive_path, DEFAULT_TIMESTAMP)
+    if not patches:
+        print(f"Already normalized: {archive_path}")
+        return
+    if dry_run:
+        print(f"[dry-run] would rewrite {len(patches)} header(s) in {archive_path}")
+        return
+    with open(archive_path, "r+b") as f:
+        for offset, data in patches:
+            f.seek(offset)
+            f.write(data)
+    print(f"Rewrote {len(patches)} header(s) in {archive_path}")
+
+def list_7z_entries(archive_path: Path, sevenz_exe: str):
+    out = run([sevenz_exe, "l", "-slt", "-sccUTF-8", str(archive_path)])
+    entries = []
+    current = None
+    # Entry blocks follow the "----------" separator after the archive header.
+    _, _, body = out.partition("\n----------\n")
+    for line in body.splitlines():
+        if line.startswith("Path = "):
+            current = {"Path": line[len("Path = "):]}
+            entries.append(current)
+        elif current is not None and " = " in line:
+            key, _, value = line.partition(" = ")
+            current[key] = value
+    return [(e["Path"], e.get("Size", ""), e.get("CRC", ""), e.get("Modified", ""), e.get("Attributes", ""))
+            for e in entries]
+
+def archive_digest(archive_path: Path, sevenz_exe: str):
+    if archive_path.suffix.lower() == ".zip":
+        try:
+            with zipfile.ZipFile(archive_path) as zf:
+                entries = [(i.filename, i.file_size, i.CRC, list(i.date_time), i.external_attr)
+                           for i in zf.infolist()]
+        except zipfile.BadZipFile:
+            entries = list_7z_entries(archive_path, sevenz_exe)
+    else:
+        entries = list_7z_entries(archive_path, sevenz_exe)
+    # Order is part of a deterministic archive, so the listing is hashed as-is.
+    payload = json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class Manifest:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {path}: {e}")
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, archive_path: Path, digest: str):
+        st = archive_path.stat()
+        with self.lock:
+            self.entries[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "digest": digest}
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.entries, ensure_ascii=False, indent=2, sort_keys=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(data, encoding="utf-8")
+        tmp.replace(self.path)
+
+def is_already_normalized(archive_path: Path, sevenz_exe: str, manifest: Manifest, key: str):
+    rec = manifest.get(key)
+    if rec is None:
+        return False
+    st = archive_path.stat()
+    if rec["size"] == st.st_size and rec["mtime_ns"] == st.st_mtime_ns:
+        return True
+    if rec["size"] == st.st_size:
+        digest = archive_digest(archive_path, sevenz_exe)
+        if digest == rec["digest"]:
+            manifest.put(key, archive_path, digest)
+            return True
+    return False
+
+def process_archive(archive_path: Path, sevenz_exe: str, dry_run=False, recompress=False,
+                    manifest=None, key=None, force=False):
     ext = archive_path.suffix.lower()
     if ext not in (".zip", ".7z"):
         return
 
+    if manifest is not None and not force and is_already_normalized(archive_path, sevenz_exe, manifest, key):
+        print(f"Skipping (already normalized): {archive_path}")
+        return
+
     print(f"Processing: {archive_path}")
+    if ext == ".zip" and not recompress:
+        try:
+            normalize_zip_in_place(archive_path, dry_run=dry_run)
+            if manifest is not None and not dry_run:
+                manifest.put(key, archive_path, archive_digest(archive_path, sevenz_exe))
+            return
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError) as e:
+            print(f"Zip fast path unavailable for {archive_path} ({e}); falling back to 7z")
+
     with tempfile.TemporaryDirectory() as tmpd:
         tmpd_path = Path(tmpd)
         cmd_extract = [sevenz_exe, "x", str(archive_path), f"-o{str(tmpd_path)}", "-y"]
@@ -85,12 +319,18 @@ def process_archive(archive_path: Path, sevenz_exe: str, dry_run=False):
         normalize_directory_timestamps(tmpd_path, DEFAULT_TIMESTAMP)
 
         temp_archive = archive_path.with_suffix(archive_path.suffix + ".tmp")
+        list_file = Path(tmpd + ".lst")
+        list_file.write_text("\n".join(sorted_file_list(tmpd_path)) + "\n", encoding="utf-8")
         if ext == ".zip":
-            cmd_add = [sevenz_exe, "a", "-tzip", f"-mx=9", str(temp_archive), str(tmpd_path) + os.sep + "*"]
+            cmd_add = [sevenz_exe, "a", "-tzip", f"-mx=9", str(temp_archive.resolve()), f"@{list_file}", "-scsUTF-8"]
         else:  # .7z
-            cmd_add = [sevenz_exe, "a", "-t7z", f"-mx=9", str(temp_archive), str(tmpd_path) + os.sep + "*"]
+            cmd_add = [sevenz_exe, "a", "-t7z", f"-mx=9", "-mqs=off", "-mtc=off", "-mta=off",
+                       str(temp_archive.resolve()), f"@{list_file}", "-scsUTF-8"]
 
-        run(cmd_add)
+        try:
+            run(cmd_add, cwd=tmpd)
+        finally:
+            list_file.unlink(missing_ok=True)
 
         if dry_run:
             print(f"[dry-run] would replace {archive_path} with {temp_archive}")
@@ -108,11 +348,16 @@ def process_archive(archive_path: Path, sevenz_exe: str, dry_run=False):
                     if backup.exists():
                         backup.replace(archive_path)
                 raise
+            if manifest is not None:
+                manifest.put(key, archive_path, archive_digest(archive_path, sevenz_exe))
 
 def main():
     parser = argparse.ArgumentParser(description="Normalize timestamps inside .zip and .7z archives and recompress with max compression.")
     parser.add_argument("--path", "-p", default=".", help="Directory path to scan")
     parser.add_argument("--dry-run", action="store_true", help="Show actions but do not replace archives")
+    parser.add_argument("--workers", "-j", type=int, default=4, help="Number of archives to process in parallel")
+    parser.add_argument("--recompress", action="store_true", help="Recompress .zip with 7z instead of patching headers in place")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and normalize every archive again")
     args = parser.parse_args()
 
     base = Path(args.path).resolve()
@@ -123,12 +368,24 @@ def main():
     sevenz = find_7z_exe()
     print("Using 7z executable:", sevenz)
 
-    for p in base.rglob("*"):
-        if p.suffix.lower() in (".zip", ".7z"):
-            try:
-                process_archive(p, sevenz, dry_run=args.dry_run)
-            except Exception as e:
-                print(f"Failed processing {p}: {e}")
+    manifest = Manifest(base / MANIFEST_NAME)
+
+    archives = [p for p in base.rglob("*") if p.is_file() and p.suffix.lower() in (".zip", ".7z")]
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+            futs = {}
+            for p in archives:
+                key = p.relative_to(base).as_posix()
+                fut = ex.submit(process_archive, p, sevenz, args.dry_run, args.recompress, manifest, key, args.force)
+                futs[fut] = p
+            for fut in as_completed(futs):
+                try:
+                    fut.result()
+                except Exception as e:
+                    print(f"Failed processing {futs[fut]}: {e}")
+    finally:
+        if not args.dry_run:
+            manifest.save()
 
 if __name__ == "__main__":
     main()
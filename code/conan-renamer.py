@@ -5,6 +5,8 @@ import sys
 import urllib.request
 from datetime import datetime
 
+import filename_sanitize
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 URL = "https://cloud.sbsub.com/data/data.json"
@@ -75,25 +77,6 @@ def format_date_to_6digits(date_str):
         return digits[:6]
     return digits.zfill(6)
     
-def sanitize_chars(s: str, replacement: str = "") -> str:
-
-    if not isinstance(s, str):
-        raise TypeError("s must be a str")
-
-    forbidden = set('<>:"/\\|?*\x00')
-    out_chars = []
-    for ch in s:
-        if ord(ch) <= 0x1F:
-            rep = replacement
-        elif ch in forbidden:
-            rep = replacement
-        else:
-            rep = ch
-        if rep:
-            out_chars.append(rep)
-    return "".join(out_chars)
-    
-
 conflicts = []
 
 for entry in os.listdir(DIR):
@@ -192,7 +175,7 @@ for entry in os.listdir(DIR):
     new_brackets = [sanitize(x) for x in new_brackets if x not in (None, '', 'None')]
     new_name_no_ext = "".join(f"[{b}]" for b in new_brackets) + rest
     new_filename = new_name_no_ext + ext
-    new_filename = sanitize_chars(new_filename, "")
+    new_filename = filename_sanitize.windows(new_filename, "")
     new_path = os.path.join(DIR, new_filename)
 
     if os.path.exists(new_path):
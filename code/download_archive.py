@@ -0,0 +1,181 @@
+"""
+download_archive.py
+
+Shared yt-dlp download archive backed by SQLite.
+
+yt-dlp's --download-archive file is a text file of "<extractor> <id>" lines
+that is re-read on every launch and appended to by whichever process finishes
+a video. This module keeps the same records in one indexed table, keyed by
+(extractor, video_id, channel), so membership checks across all channels are
+a primary-key lookup while each channel can still export its own archive:
+
+  archive = ArchiveIndex()
+  "dQw4w9WgXcQ" in archive            # O(1) membership check
+  archive.import_text("chan/archive.txt", channel="chan")
+  archive.export_text("job-archive.txt", channel="chan")
+
+Connections use WAL and a busy timeout, so several yt-dlp.py runs can share
+one database. Location: $YT_DLP_ARCHIVE_DB, or ~/.yt-dlp-archive.sqlite.
+
+Usage:
+  python download_archive.py import FILE [--channel NAME]
+  python download_archive.py export FILE [--channel NAME]
+  python download_archive.py has ID [ID ...]
+  python download_archive.py stats
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_DB_PATH = Path.home() / ".yt-dlp-archive.sqlite"
+DEFAULT_EXTRACTOR = "youtube"
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    extractor TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    channel TEXT NOT NULL DEFAULT '',
+    added REAL NOT NULL,
+    PRIMARY KEY (extractor, video_id, channel)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS archive_channel ON archive (channel);
+"""
+
+def default_db_path():
+    return os.environ.get("YT_DLP_ARCHIVE_DB") or str(DEFAULT_DB_PATH)
+
+def parse_line(line):
+    """Split a yt-dlp archive line into (extractor, video_id), or None."""
+    parts = line.split()
+    if len(parts) != 2:
+        return None
+    return parts[0].lower(), parts[1]
+
+class ArchiveIndex:
+    def __init__(self, db_path=None):
+        self.db_path = str(db_path or default_db_path())
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __contains__(self, video_id):
+        return self.contains(video_id)
+
+    def contains(self, video_id, extractor=DEFAULT_EXTRACTOR):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM archive WHERE extractor = ? AND video_id = ? LIMIT 1", (extractor, video_id)
+            ).fetchone()
+        return row is not None
+
+    def known(self, video_ids, extractor=DEFAULT_EXTRACTOR):
+        """Return the subset of video_ids already in the archive."""
+        found = set()
+        ids = list(video_ids)
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(r[0] for r in self.conn.execute(
+                    f"SELECT DISTINCT video_id FROM archive WHERE extractor = ? AND video_id IN ({marks})",
+                    [extractor] + chunk))
+        return found
+
+    def channel_of(self, video_id, extractor=DEFAULT_EXTRACTOR):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT channel FROM archive WHERE extractor = ? AND video_id = ? ORDER BY added LIMIT 1",
+                (extractor, video_id)
+            ).fetchone()
+        return (row[0] or None) if row else None
+
+    def add_many(self, records, channel=None):
+        """Insert (extractor, video_id) pairs; returns how many were new."""
+        now = time.time()
+        rows = [(e, v, channel or "", now) for e, v in records]
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO archive (extractor, video_id, channel, added) VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+            return self.conn.total_changes - before
+
+    def add(self, video_id, extractor=DEFAULT_EXTRACTOR, channel=None):
+        return self.add_many([(extractor, video_id)], channel) == 1
+
+    def records(self, channel=None):
+        with self.lock:
+            if channel is None:
+                rows = self.conn.execute(
+                    "SELECT extractor, video_id FROM archive GROUP BY extractor, video_id ORDER BY MIN(added), video_id"
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT extractor, video_id FROM archive WHERE channel = ? ORDER BY added, video_id",
+                    (channel,)).fetchall()
+        return rows
+
+    def import_text(self, path, channel=None):
+        """Load a yt-dlp archive file; returns how many IDs were new."""
+        if not os.path.isfile(path):
+            return 0
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            records = [r for r in map(parse_line, f) if r]
+        return self.add_many(records, channel)
+
+    def export_text(self, path, channel=None):
+        """Write the archive (or one channel of it) in yt-dlp's text format; returns the line count."""
+        rows = self.records(channel)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(f"{e} {v}\n" for e, v in rows)
+        os.replace(tmp, path)
+        return len(rows)
+
+    def stats(self):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT channel, COUNT(*) FROM archive GROUP BY channel ORDER BY 2 DESC").fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared SQLite index of yt-dlp download archives.")
+    parser.add_argument("--db", default=None, help="Database path (default: $YT_DLP_ARCHIVE_DB or ~/.yt-dlp-archive.sqlite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("import", "export"):
+        p = sub.add_parser(name, help=f"{name.capitalize()} a yt-dlp archive.txt")
+        p.add_argument("file")
+        p.add_argument("--channel", default=None)
+    p = sub.add_parser("has", help="Check whether video IDs are archived")
+    p.add_argument("ids", nargs="+")
+    sub.add_parser("stats", help="IDs per channel")
+    args = parser.parse_args()
+
+    archive = ArchiveIndex(args.db)
+    if args.command == "import":
+        print(f"{archive.import_text(args.file, args.channel)} new ID(s) imported")
+    elif args.command == "export":
+        print(f"{archive.export_text(args.file, args.channel)} line(s) written to {args.file}")
+    elif args.command == "has":
+        known = archive.known(args.ids)
+        for vid in args.ids:
+            print(f"{vid} {'yes' if vid in known else 'no'}")
+        sys.exit(0 if len(known) == len(set(args.ids)) else 1)
+    elif args.command == "stats":
+        for channel, count in archive.stats():
+            print(f"{count:>8}  {channel or '(none)'}")
+
+if __name__ == "__main__":
+    main()
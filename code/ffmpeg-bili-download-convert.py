@@ -1,9 +1,22 @@
+import argparse
 import os
-import re
 import json
 import shutil
 import sys
 import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import filename_sanitize
+import media_probe
+
+JOURNAL_NAME = ".bili-merge-journal.jsonl"
+PART_SUFFIX = ".part.mp4"
+STDERR_TAIL = 20
+# The merged file may be at most this many seconds shorter than its longest input.
+DURATION_TOLERANCE = 1.0
 
 def get_ffmpeg_path():
     ext = ".exe" if os.name == "nt" else ""
@@ -12,11 +25,6 @@ def get_ffmpeg_path():
         return local_path
     return "ffmpeg"
 
-def sanitize_name(text):
-    if not text:
-        return ""
-    return re.sub(r'[<>:"/\\|?*]', ' ', str(text)).strip()
-
 def get_unique_path(path):
     if not os.path.exists(path):
         return path
@@ -26,45 +34,121 @@ def get_unique_path(path):
         counter += 1
     return f"{base}({counter}){ext}"
 
+class Journal:
+    """
+    Append-only JSONL log of episode states, kept inside the series folder; the
+    last record for an episode wins. Episodes and outputs are stored relative
+    to the folder, so the log stays valid after the folder is renamed.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, JOURNAL_NAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        self.entries[rec["episode"]] = rec
+                    except (ValueError, KeyError):
+                        continue
+
+    def merged_output(self, episode_dir):
+        """Output path of an episode merged by an earlier run whose cleanup did not finish, or None."""
+        with self.lock:
+            rec = self.entries.get(os.path.basename(episode_dir))
+        if rec and rec["state"] == "merged":
+            output = os.path.join(self.root, rec["output"])
+            if os.path.isfile(output):
+                return output
+        return None
+
+    def all_done(self):
+        with self.lock:
+            return all(rec["state"] == "done" for rec in self.entries.values())
+
+    def record(self, episode_dir, state, output=None, **fields):
+        rec = {"episode": os.path.basename(episode_dir), "state": state, "time": time.time(), **fields}
+        if output is not None:
+            rec["output"] = os.path.relpath(output, self.root)
+        episode = rec["episode"]
+        with self.lock:
+            self.entries[episode] = rec
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+def run_ffmpeg(command):
+    tail = deque(maxlen=STDERR_TAIL)
+    try:
+        proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, errors="replace")
+        for line in proc.stderr:
+            tail.append(line.rstrip())
+        return proc.wait(), "\n".join(tail)
+    except OSError as e:
+        return -1, str(e)
+
+def validate_output(output_path, video_path, audio_path):
+    if not os.path.isfile(output_path) or os.path.getsize(output_path) == 0:
+        return "output missing or empty"
+    # The .part output and the .m4s inputs are gone after this run; keep them out of the probe cache.
+    out = media_probe.duration(media_probe.probe(output_path, cache=False))
+    if not out:
+        return "output has no duration"
+    expected = max(media_probe.duration(media_probe.probe(p, cache=False)) for p in (video_path, audio_path))
+    if expected and out + DURATION_TOLERANCE < expected:
+        return f"output is {out:.1f}s, inputs are {expected:.1f}s"
+    return None
+
 def merge_media(ffmpeg_cmd, video_path, audio_path, output_path):
-    output_path = get_unique_path(output_path)
+    """Merge into a temporary file and move it to output_path only once it validates."""
+    tmp_path = os.path.splitext(output_path)[0] + PART_SUFFIX
     command = [
         ffmpeg_cmd, "-y",
+        "-hide_banner", "-loglevel", "error",
         "-i", video_path,
         "-i", audio_path,
         "-c:v", "copy",
         "-c:a", "copy",
-        output_path
+        "-f", "mp4",
+        tmp_path
     ]
-    try:
-        subprocess.run(command, shell=True)
-        return output_path
-    except (subprocess.CalledProcessError, OSError):
-        if os.path.exists(output_path):
+    returncode, stderr = run_ffmpeg(command)
+    error = (stderr or f"ffmpeg exit {returncode}") if returncode != 0 else validate_output(tmp_path, video_path, audio_path)
+    if error:
+        if os.path.exists(tmp_path):
             try:
-                os.remove(output_path)
+                os.remove(tmp_path)
             except OSError:
                 pass
-        return None
+        raise RuntimeError(error)
+    os.replace(tmp_path, output_path)
+    return output_path
 
-def process_directory(root_dir, ffmpeg_cmd):
+def plan_directory(root_dir):
+    """Return (main_title, jobs) for one series folder; jobs are (episode_dir, video, audio, output)."""
     if not os.path.isdir(root_dir):
-        return None
-    
+        return None, []
+
     main_title = None
-    
+    jobs = []
+
     try:
         subdirectories = sorted([d for d in os.listdir(root_dir) if os.path.isdir(os.path.join(root_dir, d))])
     except OSError:
-        return None
+        return None, []
 
     for sub in subdirectories:
         episode_dir = os.path.join(root_dir, sub)
         entry_file = os.path.join(episode_dir, "entry.json")
-        
+
         if not os.path.isfile(entry_file):
             continue
-            
+
         try:
             with open(entry_file, "r", encoding="utf-8") as f:
                 data = json.load(f)
@@ -72,44 +156,98 @@ def process_directory(root_dir, ffmpeg_cmd):
             continue
 
         if main_title is None:
-            main_title = sanitize_name(data.get("title", ""))
-            
-        type_tag = sanitize_name(data.get("type_tag", ""))
-        
+            main_title = filename_sanitize.spaces(data.get("title", ""))
+
+        type_tag = filename_sanitize.spaces(data.get("type_tag", ""))
+
         strid = ""
         subtitle = ""
-        
+
         if "ep" in data and data["ep"] is not None:
-            strid = sanitize_name(data["ep"].get("index", ""))
-            subtitle = sanitize_name(data["ep"].get("index_title", ""))
+            strid = filename_sanitize.spaces(data["ep"].get("index", ""))
+            subtitle = filename_sanitize.spaces(data["ep"].get("index_title", ""))
         elif "page_data" in data and data["page_data"] is not None:
-            strid = sanitize_name(data["page_data"].get("page", ""))
-            subtitle = sanitize_name(data["page_data"].get("part", ""))
-            
+            strid = filename_sanitize.spaces(data["page_data"].get("page", ""))
+            subtitle = filename_sanitize.spaces(data["page_data"].get("part", ""))
+
         out_filename = f"{strid}_{subtitle}.mp4" if strid else f"{main_title}.mp4"
         out_filepath = os.path.join(root_dir, out_filename)
-        
+
         video_file = os.path.join(episode_dir, type_tag, "video.m4s")
         audio_file = os.path.join(episode_dir, type_tag, "audio.m4s")
-        
+
         if os.path.isfile(video_file) and os.path.isfile(audio_file):
-            success_path = merge_media(ffmpeg_cmd, video_file, audio_file, out_filepath)
-            if success_path:
-                try:
-                    shutil.rmtree(episode_dir)
-                except OSError:
-                    pass
+            jobs.append((episode_dir, video_file, audio_file, out_filepath))
 
-    return main_title
+    return main_title, jobs
 
-def main():
+def process_episode(ffmpeg_cmd, journal, episode_dir, video_file, audio_file, out_filepath):
+    # Interrupted between merge and cleanup last time?
+    output = journal.merged_output(episode_dir)
+    if output is None:
+        output = merge_media(ffmpeg_cmd, video_file, audio_file, out_filepath)
+        journal.record(episode_dir, "merged", output=output)
     try:
-        os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    except OSError:
-        pass
+        shutil.rmtree(episode_dir)
+    except OSError as e:
+        # The merge is safe in the journal; the cleanup is retried on the next run.
+        print(f"Could not remove {episode_dir}: {e}")
+        return output
+    journal.record(episode_dir, "done", output=output)
+    return output
+
+def reserve_output(out_filepath, reserved, journal, episode_dir):
+    merged = journal.merged_output(episode_dir)
+    if merged is not None:
+        return merged
+    path = out_filepath
+    base, ext = os.path.splitext(out_filepath)
+    counter = 1
+    while os.path.exists(path) or path in reserved:
+        path = f"{base}({counter}){ext}"
+        counter += 1
+    reserved.add(path)
+    return path
+
+def run_jobs(ffmpeg_cmd, jobs, workers):
+    """jobs are (journal, episode_dir, video, audio, output), one journal per series folder."""
+    reserved = set()
+    planned = [(j, ep, v, a, reserve_output(out, reserved, j, ep)) for j, ep, v, a, out in jobs]
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = {ex.submit(process_episode, ffmpeg_cmd, *job): job for job in planned}
+        for fut in as_completed(futs):
+            journal, episode_dir = futs[fut][:2]
+            try:
+                output = fut.result()
+                print(f"OK     {episode_dir} -> {output}")
+                results[episode_dir] = output
+            except Exception as e:
+                journal.record(episode_dir, "failed", error=str(e))
+                print(f"FAILED {episode_dir}: {e}")
+                results[episode_dir] = None
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge Bilibili cache episodes (video.m4s + audio.m4s) into mp4.")
+    parser.add_argument("--path", default=None, help="Folder holding the series folders (default: script folder)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parallel ffmpeg merges")
+    args = parser.parse_args()
+
+    if args.path:
+        try:
+            os.chdir(args.path)
+        except OSError as e:
+            print(f"Error: cannot use --path {args.path}: {e}")
+            sys.exit(1)
+    else:
+        try:
+            os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        except OSError:
+            pass
 
     ffmpeg_bin = get_ffmpeg_path()
-    
+
     try:
         subprocess.run([ffmpeg_bin, "-version"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except (subprocess.CalledProcessError, OSError):
@@ -118,20 +256,42 @@ def main():
 
     base_path = "."
     try:
-        root_items = os.listdir(base_path)
+        root_items = sorted(os.listdir(base_path))
     except OSError:
         return
 
+    series = []
+    jobs = []
     for item in root_items:
         item_full_path = os.path.join(base_path, item)
         if os.path.isdir(item_full_path):
-            resolved_title = process_directory(item_full_path, ffmpeg_bin)
-            if resolved_title and resolved_title != item:
-                new_folder_path = get_unique_path(os.path.join(base_path, resolved_title))
-                try:
-                    os.rename(item_full_path, new_folder_path)
-                except OSError:
-                    pass
+            resolved_title, series_jobs = plan_directory(item_full_path)
+            journal = Journal(item_full_path)
+            series.append((item, item_full_path, resolved_title, journal))
+            jobs.extend((journal,) + job for job in series_jobs)
+
+    print(f"{len(jobs)} episode(s) in {len(series)} folder(s)")
+    started = time.monotonic()
+    results = run_jobs(ffmpeg_bin, jobs, args.workers)
+    failed = sum(1 for r in results.values() if r is None)
+
+    for item, item_full_path, resolved_title, journal in series:
+        if journal.entries and journal.all_done():
+            try:
+                os.remove(journal.path)
+            except OSError:
+                pass
+        if resolved_title and resolved_title != item:
+            new_folder_path = get_unique_path(os.path.join(base_path, resolved_title))
+            try:
+                os.rename(item_full_path, new_folder_path)
+            except OSError:
+                pass
+
+    print(f"\nMerged {len(results) - failed} episode(s), {failed} failed in {time.monotonic() - started:.1f}s")
+    if failed:
+        print(f"Failed episodes were kept; see {JOURNAL_NAME} in their series folder and rerun to retry.")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
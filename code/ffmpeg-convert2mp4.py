@@ -1,37 +1,149 @@
+#!/usr/bin/env python3
+"""
+ffmpeg-convert2mp4.py
+
+Usage:
+  python ffmpeg-convert2mp4.py [DIR] [--ext webm mkv] [--workers N] [--recursive] [--force]
+
+Remuxes (stream copy, no re-encode) every matching file to .mp4 next to it.
+Jobs run in parallel; each one writes to a temporary .part file that is only
+renamed over the final name once ffmpeg succeeds. An existing .mp4 is skipped
+when its duration matches the source, and redone when it looks truncated.
+"""
+
+import argparse
 import os
 import subprocess
-import glob
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import media_probe
+
+FFMPEG = 'ffmpeg'
+DEFAULT_EXTS = ['webm', 'mkv']
+DEFAULT_WORKERS = 4
+PART_SUFFIX = '.part'
+STDERR_TAIL = 20
+# An output counts as finished if it is at most this much shorter than the source.
+DURATION_TOLERANCE = 1.0
+
+def collect_files(root, exts, recursive):
+    exts = {'.' + e.lower().lstrip('.') for e in exts}
+    found = []
+    if recursive:
+        for dirpath, _, filenames in os.walk(root):
+            found.extend(os.path.join(dirpath, n) for n in filenames)
+    else:
+        found = [os.path.join(root, n) for n in os.listdir(root)]
+    return sorted(p for p in found if os.path.isfile(p) and os.path.splitext(p)[1].lower() in exts)
 
-def convert_webm_to_mp4(input_path, output_path):
+def output_state(input_path, output_path):
+    """Return 'missing', 'done' or 'partial' for an existing output."""
+    if not os.path.exists(output_path):
+        return 'missing'
+    if os.path.getsize(output_path) == 0:
+        return 'partial'
+    src = media_probe.duration(media_probe.probe(input_path))
+    out = media_probe.duration(media_probe.probe(output_path))
+    if src and (not out or out + DURATION_TOLERANCE < src):
+        return 'partial'
+    return 'done'
 
+def convert_to_mp4(input_path, output_path):
+    tmp_path = output_path + PART_SUFFIX
     command = [
-        'ffmpeg',
+        FFMPEG,
+        '-hide_banner', '-nostdin',
+        '-loglevel', 'error',
+        '-y',
         '-i', input_path,
-        '-c:v', 'copy', 
-        '-c:a', 'copy',  
-        output_path
+        # Video (not cover art) and audio only: subtitles, fonts and thumbnails
+        # attached to mkv/webm inputs are not all valid in MP4 and would fail the remux.
+        '-map', '0:V?', '-map', '0:a?',
+        '-c', 'copy',
+        '-f', 'mp4',
+        tmp_path
     ]
-    
-    print(f"Converting {input_path} to {output_path}...")
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if result.returncode != 0:
-        print(f"Error converting {input_path}:\n{result.stderr}")
-    else:
-        print(f"Successfully converted {input_path} to {output_path}")
+    # Only the last few lines of stderr are kept, however much ffmpeg prints.
+    tail = deque(maxlen=STDERR_TAIL)
+    try:
+        proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, errors='replace')
+        for line in proc.stderr:
+            tail.append(line.rstrip())
+        returncode = proc.wait()
+    except OSError as e:
+        tail.append(str(e))
+        returncode = -1
+    if returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError('\n'.join(tail) or f'ffmpeg exit {returncode}')
+    os.replace(tmp_path, output_path)
+
+def remux_job(input_path, force):
+    output_path = os.path.splitext(input_path)[0] + '.mp4'
+    state = 'missing' if force else output_state(input_path, output_path)
+    if state == 'done':
+        return 'skipped', 0, 0.0
+    started = time.monotonic()
+    convert_to_mp4(input_path, output_path)
+    return ('redone' if state == 'partial' else 'converted'), os.path.getsize(input_path), time.monotonic() - started
 
-def main(suffix):
-    files = glob.glob("./*." + suffix)
+def main():
+    parser = argparse.ArgumentParser(description="Remux webm/mkv files to mp4 in parallel.")
+    parser.add_argument("path", nargs="?", default=".", help="Folder to scan (default: current directory)")
+    parser.add_argument("--ext", nargs="+", default=DEFAULT_EXTS, help="Source extensions (default: webm mkv)")
+    parser.add_argument("--workers", "-j", type=int, default=DEFAULT_WORKERS, help="Parallel ffmpeg jobs")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Also scan subfolders")
+    parser.add_argument("--force", action="store_true", help="Remux even if the .mp4 already exists")
+    args = parser.parse_args()
+
+    files = collect_files(args.path, args.ext, args.recursive)
     if not files:
-        print("No .webm files found in the current directory.")
+        print(f"No {'/'.join(args.ext)} files found in {args.path}.")
         return
 
-    for webm_file in files:
-        base_name = os.path.splitext(webm_file)[0]
-        output_file = base_name + ".mp4"
-        
-        convert_webm_to_mp4(webm_file, output_file)
+    # webm and mkv with the same name would race for one .mp4; keep the first.
+    by_output = {}
+    for src in files:
+        by_output.setdefault(os.path.splitext(src)[0] + '.mp4', src)
+    if len(by_output) < len(files):
+        print(f"Ignoring {len(files) - len(by_output)} file(s) that share an output name with another source.")
+    files = list(by_output.values())
 
-if __name__ == "__main__":
-    main("webm")
-    main("mkv")
+    for src in files:
+        leftover = os.path.splitext(src)[0] + '.mp4' + PART_SUFFIX
+        if os.path.exists(leftover):
+            print(f"Removing leftover {leftover}")
+            os.remove(leftover)
 
+    counts = {'converted': 0, 'redone': 0, 'skipped': 0, 'failed': 0}
+    total_bytes = 0
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        futs = {ex.submit(remux_job, f, args.force): f for f in files}
+        for fut in as_completed(futs):
+            src = futs[fut]
+            try:
+                status, size, seconds = fut.result()
+            except Exception as e:
+                counts['failed'] += 1
+                print(f"FAILED {src}:\n{e}")
+                continue
+            counts[status] += 1
+            total_bytes += size
+            if status == 'skipped':
+                print(f"Skipped {src} (mp4 already complete)")
+            else:
+                print(f"{status.capitalize()} {src} ({size / (1024 * 1024):.1f} MB in {seconds:.1f}s)")
+    elapsed = time.monotonic() - started
+
+    print("\n=== Summary ===")
+    print(" | ".join(f"{k}: {v}" for k, v in counts.items()))
+    mb = total_bytes / (1024 * 1024)
+    print(f"Remuxed {mb:.1f} MB in {elapsed:.1f}s ({mb / elapsed if elapsed > 0 else 0:.1f} MB/s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import os
-import subprocess
+
+import media_probe
 
 MIN_AUDIO_STREAM_COUNT = 2
 
@@ -11,18 +12,13 @@ def print_video_files_with_multiple_audio_streams(root='.'):
                 video_files.append(os.path.join(dirpath, name))
     video_files.sort()
 
-    for path in video_files:
+    for path, info in media_probe.probe_many(video_files):
         try:
-            result = subprocess.run(
-                ['ffmpeg', '-i', path],
-                stderr=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                text=True,
-                encoding='utf-8'
-            )
+            if info is None:
+                print(f"Error processing file {path}: ffprobe failed")
+                continue
 
-            audio_streams = [line for line in result.stderr.splitlines() if 'Audio:' in line]
-            stream_count = len(audio_streams)
+            stream_count = media_probe.audio_stream_count(info)
             if stream_count >= MIN_AUDIO_STREAM_COUNT:
                 print(f"{path} has {stream_count} audio streams.")
         except Exception as e:
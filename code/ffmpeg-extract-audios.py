@@ -1,4 +1,6 @@
+import argparse
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 EXT_MAP = {
@@ -50,23 +52,47 @@ def extract_all_audio(input_path: str, ffmpeg_path: str = "./ffmpeg.exe", out_te
     if not codecs:
         raise RuntimeError("No audio streams found")
 
+    # One ffmpeg run demuxes every audio stream, so the input is read only once.
+    cmd = [str(Path(ffmpeg_path)), "-y", "-hide_banner", "-loglevel", "error", "-i", str(inp)]
     outputs = []
     for i, codec in enumerate(codecs):
         ext = EXT_MAP.get(codec, codec)  # fallback to codec name if unknown
-        out_name = out_template.format(idx=i, ext=ext)
-        cmd = [
-            str(Path(ffmpeg_path)),
-            "-y",
-            "-i", str(inp),
-            "-map", f"0:a:{i}",
-            "-c", "copy",
-            out_name
-        ]
-        res = subprocess.run(cmd, capture_output=True, text=True)
-        if res.returncode != 0:
-            raise RuntimeError(f"ffmpeg failed for stream {i}: {res.stderr.strip()}")
+        out_name = out_template.format(idx=i, ext=ext, stem=inp.stem, dir=str(inp.parent))
+        cmd += ["-map", f"0:a:{i}", "-c", "copy", out_name]
         outputs.append(out_name)
+
+    res = subprocess.run(cmd, capture_output=True, text=True)
+    if res.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed for {inp}: {res.stderr.strip()}")
     return outputs
 
+def extract_batch(inputs, ffmpeg_path: str = "./ffmpeg.exe", out_template: str = "{dir}/{stem}.audio_{idx}.{ext}", workers: int = 4):
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = {ex.submit(extract_all_audio, str(p), ffmpeg_path, out_template): p for p in inputs}
+        for fut in as_completed(futs):
+            src = futs[fut]
+            try:
+                outputs = fut.result()
+                print(f"{src}: {', '.join(outputs)}")
+                results[str(src)] = outputs
+            except Exception as e:
+                print(f"{src}: FAILED ({e})")
+                results[str(src)] = None
+    return results
+
 if __name__ == "__main__":
-    print(extract_all_audio("audio.mkv"))
+    parser = argparse.ArgumentParser(description="Extract every audio stream of each input in a single ffmpeg pass.")
+    parser.add_argument("inputs", nargs="*", default=["audio.mkv"], help="Input files (default: audio.mkv)")
+    parser.add_argument("--ffmpeg", default="./ffmpeg.exe", help="Path to ffmpeg")
+    parser.add_argument("--template", default=None,
+                        help="Output name template; fields: {dir} {stem} {idx} {ext}")
+    parser.add_argument("--workers", type=int, default=4, help="Files processed in parallel")
+    args = parser.parse_args()
+
+    if len(args.inputs) == 1 and args.template is None:
+        print(extract_all_audio(args.inputs[0], args.ffmpeg))
+    else:
+        template = args.template or "{dir}/{stem}.audio_{idx}.{ext}"
+        failed = [p for p, out in extract_batch(args.inputs, args.ffmpeg, template, args.workers).items() if out is None]
+        print(f"\nProcessed {len(args.inputs)} file(s), {len(failed)} failed.")
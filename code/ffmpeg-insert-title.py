@@ -1,11 +1,247 @@
 import os
+import shutil
+import struct
 import subprocess
 
-def update_metadata(input_file):
+MP4_EXTS = (".mp4", ".m4v", ".m4a", ".mov")
+TITLE_ATOM = b"\xa9nam"
+# Extra space left behind the moov box whenever it has to be rewritten, so the
+# next tag edit fits in place.
+PADDING = 4096
+COPY_BUFFER = 8 * 1024 * 1024
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+class Mp4Error(Exception):
+    pass
+
+def iter_boxes(buf, start, end):
+    """Yield (kind, box_start, body_start, box_end) for the boxes in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise Mp4Error("truncated box")
+        yield kind, pos, pos + header, pos + size
+        pos += size
+
+def top_level_boxes(f):
+    f.seek(0, 2)
+    file_size = f.tell()
+    boxes = []
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        size, kind = struct.unpack_from(">I4s", header)
+        hdr = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            hdr = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < hdr or pos + size > file_size:
+            raise Mp4Error(f"bad top-level box at offset {pos}")
+        boxes.append((kind, pos, hdr, size))
+        pos += size
+    return boxes, file_size
+
+def make_box(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+def free_box(size):
+    return struct.pack(">I4s", size, b"free") + b"\0" * (size - 8)
+
+def children(buf, start, end):
+    return [(kind, bytes(buf[pos:stop])) for kind, pos, _, stop in iter_boxes(buf, start, end)]
+
+def replace_child(items, kind, raw):
+    for i, (k, _) in enumerate(items):
+        if k == kind:
+            items[i] = (kind, raw)
+            return items
+    items.append((kind, raw))
+    return items
+
+def get_child(items, kind):
+    for k, raw in items:
+        if k == kind:
+            return raw
+    return None
+
+def body_of(raw):
+    return raw[16:] if struct.unpack_from(">I", raw)[0] == 1 else raw[8:]
+
+def title_item(title):
+    # 'data' atom: type 1 (UTF-8), locale 0
+    return make_box(TITLE_ATOM, make_box(b"data", struct.pack(">II", 1, 0) + title.encode("utf-8")))
+
+def read_title(moov):
+    udta = get_child(children(moov, 8, len(moov)), b"udta")
+    meta = udta and get_child(children(udta, 8, len(udta)), b"meta")
+    if not meta:
+        return None
+    body = body_of(meta)
+    prefix = b"" if body[4:8] == b"hdlr" else body[:4]
+    ilst = get_child(children(body, len(prefix), len(body)), b"ilst")
+    item = ilst and get_child(children(ilst, 8, len(ilst)), TITLE_ATOM)
+    data = item and get_child(children(item, 8, len(item)), b"data")
+    if not data or struct.unpack_from(">I", data, 8)[0] & 0xFFFFFF != 1:
+        return None
+    return data[16:].decode("utf-8", errors="replace")
+
+def build_moov(moov, title):
+    """Return a copy of moov with the ilst title set; free/skip padding in udta and meta is dropped."""
+    moov_items = children(moov, 8, len(moov))
+    udta = get_child(moov_items, b"udta")
+    udta_items = children(udta, 8, len(udta)) if udta else []
+    meta = get_child(udta_items, b"meta")
+    if meta:
+        body = body_of(meta)
+        # ISO meta is a full box (4 bytes version/flags); QuickTime meta is not.
+        prefix = b"" if body[4:8] == b"hdlr" else body[:4]
+        meta_items = children(body, len(prefix), len(body))
+    else:
+        prefix = b"\0\0\0\0"
+        hdlr = make_box(b"hdlr", b"\0" * 8 + b"mdirappl" + b"\0" * 10)
+        meta_items = [(b"hdlr", hdlr)]
+    ilst = get_child(meta_items, b"ilst")
+    ilst_items = children(ilst, 8, len(ilst)) if ilst else []
+
+    replace_child(ilst_items, TITLE_ATOM, title_item(title))
+    meta_items = [c for c in meta_items if c[0] not in (b"free", b"skip")]
+    replace_child(meta_items, b"ilst", make_box(b"ilst", b"".join(raw for _, raw in ilst_items)))
+    udta_items = [c for c in udta_items if c[0] not in (b"free", b"skip")]
+    replace_child(udta_items, b"meta", make_box(b"meta", prefix + b"".join(raw for _, raw in meta_items)))
+    replace_child(moov_items, b"udta", make_box(b"udta", b"".join(raw for _, raw in udta_items)))
+    return bytearray(make_box(b"moov", b"".join(raw for _, raw in moov_items)))
+
+def find_box(buf, start, end, *path):
+    for kind, _, body, stop in iter_boxes(buf, start, end):
+        if kind == path[0]:
+            return (body, stop) if len(path) == 1 else find_box(buf, body, stop, *path[1:])
+    return None
+
+def shift_chunk_offsets(moov, threshold, delta):
+    """Add delta to every stco/co64 entry that points at or past threshold."""
+    for kind, _, body, stop in iter_boxes(moov, 8, len(moov)):
+        stbl = find_box(moov, body, stop, b"mdia", b"minf", b"stbl") if kind == b"trak" else None
+        if not stbl:
+            continue
+        for k, _, b, _ in iter_boxes(moov, *stbl):
+            if k not in (b"stco", b"co64"):
+                continue
+            fmt, width = (">I", 4) if k == b"stco" else (">Q", 8)
+            count = struct.unpack_from(">I", moov, b + 4)[0]
+            for i in range(count):
+                at = b + 8 + width * i
+                value = struct.unpack_from(fmt, moov, at)[0]
+                if value >= threshold:
+                    value += delta
+                    if k == b"stco" and value > 0xFFFFFFFF:
+                        raise Mp4Error("chunk offset overflows stco")
+                    struct.pack_into(fmt, moov, at, value)
+
+def close_open_ended_box(f, boxes):
+    """Give a last box declared with size 0 ("to end of file") its real size, so data can follow it."""
+    _, pos, hdr, size = boxes[-1]
+    f.seek(pos)
+    if hdr == 8 and struct.unpack(">I", f.read(4))[0] == 0:
+        if size > 0xFFFFFFFF:
+            raise Mp4Error("open-ended last box too large to close")
+        f.seek(pos)
+        f.write(struct.pack(">I", size))
+
+def set_mp4_title(path, title, allow_rewrite=False):
+    """
+    Set the title tag by editing moov in place. Returns 'unchanged', 'in-place',
+    'appended' (moov was last in the file), 'relocated' (the new moov was
+    written at the end of the file and the old one turned into a free box, so
+    no chunk offset changes) or, only with allow_rewrite, 'shifted' (the file
+    was rewritten with data after moov moved and chunk offsets fixed up).
+    Raises Mp4Error on unsupported layouts.
+    """
+    with open(path, "r+b") as f:
+        boxes, file_size = top_level_boxes(f)
+        index = next((i for i, b in enumerate(boxes) if b[0] == b"moov"), None)
+        if index is None:
+            raise Mp4Error("no moov box")
+        _, moov_pos, hdr, moov_size = boxes[index]
+        if hdr != 8 or moov_size > MAX_MOOV_SIZE:
+            raise Mp4Error("unsupported moov size")
+        f.seek(moov_pos)
+        moov = f.read(moov_size)
+        if read_title(moov) == title:
+            return "unchanged"
+        new_moov = build_moov(moov, title)
+
+        # Space the new moov may occupy: the old one plus any free boxes right after it.
+        span_end = moov_pos + moov_size
+        for kind, pos, _, size in boxes[index + 1:]:
+            if kind not in (b"free", b"skip"):
+                break
+            span_end = pos + size
+        available = span_end - moov_pos
+
+        if len(new_moov) == available or len(new_moov) + 8 <= available:
+            f.seek(moov_pos)
+            f.write(new_moov)
+            if available > len(new_moov):
+                f.write(free_box(available - len(new_moov)))
+            return "in-place"
+
+        if span_end == file_size:
+            f.seek(moov_pos)
+            f.write(new_moov)
+            f.write(free_box(PADDING))
+            f.truncate()
+            return "appended"
+
+        if any(b[0] == b"moof" for b in boxes):
+            raise Mp4Error("fragmented MP4")
+        try:
+            close_open_ended_box(f, boxes)
+        except Mp4Error:
+            if not allow_rewrite:
+                raise
+        else:
+            f.seek(file_size)
+            f.write(new_moov)
+            f.write(free_box(PADDING))
+            f.flush()
+            os.fsync(f.fileno())
+            # Until this 4-byte write lands the old moov still comes first, so a crash leaves the old title.
+            f.seek(moov_pos + 4)
+            f.write(b"free")
+            return "relocated"
+
+        delta = len(new_moov) + PADDING - available
+        shift_chunk_offsets(new_moov, span_end, delta)
+
+    tmp_path = path + ".title.tmp"
+    try:
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            dst.write(src.read(moov_pos))
+            dst.write(new_moov)
+            dst.write(free_box(PADDING))
+            src.seek(span_end)
+            shutil.copyfileobj(src, dst, COPY_BUFFER)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return "shifted"
+
+def update_metadata_ffmpeg(input_file, title):
     ffmpeg_path = r".\ffmpeg.exe"
-    
-    title = os.path.basename(input_file)
-    
+
     base, ext = os.path.splitext(input_file)
     temp_output = base + "_temp" + ext
 
@@ -17,39 +253,50 @@ def update_metadata(input_file):
         temp_output
     ]
 
-    print(f"Processing: {input_file}")
     print(f"Running command: {' '.join(cmd)}")
-    
+
     result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
-    
+
     if result.returncode != 0:
         print(f"Error processing {input_file}:")
         print(result.stderr)
         return False
-    
+
     try:
-        os.remove(input_file)
-        os.rename(temp_output, input_file)
+        os.replace(temp_output, input_file)
         print(f"Updated metadata and replaced the original file: {input_file}\n")
     except Exception as e:
         print(f"File operation error for {input_file}: {e}\n")
         return False
-    
+
     return True
 
+def update_metadata(input_file):
+    title = os.path.basename(input_file)
+
+    print(f"Processing: {input_file}")
+    if input_file.lower().endswith(MP4_EXTS):
+        try:
+            how = set_mp4_title(input_file, title, allow_rewrite=True)
+            print(f"Title {'already set' if how == 'unchanged' else 'updated (' + how + ')'}: {input_file}\n")
+            return True
+        except (Mp4Error, OSError, struct.error) as e:
+            print(f"In-place edit not possible ({e}); falling back to ffmpeg.")
+    return update_metadata_ffmpeg(input_file, title)
+
 def main():
     current_dir = "./"
     files = os.listdir(current_dir)
-    
+
     mp4_files = [
         f for f in files
         if os.path.isfile(os.path.join(current_dir, f)) and f.lower().endswith(".mp4")
     ]
-    
+
     if not mp4_files:
         print("No .mp4 files found in the current directory.")
         return
-    
+
     for file in mp4_files:
         filepath = os.path.join(current_dir, file)
         success = update_metadata(filepath)
@@ -1,91 +1,144 @@
 #!/usr/bin/env python3
 # test_flac_playable.py
-# Usage: python test_flac_playable.py
-# Requires ffmpeg.exe in the same folder or adjust FFMPEG_PATH.
+# Usage: python test_flac_playable.py [--path DIR] [--recursive] [--workers N] [--report FILE] [--all-formats]
+# Requires ffmpeg.exe in the same folder (or ffmpeg on PATH), or adjust FFMPEG_PATH.
 
+import argparse
+import json
+import os
+import shutil
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Path to ffmpeg.exe (same dir as script by default)
 SCRIPT_DIR = Path(__file__).resolve().parent
 FFMPEG_PATH = SCRIPT_DIR / "ffmpeg.exe"
 
-# Fast playback speed factor (e.g., 16 = 16x faster)
-SPEED = 16
+FLAC_EXTS = {".flac"}
+AUDIO_EXTS = {".flac", ".mp3", ".m4a", ".aac", ".ogg", ".oga", ".opus", ".wav", ".wv", ".ape", ".wma", ".aiff", ".aif"}
 
-# Files to test: all .flac in current directory
-files = sorted([p for p in SCRIPT_DIR.glob("*.flac") if p.is_file()])
+TIMEOUT = 600
+REPORT_NAME = "flac-test-report.json"
 
-if not files:
-    print("No .flac files found in", SCRIPT_DIR)
-    sys.exit(0)
+# FLAC hashes interleaved little-endian samples at the stream's own bit depth,
+# which is exactly what these PCM encoders emit.
+PCM_CODECS = {8: "pcm_s8", 16: "pcm_s16le", 24: "pcm_s24le", 32: "pcm_s32le"}
 
-if not FFMPEG_PATH.exists():
-    print("ffmpeg.exe not found at", FFMPEG_PATH)
-    sys.exit(1)
+def find_ffmpeg():
+    if FFMPEG_PATH.exists():
+        return str(FFMPEG_PATH)
+    return shutil.which("ffmpeg")
 
-def test_file(ffpath: Path) -> bool:
+def read_flac_streaminfo(path: Path):
+    """Return (bits_per_sample, md5_hex) from the STREAMINFO block, or None."""
+    with open(path, "rb") as f:
+        head = f.read(4 + 4 + 34)
+    if len(head) < 42 or head[:4] != b"fLaC" or head[4] & 0x7F != 0:
+        return None
+    info = head[8:42]
+    bits_per_sample = (((info[12] & 0x01) << 4) | (info[13] >> 4)) + 1
+    md5 = info[18:34].hex()
+    return bits_per_sample, md5
+
+def run_ffmpeg(cmd):
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=TIMEOUT, check=False)
+    return proc.returncode, proc.stdout.decode("utf-8", "replace"), proc.stderr.decode("utf-8", "replace").strip()
+
+def test_file(ffmpeg: str, ffpath: Path) -> dict:
     """
-    Returns True if ffmpeg reads the whole file and exits with 0.
-    Uses atempo for audio speed (supports 0.5-2.0; chain if needed) for real-time output,
-    but for speed-reading we can use setpts on a null output so ffmpeg decodes quickly.
-    Approach: decode audio and write to null muxer (pcm_s16le to NUL) while speeding pts for video filter trick.
+    Decode every audio sample once, with no filters, and fail on any decoder error.
+    FLAC files that carry an MD5 signature are decoded to their native PCM and
+    hashed so the result is compared bit-for-bit with the embedded signature;
+    everything else is decoded into the null muxer.
     """
-    # Use -vn in case file has no video. Use '-f null -' to drop output; but audio-only to null requires an audio sink.
-    # We'll force ffmpeg to decode audio and write to the null device via wav and NUL file.
-    # On Windows NUL is a special filename; use 'NUL' as output.
-    cmd = [
-        str(FFMPEG_PATH),
-        "-hide_banner",
-        "-v", "error",
-        "-nostdin",
-        "-i", str(ffpath),
-        # accelerate by setting audio pts via asetpts (playback speed multiplier):
-        # asetpts='PTS/FACTOR' alone is a filter for audio timestamps, but better to use atempo when writing audio out.
-        # However atempo only supports up to 2x per filter, so chain it if SPEED>2.
-        # Simpler: use "-af" with chained atempo filters computed below, then output to NUL as WAV.
-        "-af",
-        None,  # placeholder for af filter string
-        "-f", "wav",
-        "NUL"
-    ]
-
-    # Build atempo chain for desired SPEED. atempo changes playback speed by factor; for fast playback >2, chain multiple atempo.
-    # We'll create factors that multiply to SPEED (approx) using powers of 2 and remaining factor between 0.5-2.0.
-    target = float(SPEED)
-    factors = []
-    # reduce target by powers of 2 until <=2
-    while target > 2.0:
-        factors.append(2.0)
-        target /= 2.0
-    # now target <= 2.0
-    if target < 0.5:
-        # if too small, merge into last factor (rare for tiny SPEED values)
-        factors.append(0.5)
-    else:
-        factors.append(round(target, 6))
-    af = ",".join(f"atempo={f}" for f in factors)
-    cmd[cmd.index(None)] = af
-
-    # Run ffmpeg and capture return code
+    result = {"path": str(ffpath), "ok": False, "method": "decode", "error": None}
+    started = time.perf_counter()
+    base = [ffmpeg, "-hide_banner", "-v", "error", "-nostdin", "-threads", "1",
+            "-err_detect", "crccheck+bitstream", "-i", str(ffpath), "-map", "0:a"]
     try:
-        proc = subprocess.run(cmd, timeout=300, check=False)
-        return proc.returncode == 0
+        streaminfo = read_flac_streaminfo(ffpath) if ffpath.suffix.lower() in FLAC_EXTS else None
+        if streaminfo and streaminfo[1] != "0" * 32 and streaminfo[0] in PCM_CODECS:
+            bits, expected = streaminfo
+            result.update(method="md5", md5_expected=expected)
+            code, out, err = run_ffmpeg(base[:-1] + ["0:a:0", "-c:a", PCM_CODECS[bits], "-f", "md5", "-"])
+            actual = out.strip().partition("=")[2].lower()
+            result["md5_actual"] = actual
+            if code != 0 or err:
+                result["error"] = err or f"ffmpeg exit {code}"
+            elif actual != expected:
+                result["error"] = "MD5 mismatch"
+            else:
+                result["ok"] = True
+        else:
+            code, _, err = run_ffmpeg(base + ["-f", "null", "-"])
+            if code != 0 or err:
+                result["error"] = err or f"ffmpeg exit {code}"
+            else:
+                result["ok"] = True
     except subprocess.TimeoutExpired:
-        print(f"Timeout reading {ffpath}")
-        return False
+        result["error"] = f"timeout after {TIMEOUT}s"
     except Exception as e:
-        print(f"Error running ffmpeg on {ffpath}: {e}")
-        return False
-
-results = []
-for f in files:
-    ok = test_file(f)
-    results.append((f.name, ok))
-    print(f"{f.name}: {'OK' if ok else 'FAIL'}")
-
-# Summary
-ok_count = sum(1 for _,r in results if r)
-print(f"\nTested {len(results)} files: {ok_count} OK, {len(results)-ok_count} failed.")
-sys.exit(0 if ok_count == len(results) else 2)
+        result["error"] = f"error running ffmpeg: {e}"
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def collect_files(root: Path, recursive: bool, exts):
+    pattern = root.rglob("*") if recursive else root.glob("*")
+    return sorted(p for p in pattern if p.is_file() and p.suffix.lower() in exts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify that audio files decode cleanly (FLAC MD5 checked when present).")
+    parser.add_argument("--path", default=str(SCRIPT_DIR), help="Folder to test (default: script folder)")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Also test files in subfolders")
+    parser.add_argument("--all-formats", action="store_true", help="Test every supported audio format, not just .flac")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parallel ffmpeg processes")
+    parser.add_argument("--report", default=None, help=f"JSON report path (default: <path>/{REPORT_NAME})")
+    args = parser.parse_args()
+
+    root = Path(args.path)
+    files = collect_files(root, args.recursive, AUDIO_EXTS if args.all_formats else FLAC_EXTS)
+    if not files:
+        print("No audio files found in", root)
+        sys.exit(0)
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        print("ffmpeg.exe not found at", FFMPEG_PATH)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        futs = [ex.submit(test_file, ffmpeg, f) for f in files]
+        for fut in as_completed(futs):
+            r = fut.result()
+            results.append(r)
+            name = os.path.relpath(r["path"], root)
+            status = "OK" if r["ok"] else f"FAIL ({r['error']})"
+            print(f"{name}: {status} [{r['method']}, {r['seconds']:.2f}s]")
+    elapsed = time.perf_counter() - started
+
+    results.sort(key=lambda r: r["path"])
+    ok_count = sum(1 for r in results if r["ok"])
+    report_path = Path(args.report) if args.report else root / REPORT_NAME
+    report = {
+        "root": str(root.resolve()),
+        "tested": len(results),
+        "ok": ok_count,
+        "failed": len(results) - ok_count,
+        "seconds": round(elapsed, 3),
+        "files": results,
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    # Summary
+    print(f"\nTested {len(results)} files: {ok_count} OK, {len(results)-ok_count} failed in {elapsed:.1f}s.")
+    print(f"Report written to {report_path}")
+    sys.exit(0 if ok_count == len(results) else 2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+ffprobe-catalog.py
+
+Usage:
+  python ffprobe-catalog.py scan [ROOT] [--workers N] [--no-prune]
+  python ffprobe-catalog.py shorts [ROOT]
+  python ffprobe-catalog.py duration [ROOT]
+  python ffprobe-catalog.py low-res [ROOT] [--threshold PIXELS]
+  python ffprobe-catalog.py multi-audio [ROOT] [--min N]
+  python ffprobe-catalog.py no-audio [ROOT]
+  python ffprobe-catalog.py id YOUTUBE_ID
+
+Builds a SQLite catalog of a media library (duration, resolution, codecs, audio
+track count, tags, YouTube ID) with media_probe.py, then answers the questions
+the individual ffprobe scripts ask as indexed queries. `scan` is incremental:
+files whose size and mtime are unchanged are not probed again, and rows for
+files that disappeared under ROOT are pruned.
+
+--db PATH selects the catalog file (default: ~/.media-catalog.sqlite).
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import media_probe
+import youtube_id
+
+DEFAULT_DB = Path.home() / ".media-catalog.sqlite"
+MEDIA_EXTS = {'.mp4', '.mkv', '.mov', '.avi', '.webm', '.flv', '.m4v', '.mts', '.ts'}
+BATCH_SIZE = 500
+
+BRACKET_ID_RE = re.compile(r'\[([A-Za-z0-9_-]{11})\]')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    pixels INTEGER,
+    video_codec TEXT,
+    audio_codec TEXT,
+    audio_tracks INTEGER,
+    title TEXT,
+    comment TEXT,
+    tags TEXT,
+    youtube_id TEXT,
+    scanned_at REAL
+);
+CREATE INDEX IF NOT EXISTS media_duration ON media (duration);
+CREATE INDEX IF NOT EXISTS media_pixels ON media (pixels);
+CREATE INDEX IF NOT EXISTS media_audio_tracks ON media (audio_tracks);
+CREATE INDEX IF NOT EXISTS media_youtube_id ON media (youtube_id);
+CREATE INDEX IF NOT EXISTS media_portrait ON media (path) WHERE width < height;
+"""
+
+def open_db(path):
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def prefix_clause(root):
+    # Range over the primary key instead of LIKE so the path index is used.
+    if root is None:
+        return "1 = 1", ()
+    prefix = os.path.join(os.path.abspath(root), "")
+    return "path >= ? AND path < ?", (prefix, prefix + "\U0010FFFF")
+
+def find_youtube_id(path, comment):
+    vid = youtube_id.video_id(comment)
+    if vid:
+        return vid
+    m = BRACKET_ID_RE.search(os.path.basename(path))
+    return m.group(1) if m else None
+
+def row_from_info(path, size, mtime_ns, info):
+    video = [s for s in media_probe.streams(info, "video")
+             if not (s.get("disposition") or {}).get("attached_pic")]
+    audio = media_probe.streams(info, "audio")
+    width, height = media_probe.video_resolution(info)
+    comment = media_probe.tag(info, "comment")
+    return (
+        path, size, mtime_ns,
+        media_probe.duration(info),
+        width, height, (width * height) if width and height else None,
+        video[0].get("codec_name") if video else None,
+        audio[0].get("codec_name") if audio else None,
+        len(audio),
+        media_probe.tag(info, "title"),
+        comment,
+        json.dumps(media_probe.format_tags(info), ensure_ascii=False),
+        find_youtube_id(path, comment),
+        time.time(),
+    )
+
+def scan(conn, root, workers, prune=True):
+    root = os.path.abspath(root)
+    clause, params = prefix_clause(root)
+    known = {p: (s, m) for p, s, m in conn.execute(f"SELECT path, size, mtime_ns FROM media WHERE {clause}", params)}
+
+    seen = set()
+    todo = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() not in MEDIA_EXTS:
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen.add(path)
+            if known.get(path) != (st.st_size, st.st_mtime_ns):
+                todo[path] = (st.st_size, st.st_mtime_ns)
+
+    print(f"{len(seen)} media files, {len(todo)} new or changed")
+    started = time.monotonic()
+    batch = []
+    failed = 0
+    done = 0
+    for path, info in media_probe.probe_many(list(todo), workers=workers):
+        done += 1
+        if info is None:
+            failed += 1
+            print(f"probe failed: {path}")
+            continue
+        size, mtime_ns = todo[path]
+        batch.append(row_from_info(path, size, mtime_ns, info))
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            conn.commit()
+            batch.clear()
+            print(f"{done}/{len(todo)} probed")
+    if batch:
+        conn.executemany("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+    removed = 0
+    if prune:
+        gone = [(p,) for p in known if p not in seen]
+        conn.executemany("DELETE FROM media WHERE path = ?", gone)
+        removed = len(gone)
+    conn.commit()
+    print(f"Scanned in {time.monotonic() - started:.1f}s | updated: {len(todo) - failed} | failed: {failed} | pruned: {removed}")
+
+def format_duration(total_seconds):
+    hrs = int(total_seconds // 3600)
+    mins = int((total_seconds % 3600) // 60)
+    secs = total_seconds % 60
+    return f"{hrs:02d}:{mins:02d}:{secs:06.3f}"
+
+def print_rows(rows, fmt):
+    count = 0
+    for row in rows:
+        print(fmt(row))
+        count += 1
+    print(f"{count} file(s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Media catalog built from ffprobe results.")
+    parser.add_argument("--db", default=str(DEFAULT_DB), help="Catalog database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scan", help="Probe new/changed files under ROOT into the catalog")
+    p.add_argument("root", nargs="?", default=".")
+    p.add_argument("--workers", type=int, default=media_probe.DEFAULT_WORKERS)
+    p.add_argument("--no-prune", dest="prune", action="store_false", help="Keep rows for files that no longer exist")
+
+    for name, help_text in (("shorts", "Portrait videos (width < height)"),
+                            ("duration", "Total duration"),
+                            ("no-audio", "Files without an audio track")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("root", nargs="?", default=None)
+    p = sub.add_parser("low-res", help="Videos below a pixel count")
+    p.add_argument("root", nargs="?", default=None)
+    p.add_argument("--threshold", type=int, default=1200 * 720)
+    p = sub.add_parser("multi-audio", help="Files with several audio tracks")
+    p.add_argument("root", nargs="?", default=None)
+    p.add_argument("--min", type=int, default=2)
+    p = sub.add_parser("id", help="Files carrying a YouTube ID")
+    p.add_argument("youtube_id")
+    args = parser.parse_args()
+
+    conn = open_db(args.db)
+    if args.command == "scan":
+        if not os.path.isdir(args.root):
+            print(f"Directory not found: {args.root}", file=sys.stderr)
+            sys.exit(1)
+        scan(conn, args.root, args.workers, prune=args.prune)
+        return
+    if args.command == "id":
+        print_rows(conn.execute("SELECT path FROM media WHERE youtube_id = ?", (args.youtube_id,)),
+                   lambda r: r[0])
+        return
+
+    clause, params = prefix_clause(args.root)
+    if args.command == "shorts":
+        rows = conn.execute(f"SELECT path, width, height FROM media WHERE width < height AND {clause} ORDER BY path", params)
+        print_rows(rows, lambda r: f"{r[0]} ({r[1]}x{r[2]})")
+    elif args.command == "duration":
+        total, count = conn.execute(f"SELECT COALESCE(SUM(duration), 0), COUNT(*) FROM media WHERE {clause}", params).fetchone()
+        print(f"{format_duration(total)} across {count} file(s)")
+    elif args.command == "low-res":
+        rows = conn.execute(f"SELECT path, width, height FROM media WHERE pixels < ? AND {clause} ORDER BY path",
+                            (args.threshold,) + params)
+        print_rows(rows, lambda r: f"{r[0]} ({r[1]}x{r[2]})")
+    elif args.command == "multi-audio":
+        rows = conn.execute(f"SELECT path, audio_tracks FROM media WHERE audio_tracks >= ? AND {clause} ORDER BY path",
+                            (args.min,) + params)
+        print_rows(rows, lambda r: f"{r[0]} has {r[1]} audio streams.")
+    elif args.command == "no-audio":
+        rows = conn.execute(f"SELECT path FROM media WHERE audio_tracks = 0 AND {clause} ORDER BY path", params)
+        print_rows(rows, lambda r: r[0])
+
+if __name__ == "__main__":
+    main()
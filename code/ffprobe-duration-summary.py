@@ -1,22 +1,10 @@
 #!/usr/bin/env python3
-import subprocess
 import sys
 from pathlib import Path
 
-VIDEO_EXTS = {'.mp4', '.mkv', '.mov', '.avi', '.webm', '.flv', '.m4v', '.mts', '.ts'}
+import media_probe
 
-def get_duration(path: Path) -> float:
-    cmd = ["./ffprobe.exe",
-           "-v", "error",
-           "-select_streams", "v:0",
-           "-show_entries", "format=duration",
-           "-of", "default=noprint_wrappers=1:nokey=1",
-           str(path)]
-    try:
-        out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
-        return float(out.strip()) if out.strip() else 0.0
-    except (subprocess.CalledProcessError, ValueError):
-        return 0.0
+VIDEO_EXTS = {'.mp4', '.mkv', '.mov', '.avi', '.webm', '.flv', '.m4v', '.mts', '.ts'}
 
 def format_duration(total_seconds: float) -> str:
     hrs = int(total_seconds // 3600)
@@ -30,10 +18,11 @@ def main():
         print("Directory '.' not found.", file=sys.stderr)
         sys.exit(1)
 
+    files = (p for p in root.rglob('*') if p.is_file() and p.suffix.lower() in VIDEO_EXTS)
     total = 0.0
-    for p in root.rglob('*'):
-        if p.is_file() and p.suffix.lower() in VIDEO_EXTS:
-            total += get_duration(p)
+    for _, info in media_probe.probe_many(files):
+        if info:
+            total += media_probe.duration(info)
 
     print(format_duration(total))
 
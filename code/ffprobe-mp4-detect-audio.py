@@ -1,26 +1,11 @@
 #!/usr/bin/env python3
-import subprocess
 import glob
 import os
 import shutil
 
-FFPROBE = os.path.join('.', 'ffprobe.exe')  # path to ffprobe.exe
-SEARCH_GLOB = os.path.join("./youtube", '*.mp4')
+import media_probe
 
-def has_audio(path):
-    cmd = [
-        FFPROBE,
-        '-v', 'error',
-        '-select_streams', 'a',
-        '-show_entries', 'stream=codec_type',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        path
-    ]
-    try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
-        return bool(proc.stdout.strip())
-    except FileNotFoundError:
-        raise RuntimeError(f"ffprobe not found at {FFPROBE}")
+SEARCH_GLOB = os.path.join("./youtube", '*.mp4')
 
 def main():
     files = sorted(glob.glob(SEARCH_GLOB))
@@ -28,14 +13,16 @@ def main():
         print("No MP4 files found.")
         return
 
+    # Unprobed files would be listed as silent, so do not go on without ffprobe.
+    if not media_probe.find_ffprobe():
+        print("ffprobe not found. Make sure ./ffprobe.exe exists or ffprobe is on PATH.")
+        return
+
     no_audio = []
-    for f in files:
-        try:
-            if not has_audio(f):
-                no_audio.append(f)
-        except RuntimeError as e:
-            print(e)
-            return
+    for f, info in media_probe.probe_many(files):
+        if not (info and media_probe.has_audio(info)):
+            no_audio.append(f)
+    no_audio.sort()
 
     if not no_audio:
         print("All files contain audio.")
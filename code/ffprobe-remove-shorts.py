@@ -3,50 +3,15 @@
 Move all .mp4 files in the current directory whose video resolution is portrait (width < height)
 to ./to_remove directory.
 Requires ffprobe (part of ffmpeg) available as ./ffprobe.exe or ffprobe on PATH.
+Probe results are cached by media_probe.py.
 """
 
-import json
 import os
-import subprocess
 import sys
 import shutil
 
-FFPROBE_CANDIDATES = ["./ffprobe.exe", "ffprobe"]
-
-def find_ffprobe():
-    for cmd in FFPROBE_CANDIDATES:
-        try:
-            subprocess.run([cmd, "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-            return cmd
-        except Exception:
-            continue
-    return None
-
-def get_video_stream_resolution(ffprobe_cmd, filepath):
-    # Use ffprobe to get stream info as json
-    args = [
-        ffprobe_cmd,
-        "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=width,height",
-        "-of", "json",
-        filepath
-    ]
-    try:
-        proc = subprocess.run(args, capture_output=True, text=True, check=True)
-        info = json.loads(proc.stdout)
-        streams = info.get("streams") or []
-        if not streams:
-            return None, None
-        stream = streams[0]
-        return int(stream.get("width", 0)), int(stream.get("height", 0))
-    except subprocess.CalledProcessError as e:
-        print(f"ffprobe failed for {filepath}: {e}", file=sys.stderr)
-    except json.JSONDecodeError:
-        print(f"Could not parse ffprobe output for {filepath}", file=sys.stderr)
-    except Exception as e:
-        print(f"Error getting resolution for {filepath}: {e}", file=sys.stderr)
-    return None, None
+import media_probe
+from media_probe import find_ffprobe
 
 def main():
     ffprobe_cmd = find_ffprobe()
@@ -58,15 +23,23 @@ def main():
     target_dir = os.path.join(cwd, "to_remove")
     os.makedirs(target_dir, exist_ok=True)
 
-    moved = []
-    skipped = []
+    paths = []
     for name in os.listdir(cwd):
         if not name.lower().endswith(".mp4"):
             continue
         path = os.path.join(cwd, name)
-        if not os.path.isfile(path):
-            continue
-        width, height = get_video_stream_resolution(ffprobe_cmd, path)
+        if os.path.isfile(path):
+            paths.append(path)
+
+    moved = []
+    skipped = []
+    for path, info in media_probe.probe_many(paths):
+        name = os.path.basename(path)
+        if info is None:
+            print(f"ffprobe failed for {path}", file=sys.stderr)
+            width, height = None, None
+        else:
+            width, height = media_probe.video_resolution(info)
         if width is None or height is None or width == 0 or height == 0:
             skipped.append((name, "no-resolution"))
             continue
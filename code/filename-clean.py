@@ -2,6 +2,8 @@
 import os
 import re
 
+import filename_sanitize
+
 DRY_RUN = True
 
 def clean_filename_regex(filename):
@@ -9,14 +11,7 @@ def clean_filename_regex(filename):
     return ''.join(valid_chars)
 
 def clean_filename_no_regex(filename):
-    new_chars = []
-    for ch in filename:
-        if ord(ch) < 128:
-            if ch.isalnum():
-                new_chars.append(ch)
-        else:
-            new_chars.append(ch)
-    return ''.join(new_chars)
+    return filename_sanitize.alnum(filename)
 
 def process_rename(filename, new_filename):
     try:
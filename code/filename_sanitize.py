@@ -0,0 +1,225 @@
+"""
+filename_sanitize.py
+
+Shared filename sanitizer for the rename scripts.
+
+Each preset reproduces the rules one script used to implement by hand:
+
+  yt_dlp(s, restricted=False, is_id=False)  yt-dlp's sanitize_filename (yt-dlp-rename-youtube-video.py)
+  basic(s, max_bytes=255)                   NFC, "_" for unsafe chars, byte truncation (yt-dlp-rename-youtube-video.py)
+  windows(s, replacement="")                Windows-forbidden and control chars (conan-renamer.py)
+  spaces(s)                                 Windows-forbidden chars to spaces (ffmpeg-bili-download-convert.py)
+  alnum(s)                                  ASCII letters/digits and non-ASCII only (filename-clean.py)
+
+Character rules are str.translate tables built once at import. Tables that
+must cover all of Unicode fill themselves in on first sight of a character,
+so a bulk rename pays for each distinct character once rather than per call.
+truncate_bytes() cuts to a byte budget without splitting a UTF-8 sequence.
+
+Usage:
+  python filename_sanitize.py PRESET TEXT [TEXT ...]
+  python filename_sanitize.py bench [-n NUMBER]
+"""
+
+import argparse
+import itertools
+import re
+import sys
+import timeit
+import unicodedata
+from functools import lru_cache
+
+MAX_BYTES = 255
+
+WINDOWS_FORBIDDEN = '<>:"/\\|?*'
+
+ACCENT_CHARS = dict(zip('ÂÃÄÀÁÅÆÇÈÉÊËÌÍÎÏÐÑÒÓÔÕÖŐØŒÙÚÛÜŰÝÞßàáâãäåæçèéêëìíîïðñòóôõöőøœùúûüűýþÿ',
+                        itertools.chain('AAAAAA', ['AE'], 'CEEEEIIIIDNOOOOOOO', ['OE'], 'UUUUUY', ['TH', 'ss'],
+                                        'aaaaaa', ['ae'], 'ceeeeiiiionooooooo', ['oe'], 'uuuuuy', ['th'], 'y')))
+
+TIMESTAMP_RE = re.compile(r'[0-9]+(?::[0-9]+)+')
+REPEATED_SUBST_RE = re.compile(r'(\0.)(?:(?=\1)..)+')
+_STRIP = r'(?:\0.|[ _-])*'
+EDGE_SUBST_RE = re.compile(f'^\0.{_STRIP}|{_STRIP}\0.$')
+
+class LazyTable(dict):
+    """str.translate table that computes and keeps the mapping of unseen characters."""
+
+    def __init__(self, rule, prefill=range(128)):
+        super().__init__()
+        self.rule = rule
+        for code in prefill:
+            self[code] = rule(chr(code))
+
+    def __missing__(self, code):
+        value = self[code] = self.rule(chr(code))
+        return value
+
+def _yt_dlp_rule(restricted, new_rules):
+    # Mirrors yt-dlp's replace_insane(); "\0" marks a substitute character.
+    def rule(char):
+        if restricted and char in ACCENT_CHARS:
+            return ACCENT_CHARS[char]
+        elif not restricted and char == '\n':
+            return '\0 '
+        elif new_rules and not restricted and char in '"*:<>?|/\\':
+            # Replace with their full-width unicode counterparts
+            return {'/': '\u29F8', '\\': '\u29f9'}.get(char, chr(ord(char) + 0xfee0))
+        elif char == '?' or ord(char) < 32 or ord(char) == 127:
+            return ''
+        elif char == '"':
+            return '' if restricted else '\''
+        elif char == ':':
+            return '\0_\0-' if restricted else '\0 \0-'
+        elif char in '\\/|*<>':
+            return '\0_'
+        if restricted and (char in '!&\'()[]{}$;`^,#' or char.isspace() or ord(char) > 127):
+            return '' if unicodedata.category(char)[0] in 'CM' else '\0_'
+        return char
+    return rule
+
+_YT_DLP_TABLES = {
+    (restricted, new_rules): LazyTable(_yt_dlp_rule(restricted, new_rules),
+                                       itertools.chain(range(128), map(ord, ACCENT_CHARS)))
+    for restricted in (False, True) for new_rules in (False, True)
+}
+
+def _timestamp_colons(m):
+    return m.group(0).replace(':', '_')
+
+def yt_dlp(s, restricted=False, is_id=False):
+    """Sanitizes a string so it could be used as part of a filename.
+    @param restricted   Use a stricter subset of allowed characters
+    @param is_id        Whether this is an ID that should be kept unchanged if possible.
+                        If unset, yt-dlp's new sanitization rules are in effect
+    """
+    if s == '':
+        return ''
+    new_rules = is_id is False
+
+    # Replace look-alike Unicode glyphs
+    if restricted and (new_rules or not is_id):
+        s = unicodedata.normalize('NFKC', s)
+    if ':' in s:
+        s = TIMESTAMP_RE.sub(_timestamp_colons, s)
+    result = s.translate(_YT_DLP_TABLES[bool(restricted), new_rules])
+    if '\0' in result:
+        if new_rules:
+            result = REPEATED_SUBST_RE.sub(r'\1', result)
+            result = EDGE_SUBST_RE.sub('', result)
+        result = result.replace('\0', '')
+    result = result or '_'
+
+    if not is_id:
+        while '__' in result:
+            result = result.replace('__', '_')
+        result = result.strip('_')
+        # Common case of "Foreign band name - English song title"
+        if restricted and result.startswith('-_'):
+            result = result[2:]
+        if result.startswith('-'):
+            result = '_' + result[len('-'):]
+        result = result.lstrip('.')
+        if not result:
+            result = '_'
+    return result
+
+def truncate_bytes(s, max_bytes=MAX_BYTES, suffix='', encoding='utf-8'):
+    """Cut s so that s + suffix fits in max_bytes, never splitting a character."""
+    budget = max_bytes - len(suffix.encode(encoding))
+    # A character is at most 4 bytes in UTF-8, so short names skip the encode.
+    if len(s) * 4 <= budget:
+        return s + suffix
+    encoded = s.encode(encoding, errors='ignore')
+    if len(encoded) > budget:
+        s = encoded[:max(0, budget)].decode(encoding, errors='ignore')
+    return s + suffix
+
+_BASIC_TABLE = LazyTable(
+    lambda ch: '_' if ch in WINDOWS_FORBIDDEN else (ch if (31 < ord(ch) < 0x7f or ord(ch) > 0x9f) else ' '),
+    range(0xa0))
+
+def basic(name, max_bytes=MAX_BYTES):
+    """NFC-normalize, replace control chars with spaces and unsafe chars with "_",
+    then trim and truncate to max_bytes. Returns None when nothing is left."""
+    if name is None:
+        return None
+    name = unicodedata.normalize('NFC', name).translate(_BASIC_TABLE)
+
+    # Prevent path traversal and repeated dots
+    while '..' in name:
+        name = name.replace('..', '_')
+
+    name = name.strip().lstrip('.')
+    name = truncate_bytes(name, max_bytes)
+    return name or None
+
+@lru_cache(maxsize=None)
+def _windows_table(replacement):
+    table = {code: replacement for code in range(0x20)}
+    table.update((ord(ch), replacement) for ch in WINDOWS_FORBIDDEN)
+    return table
+
+def windows(s, replacement=''):
+    """Replace characters Windows forbids in filenames, and control chars, with replacement."""
+    if not isinstance(s, str):
+        raise TypeError("s must be a str")
+    return s.translate(_windows_table(replacement))
+
+_SPACES_TABLE = {ord(ch): ' ' for ch in WINDOWS_FORBIDDEN}
+
+def spaces(text):
+    """Turn characters Windows forbids into spaces and trim the result."""
+    if not text:
+        return ''
+    return str(text).translate(_SPACES_TABLE).strip()
+
+_ALNUM_TABLE = {code: None for code in range(128) if not chr(code).isalnum()}
+
+def alnum(filename):
+    """Keep ASCII letters and digits and every non-ASCII character."""
+    return filename.translate(_ALNUM_TABLE)
+
+PRESETS = {
+    'yt-dlp': yt_dlp,
+    'yt-dlp-restricted': lambda s: yt_dlp(s, restricted=True),
+    'basic': basic,
+    'windows': windows,
+    'spaces': spaces,
+    'alnum': alnum,
+}
+
+def sanitize(s, preset='yt-dlp'):
+    return PRESETS[preset](s)
+
+BENCH_SAMPLES = [
+    'Simple title 2024',
+    'Live at 12:30:45 - "Best of" <Remastered> | Part 1/2?',
+    'Café Français — Ærø Ødegård naïve façade',
+    '【MV】新曲「夜に駆ける」公式ミュージックビデオ 4K',
+    '  ...leading dots and\ttabs\nand newlines...  ',
+    'Ünïcödé ' * 20,
+]
+
+def bench(number):
+    print(f"{'preset':<20}{'us/call':>10}")
+    for name, func in PRESETS.items():
+        seconds = timeit.timeit(lambda: [func(s) for s in BENCH_SAMPLES], number=number)
+        print(f"{name:<20}{seconds / (number * len(BENCH_SAMPLES)) * 1e6:>10.2f}")
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        parser = argparse.ArgumentParser(description="Time every preset on a mix of sample titles.")
+        parser.add_argument('-n', '--number', type=int, default=20000, help="Rounds over the samples")
+        args = parser.parse_args(sys.argv[2:])
+        bench(args.number)
+        return
+    parser = argparse.ArgumentParser(description="Sanitize strings for use as filenames.")
+    parser.add_argument('preset', choices=sorted(PRESETS))
+    parser.add_argument('text', nargs='+')
+    args = parser.parse_args()
+    for text in args.text:
+        print(sanitize(text, args.preset))
+
+if __name__ == '__main__':
+    main()
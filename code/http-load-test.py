@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+http-load-test.py
+
+Usage:
+  python http-load-test.py [--url URL] [--concurrency N] [--duration S]
+                           [--small PATH ...] [--large PATH ...] [--large-ratio R]
+
+Replays a mix of small and large GET requests against http-server.py (or any
+HTTP server) from N keep-alive connections, then prints throughput and latency
+percentiles. If the server exposes /__metrics, its counters are printed too.
+"""
+
+import argparse
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+READ_CHUNK = 1024 * 1024
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+def make_connection(host, port, timeout):
+    return http.client.HTTPConnection(host, port, timeout=timeout)
+
+def worker(host, port, paths, large_ratio, deadline, timeout, gzip, results, lock):
+    small, large = paths
+    latencies = []
+    sizes = {'small': 0, 'large': 0}
+    counts = {'small': 0, 'large': 0}
+    errors = 0
+    conn = make_connection(host, port, timeout)
+    headers = {'Accept-Encoding': 'gzip, br'} if gzip else {}
+    rnd = random.Random()
+    while time.monotonic() < deadline:
+        kind = 'large' if large and (not small or rnd.random() < large_ratio) else 'small'
+        path = rnd.choice(large if kind == 'large' else small)
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            resp = conn.getresponse()
+            received = 0
+            while True:
+                chunk = resp.read(READ_CHUNK)
+                if not chunk:
+                    break
+                received += len(chunk)
+            if resp.status >= 400:
+                errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = make_connection(host, port, timeout)
+            continue
+        latencies.append((kind, time.perf_counter() - started))
+        sizes[kind] += received
+        counts[kind] += 1
+    conn.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+        for kind in ('small', 'large'):
+            results['bytes'][kind] += sizes[kind]
+            results['count'][kind] += counts[kind]
+
+def fetch_metrics(host, port, timeout):
+    conn = make_connection(host, port, timeout)
+    try:
+        conn.request('GET', '/__metrics')
+        resp = conn.getresponse()
+        body = resp.read()
+        if resp.status != 200:
+            return None
+        return json.loads(body)
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    finally:
+        conn.close()
+
+def fmt_ms(seconds):
+    return f"{seconds * 1000:.1f} ms"
+
+def print_latency_line(label, values):
+    values = sorted(values)
+    if not values:
+        return
+    print(f"{label:<6} n={len(values):<7} p50={fmt_ms(percentile(values, 50))} "
+          f"p90={fmt_ms(percentile(values, 90))} p99={fmt_ms(percentile(values, 99))} "
+          f"max={fmt_ms(values[-1])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load generator for http-server.py.")
+    parser.add_argument("--url", default="http://localhost:8000", help="Server base URL")
+    parser.add_argument("--concurrency", "-c", type=int, default=16, help="Number of concurrent connections")
+    parser.add_argument("--duration", "-d", type=float, default=10.0, help="Test duration in seconds")
+    parser.add_argument("--small", nargs="*", default=["/"], help="Paths of small files (e.g. /calc.html)")
+    parser.add_argument("--large", nargs="*", default=[], help="Paths of large files (e.g. /video.mp4)")
+    parser.add_argument("--large-ratio", type=float, default=0.1, help="Fraction of requests that hit large files")
+    parser.add_argument("--gzip", action="store_true", help="Send Accept-Encoding: gzip, br")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request socket timeout in seconds")
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    host = url.hostname or "localhost"
+    port = url.port or 80
+
+    results = {'latencies': [], 'errors': 0, 'bytes': {'small': 0, 'large': 0}, 'count': {'small': 0, 'large': 0}}
+    lock = threading.Lock()
+    before = fetch_metrics(host, port, args.timeout)
+
+    print(f"Running {args.concurrency} connections for {args.duration:.0f}s against {args.url}")
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(host, port, (args.small, args.large), args.large_ratio,
+                                              deadline, args.timeout, args.gzip, results, lock), daemon=True)
+        for _ in range(max(1, args.concurrency))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    total = sum(results['count'].values())
+    total_bytes = sum(results['bytes'].values())
+    print("\n=== Summary ===")
+    print(f"Requests: {total} ({results['errors']} errors) in {elapsed:.2f}s")
+    print(f"Throughput: {total / elapsed:.1f} req/s | {total_bytes / elapsed / (1024 * 1024):.2f} MB/s")
+    print_latency_line("all", [lat for _, lat in results['latencies']])
+    print_latency_line("small", [lat for kind, lat in results['latencies'] if kind == 'small'])
+    print_latency_line("large", [lat for kind, lat in results['latencies'] if kind == 'large'])
+
+    after = fetch_metrics(host, port, args.timeout)
+    if after is not None:
+        print("\n=== Server /__metrics ===")
+        requests = after['requests'] - (before['requests'] if before else 0)
+        sent = after['bytes_sent'] - (before['bytes_sent'] if before else 0)
+        print(f"Server-side requests: {requests} | bytes sent: {sent / (1024 * 1024):.2f} MB | "
+              f"in flight now: {after['in_flight']} | cache: {after['cache_entries']} entries")
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,381 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote, urlsplit
+import gzip
+import json
 import os
 import mimetypes
+import re
+import threading
+import time
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_FILE_SIZE = 2 * 1024 * 1024
+COMPRESSIBLE_TYPES = {'application/javascript', 'application/json', 'application/xml',
+                      'application/wasm', 'image/svg+xml', 'text/javascript'}
+
+def is_compressible(mime_type):
+    return mime_type.startswith('text/') or mime_type in COMPRESSIBLE_TYPES
+
+def guess_mime_type(file_path):
+    mime_type, _ = mimetypes.guess_type(file_path)
+    return mime_type or 'application/octet-stream'
+
+class AssetCache:
+    """Byte-bounded LRU of small files and their precompressed variants."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, max_file_size=CACHE_MAX_FILE_SIZE):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.entries = OrderedDict()
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def get(self, file_path, st):
+        if st.st_size > self.max_file_size:
+            return None
+        key = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry is not None and entry['key'] == key:
+                self.entries.move_to_end(file_path)
+                return entry
+
+        entry = self.load(file_path, key)
+        if entry is None:
+            return None
+        with self.lock:
+            old = self.entries.pop(file_path, None)
+            if old is not None:
+                self.total -= old['cost']
+            self.entries[file_path] = entry
+            self.total += entry['cost']
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.total -= evicted['cost']
+        return entry
+
+    def load(self, file_path, key):
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read(self.max_file_size + 1)
+        except OSError:
+            return None
+        if len(data) != key[1]:
+            return None
+        mime_type = guess_mime_type(file_path)
+        variants = {'identity': data}
+        if is_compressible(mime_type) and data:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz) < len(data):
+                variants['gzip'] = gz
+            if BROTLI_AVAILABLE:
+                br = brotli.compress(data, quality=11)
+                if len(br) < len(data):
+                    variants['br'] = br
+        return {'key': key, 'mime_type': mime_type, 'variants': variants,
+                'cost': sum(len(v) for v in variants.values())}
+
+ASSET_CACHE = AssetCache()
+
+METRICS_PATH = '/__metrics'
+METRICS_MAX_PATHS = 1000
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Metrics:
+    """Request counters and per-path latency histograms served at /__metrics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.in_flight = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self.paths = {}
+
+    def begin(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def end(self, path, status, bytes_sent, elapsed):
+        ms = elapsed * 1000
+        with self.lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.bytes_sent += bytes_sent
+            if path not in self.paths and len(self.paths) >= METRICS_MAX_PATHS:
+                path = '(other)'
+            stats = self.paths.get(path)
+            if stats is None:
+                stats = self.paths[path] = {
+                    'requests': 0, 'bytes_sent': 0, 'status': {}, 'latency_ms_sum': 0.0,
+                    'latency_ms_max': 0.0, 'latency_ms_buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            stats['requests'] += 1
+            stats['bytes_sent'] += bytes_sent
+            stats['status'][str(status)] = stats['status'].get(str(status), 0) + 1
+            stats['latency_ms_sum'] += ms
+            stats['latency_ms_max'] = max(stats['latency_ms_max'], ms)
+            bucket = next((i for i, le in enumerate(LATENCY_BUCKETS_MS) if ms <= le), len(LATENCY_BUCKETS_MS))
+            stats['latency_ms_buckets'][bucket] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'uptime_s': round(time.time() - self.started, 3),
+                'in_flight': self.in_flight,
+                'requests': self.requests,
+                'bytes_sent': self.bytes_sent,
+                'cache_bytes': ASSET_CACHE.total,
+                'cache_entries': len(ASSET_CACHE.entries),
+                'latency_buckets_ms': list(LATENCY_BUCKETS_MS) + ['+Inf'],
+                'paths': json.loads(json.dumps(self.paths)),
+            }
+
+METRICS = Metrics()
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+def choose_encoding(header, variants):
+    accepted = parse_accept_encoding(header)
+    for encoding in ('br', 'gzip'):
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in variants and q > 0:
+            return encoding
+    return 'identity'
 
 class StaticServer(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate sends; without TCP_NODELAY small
+    # keep-alive responses stall on Nagle + delayed ACK (~40 ms each).
+    disable_nagle_algorithm = True
+
     def do_GET(self):
-        if self.path == '/':
-            self.path = '/index.html'
-        
-        file_path = os.path.join(os.getcwd(), self.path.lstrip('/'))
-
-        if os.path.exists(file_path):
-            mime_type, _ = mimetypes.guess_type(file_path)
-            if mime_type is None:
-                mime_type = 'application/octet-stream'
-            
-            self.send_response(200)
-            self.send_header('Content-type', mime_type)
+        self.handle_measured(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_measured(send_body=False)
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
+    def handle_measured(self, send_body):
+        path = urlsplit(self.path).path
+        if path == METRICS_PATH:
+            self.send_metrics(send_body)
+            return
+        self.status_code = None
+        self.bytes_sent = 0
+        started = time.perf_counter()
+        METRICS.begin()
+        try:
+            self.serve(send_body)
+        finally:
+            METRICS.end(path, self.status_code, self.bytes_sent, time.perf_counter() - started)
+
+    def send_metrics(self, send_body):
+        body = json.dumps(METRICS.snapshot(), indent=2).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def resolve_path(self):
+        path = unquote(urlsplit(self.path).path)
+        if path == '/':
+            path = '/index.html'
+        root = os.path.realpath(os.getcwd())
+        file_path = os.path.realpath(os.path.join(root, path.lstrip('/')))
+        if os.path.commonpath([root, file_path]) != root:
+            return None
+        return file_path
+
+    def send_text(self, code, text):
+        body = text.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+            self.bytes_sent += len(body)
+
+    def not_modified(self, etag, mtime):
+        inm = self.headers.get('If-None-Match')
+        if inm is not None:
+            tags = [t.strip() for t in inm.split(',')]
+            return '*' in tags or etag in tags or ('W/' + etag) in tags
+        ims = self.headers.get('If-Modified-Since')
+        if ims:
+            try:
+                return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def parse_range(self, size, etag, last_modified):
+        header = self.headers.get('Range')
+        if not header:
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range not in (etag, last_modified):
+            return None
+        m = RANGE_RE.match(header.strip())
+        if not m or m.group(1) == m.group(2) == '':
+            return None
+        first, last = m.group(1), m.group(2)
+        if first == '':
+            length = int(last)
+            if length == 0:
+                return 'unsatisfiable'
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            return 'unsatisfiable'
+        return start, end
+
+    def serve_cached(self, entry, etag, last_modified, send_body):
+        variants = entry['variants']
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'), variants)
+        if encoding != 'identity':
+            etag = etag[:-1] + '-' + encoding + '"'
+        vary = len(variants) > 1
+
+        if self.not_modified(etag, entry['key'][0] / 1e9):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            if vary:
+                self.send_header('Vary', 'Accept-Encoding')
             self.end_headers()
-            with open(file_path, 'rb') as file:
-                self.wfile.write(file.read())
-        else:
-            self.send_response(404)
-            self.send_header('Content-type', 'text/plain')
+            return
+
+        body = variants[encoding]
+        self.send_response(200)
+        self.send_header('Content-type', entry['mime_type'])
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        if vary:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        if send_body:
+            try:
+                self.wfile.write(body)
+                self.bytes_sent += len(body)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+    def serve(self, send_body):
+        file_path = self.resolve_path()
+        try:
+            st = os.stat(file_path) if file_path is not None else None
+        except OSError:
+            st = None
+        if st is None or not os.path.isfile(file_path):
+            self.send_text(404, 'File not found')
+            return
+
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+        if 'Range' not in self.headers:
+            entry = ASSET_CACHE.get(file_path, st)
+            if entry is not None:
+                self.serve_cached(entry, etag, last_modified, send_body)
+                return
+
+        try:
+            f = open(file_path, 'rb')
+        except OSError:
+            self.send_text(404, 'File not found')
+            return
+
+        with f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            etag = f'"{st.st_mtime_ns:x}-{size:x}"'
+            last_modified = formatdate(st.st_mtime, usegmt=True)
+
+            if self.not_modified(etag, st.st_mtime):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', last_modified)
+                self.end_headers()
+                return
+
+            byte_range = self.parse_range(size, etag, last_modified)
+            if byte_range == 'unsatisfiable':
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            mime_type = guess_mime_type(file_path)
+
+            if byte_range is None:
+                start, end = 0, size - 1
+                self.send_response(200)
+            else:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            count = end - start + 1 if size else 0
+
+            self.send_header('Content-type', mime_type)
+            self.send_header('Content-Length', str(count))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
             self.end_headers()
-            self.wfile.write(b'File not found')
+
+            if send_body and count:
+                try:
+                    # socket.sendfile uses os.sendfile where available and falls back to send().
+                    self.bytes_sent += self.connection.sendfile(f, start, count)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+class StaticHTTPServer(ThreadingHTTPServer):
+    # The socketserver default backlog of 5 drops SYNs when many clients
+    # connect at once, which shows up as 1 s connect retries.
+    request_queue_size = 128
 
 def run_server():
     server_address = ('', 8000)
-    httpd = HTTPServer(server_address, StaticServer)
+    httpd = StaticHTTPServer(server_address, StaticServer)
     print('Server running at http://localhost:8000/')
     httpd.serve_forever()
 
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import subprocess
+import argparse
 import json
+import threading
 import time
 import os
 import sys
@@ -19,6 +21,11 @@ NUM_ROUNDS = 2
 
 DELAY_BETWEEN_TESTS = 10
 
+# Concurrent mode: sessions per level go 1, 2, 4, ... up to --concurrency.
+REQUESTS_PER_SESSION = 3
+# Throughput counts as saturated once a level reaches this share of the peak.
+SATURATION_SHARE = 0.9
+
 PROMPTS = [
     """Translate the following technical description of a new automotive braking system from German to English. Pay close attention to the precise terminology and ensure the tone is formal and instructive.
 
@@ -54,6 +61,12 @@ def calculate_std_dev(data):
     variance = sum((x - mean) ** 2 for x in data) / n
     return math.sqrt(variance)
 
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
 def check_curl_exists():
     try:
         subprocess.run(["which", "curl"], capture_output=True, check=True)
@@ -188,7 +201,152 @@ def run_single_test(prompt):
         print(f"\n❌ An unexpected error occurred: {e}")
         return None
 
+def timed_request(prompt):
+    """Send one request and time it on the client; returns a result dict or None."""
+    payload = {
+        "model": MODEL_NAME,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": MAX_TOKENS,
+        "temperature": 0.0,
+        "stream": False
+    }
+    command = ["curl", "-s", "-S", "--fail-with-body", "-H", "Content-Type: application/json"]
+    if OAI_API_KEY:
+        command += ["-H", f"Authorization: Bearer {OAI_API_KEY}"]
+    command += [f"{OAI_BASE_URL}/v1/chat/completions", "-d", json.dumps(payload)]
+
+    started = time.monotonic()
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
+        finished = time.monotonic()
+        data = json.loads(result.stdout)
+    except subprocess.CalledProcessError as e:
+        print(f"  ❌ Request failed: {(e.stderr or '').strip() or e} {(e.stdout or '').strip()}")
+        return None
+    except json.JSONDecodeError as e:
+        print(f"  ❌ Request failed: {e}")
+        return None
+    if not isinstance(data, dict) or not data.get("choices"):
+        print(f"  ❌ Request failed: no choices in response: {result.stdout.strip()[:200]}")
+        return None
+
+    eval_count, eval_duration_ns, prompt_eval_count, prompt_eval_duration_ns = parse_openai_timing_fields(data)
+    latency = finished - started
+    has_timings = isinstance(data, dict) and isinstance(data.get("timings"), dict)
+    server_seconds = (eval_duration_ns + prompt_eval_duration_ns) / 1_000_000_000 if has_timings else None
+    return {
+        "started": started,
+        "finished": finished,
+        "latency": latency,
+        "completion_tokens": eval_count,
+        "prompt_tokens": prompt_eval_count,
+        # Time spent waiting for a free slot: wall time the server did not account for.
+        "queue": max(0.0, latency - server_seconds) if server_seconds is not None else None,
+        "gen_throughput": eval_count / (eval_duration_ns / 1_000_000_000) if has_timings and eval_duration_ns > 1 else None,
+    }
+
+def run_level(sessions, requests_per_session):
+    """Run `sessions` parallel sessions, each sending its requests back to back."""
+    results = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def session(index):
+        for k in range(requests_per_session):
+            # Sessions start on different prompts so they are not all in the same phase.
+            r = timed_request(PROMPTS[(index + k) % len(PROMPTS)])
+            with lock:
+                if r:
+                    results.append(r)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(r["latency"] for r in results)
+    queues = sorted(r["queue"] for r in results if r["queue"] is not None)
+    per_request = [r["gen_throughput"] for r in results if r["gen_throughput"] is not None]
+    completion_tokens = sum(r["completion_tokens"] for r in results)
+    return {
+        "sessions": sessions,
+        "requests": len(results),
+        "errors": errors[0],
+        "elapsed": elapsed,
+        "aggregate_tps": completion_tokens / elapsed if elapsed > 0 else 0.0,
+        "per_request_tps": calculate_mean(per_request),
+        "latency": {p: percentile(latencies, p) for p in (50, 90, 99)},
+        "queue": {p: percentile(queues, p) for p in (50, 99)} if queues else None,
+    }
+
+def sweep_levels(max_sessions):
+    levels = []
+    n = 1
+    while n < max_sessions:
+        levels.append(n)
+        n *= 2
+    levels.append(max_sessions)
+    return levels
+
+def run_sweep(max_sessions, requests_per_session):
+    levels = sweep_levels(max_sessions)
+    print(f"🔬 Concurrency sweep over {levels} session(s), {requests_per_session} request(s) per session...")
+
+    summaries = []
+    for i, sessions in enumerate(levels):
+        print(f"\n--- {sessions} concurrent session(s) ---")
+        summary = run_level(sessions, requests_per_session)
+        summaries.append(summary)
+        print(f"  {summary['requests']} ok, {summary['errors']} failed in {summary['elapsed']:.1f}s, "
+              f"aggregate {summary['aggregate_tps']:.2f} tokens/s")
+        if i < len(levels) - 1:
+            time.sleep(DELAY_BETWEEN_TESTS)
+
+    if not any(s["requests"] for s in summaries):
+        print("\n🚫 No valid test results were collected. Cannot generate a summary.")
+        sys.exit(1)
+
+    print("\n\n" + "=" * 60)
+    print("📊 Concurrency Sweep Summary Report")
+    print("=" * 60)
+    print(f"{'sessions':>8} {'agg tok/s':>10} {'req tok/s':>10} {'p50 lat':>8} {'p90 lat':>8} {'p99 lat':>8} "
+          f"{'p50 queue':>9} {'p99 queue':>9} {'errors':>6}")
+    for s in summaries:
+        queue = s["queue"]
+        q50 = f"{queue[50]:.2f}s" if queue else "n/a"
+        q99 = f"{queue[99]:.2f}s" if queue else "n/a"
+        print(f"{s['sessions']:>8} {s['aggregate_tps']:>10.2f} {s['per_request_tps']:>10.2f} "
+              f"{s['latency'][50]:>7.2f}s {s['latency'][90]:>7.2f}s {s['latency'][99]:>7.2f}s "
+              f"{q50:>9} {q99:>9} {s['errors']:>6}")
+
+    peak = max(summaries, key=lambda s: s["aggregate_tps"])
+    saturated = next(s for s in summaries if s["aggregate_tps"] >= SATURATION_SHARE * peak["aggregate_tps"])
+    print("-" * 60)
+    print(f"Peak aggregate throughput: {peak['aggregate_tps']:.2f} tokens/s at {peak['sessions']} session(s)")
+    print(f"Saturation point: {saturated['sessions']} session(s) already reach "
+          f"{SATURATION_SHARE:.0%} of peak; more sessions mostly add queueing delay.")
+    print(f"   (Size llama-server's -np / slot count around {saturated['sessions']}.)")
+    print("\n" + "=" * 60)
+    print("✅ Testing complete.")
+
 def main():
+    global OAI_BASE_URL, MODEL_NAME
+    parser = argparse.ArgumentParser(description="Benchmark an OpenAI-compatible llama.cpp server.")
+    parser.add_argument("--url", default=OAI_BASE_URL, help=f"Server base URL (default {OAI_BASE_URL})")
+    parser.add_argument("--model", default=MODEL_NAME, help=f"Model name (default {MODEL_NAME})")
+    parser.add_argument("--concurrency", "-c", type=int, default=0,
+                        help="Sweep 1, 2, 4 ... N parallel sessions instead of the single-user test")
+    parser.add_argument("--requests-per-session", type=int, default=REQUESTS_PER_SESSION,
+                        help=f"Requests each session sends per level (default {REQUESTS_PER_SESSION})")
+    args = parser.parse_args()
+    OAI_BASE_URL = args.url
+    MODEL_NAME = args.model
+
     check_curl_exists()
 
     print("=" * 60)
@@ -203,6 +361,10 @@ def main():
 
     run_warmup()
 
+    if args.concurrency > 0:
+        run_sweep(args.concurrency, max(1, args.requests_per_session))
+        return
+
     all_results = []
     total_tests = NUM_ROUNDS * len(PROMPTS)
 
@@ -0,0 +1,415 @@
+"""
+media_header.py
+
+Read-only MP4/MOV and Matroska/WebM header parser.
+
+read_header(path) walks the MP4 box tree (moov/mvhd/trak/tkhd/mdia/udta/meta/ilst)
+or the Matroska EBML tree (Segment/Info/Tracks/Tags) without decoding any media
+and returns a dict shaped like ffprobe's -show_format -show_streams JSON:
+
+  {"streams": [{"codec_type": "video", "width": 1920, "height": 1080, ...}, ...],
+   "format": {"duration": "12.345", "tags": {"title": ..., "comment": ...}}}
+
+It returns None whenever the file is not one of these containers or the
+structure is not what the parser expects, so callers can fall back to ffprobe.
+"""
+
+import struct
+
+MP4_EXTS = {".mp4", ".m4v", ".m4a", ".mov", ".3gp"}
+MKV_EXTS = {".mkv", ".webm", ".mka"}
+
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+MAX_EBML_ELEMENT = 16 * 1024 * 1024
+
+MP4_CODECS = {
+    "avc1": "h264", "avc3": "h264", "hvc1": "hevc", "hev1": "hevc", "av01": "av1",
+    "vp09": "vp9", "mp4v": "mpeg4", "mp4a": "aac", "Opus": "opus", "ac-3": "ac3",
+    "ec-3": "eac3", "fLaC": "flac", ".mp3": "mp3", "alac": "alac",
+}
+
+MP4_TAGS = {
+    b"\xa9nam": "title", b"\xa9cmt": "comment", b"\xa9ART": "artist", b"\xa9alb": "album",
+    b"\xa9day": "date", b"\xa9too": "encoder", b"desc": "description", b"ldes": "synopsis",
+}
+
+MKV_CODECS = {
+    "V_MPEG4/ISO/AVC": "h264", "V_MPEGH/ISO/HEVC": "hevc", "V_VP8": "vp8", "V_VP9": "vp9",
+    "V_AV1": "av1", "A_AAC": "aac", "A_OPUS": "opus", "A_VORBIS": "vorbis", "A_FLAC": "flac",
+    "A_AC3": "ac3", "A_EAC3": "eac3", "A_DTS": "dts", "A_MPEG/L3": "mp3", "S_TEXT/UTF8": "subrip",
+    "S_TEXT/ASS": "ass", "S_HDMV/PGS": "hdmv_pgs_subtitle",
+}
+
+MKV_TRACK_TYPES = {1: "video", 2: "audio", 17: "subtitle"}
+
+def read_header(path):
+    name = str(path).lower()
+    try:
+        with open(path, "rb") as f:
+            if any(name.endswith(ext) for ext in MP4_EXTS):
+                return _read_mp4(f)
+            if any(name.endswith(ext) for ext in MKV_EXTS):
+                return _read_mkv(f)
+    except (OSError, ValueError, IndexError, struct.error, UnicodeDecodeError):
+        return None
+    return None
+
+def _result(streams, duration, tags):
+    # Fragmented MP4 and live-recorded MKV carry no usable duration in the
+    # header; leave those to ffprobe rather than report 0 s.
+    if not streams or not duration:
+        return None
+    fmt = {"tags": tags} if tags else {}
+    fmt["duration"] = f"{duration:.6f}"
+    return {"streams": streams, "format": fmt, "_source": "header"}
+
+# ---------------------------------------------------------------- MP4 boxes
+
+def _iter_boxes(buf, start, end):
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise ValueError("truncated box")
+        yield kind, pos + header, pos + size
+        pos += size
+
+def _find(buf, start, end, *path):
+    for kind, body, stop in _iter_boxes(buf, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return body, stop
+            return _find(buf, body, stop, *path[1:])
+    return None
+
+def _read_moov(f):
+    f.seek(0, 2)
+    file_size = f.tell()
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        size, kind = struct.unpack_from(">I4s", header)
+        hdr = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            hdr = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < hdr:
+            return None
+        if kind == b"moov":
+            if size > MAX_MOOV_SIZE:
+                return None
+            f.seek(pos + hdr)
+            data = f.read(size - hdr)
+            return data if len(data) == size - hdr else None
+        pos += size
+    return None
+
+def _ilst_value(buf, body, stop):
+    found = _find(buf, body, stop, b"data")
+    if not found:
+        return None
+    start, end = found
+    data_type = struct.unpack_from(">I", buf, start)[0] & 0xFFFFFF
+    if data_type != 1:
+        return None
+    return buf[start + 8:end].decode("utf-8", errors="replace")
+
+def _mp4_tags(moov):
+    tags = {}
+    udta = _find(moov, 0, len(moov), b"udta")
+    if not udta:
+        return tags
+    meta = _find(moov, udta[0], udta[1], b"meta")
+    if meta:
+        start, end = meta
+        # ISO meta is a full box (4 bytes version/flags); QuickTime meta is not.
+        if end - start >= 8 and moov[start + 4:start + 8] != b"hdlr":
+            start += 4
+        ilst = _find(moov, start, end, b"ilst")
+        if ilst:
+            for kind, body, stop in _iter_boxes(moov, ilst[0], ilst[1]):
+                key = MP4_TAGS.get(kind)
+                if key:
+                    value = _ilst_value(moov, body, stop)
+                    if value is not None:
+                        tags[key] = value
+    for kind, body, stop in _iter_boxes(moov, udta[0], udta[1]):
+        key = MP4_TAGS.get(kind)
+        if key and key not in tags and stop - body >= 4 and kind.startswith(b"\xa9"):
+            length = struct.unpack_from(">H", moov, body)[0]
+            tags[key] = moov[body + 4:body + 4 + length].decode("utf-8", errors="replace")
+    return tags
+
+def _full_box_times(buf, start):
+    version = buf[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", buf, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", buf, start + 12)
+    return timescale, duration
+
+def _mp4_track(moov, body, stop):
+    mdia = _find(moov, body, stop, b"mdia")
+    if not mdia:
+        return None
+    hdlr = _find(moov, mdia[0], mdia[1], b"hdlr")
+    if not hdlr:
+        return None
+    handler = moov[hdlr[0] + 8:hdlr[0] + 12]
+    codec_type = {b"vide": "video", b"soun": "audio", b"sbtl": "subtitle", b"text": "subtitle"}.get(handler)
+    if codec_type is None:
+        return None
+    stream = {"codec_type": codec_type}
+
+    mdhd = _find(moov, mdia[0], mdia[1], b"mdhd")
+    if mdhd:
+        timescale, duration = _full_box_times(moov, mdhd[0])
+        if timescale:
+            stream["duration"] = f"{duration / timescale:.6f}"
+
+    stsd = _find(moov, mdia[0], mdia[1], b"minf", b"stbl", b"stsd")
+    if stsd and stsd[1] - stsd[0] >= 16:
+        entry = stsd[0] + 8
+        fourcc = moov[entry + 4:entry + 8].decode("latin-1")
+        stream["codec_tag_string"] = fourcc
+        if fourcc in MP4_CODECS:
+            stream["codec_name"] = MP4_CODECS[fourcc]
+        if codec_type == "video" and stsd[1] - entry >= 36:
+            width, height = struct.unpack_from(">HH", moov, entry + 32)
+            stream["width"], stream["height"] = width, height
+
+    if codec_type == "video" and not stream.get("width"):
+        tkhd = _find(moov, body, stop, b"tkhd")
+        if tkhd:
+            offset = tkhd[0] + (88 if moov[tkhd[0]] == 1 else 76)
+            width, height = struct.unpack_from(">II", moov, offset)
+            stream["width"], stream["height"] = width >> 16, height >> 16
+    return stream
+
+def _read_mp4(f):
+    moov = _read_moov(f)
+    if moov is None:
+        return None
+    duration = 0.0
+    mvhd = _find(moov, 0, len(moov), b"mvhd")
+    if mvhd:
+        timescale, units = _full_box_times(moov, mvhd[0])
+        # All ones means "unknown" (fragmented files).
+        if timescale and units not in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+            duration = units / timescale
+    streams = []
+    for kind, body, stop in _iter_boxes(moov, 0, len(moov)):
+        if kind == b"trak":
+            stream = _mp4_track(moov, body, stop)
+            if stream is not None:
+                stream["index"] = len(streams)
+                streams.append(stream)
+    return _result(streams, duration, _mp4_tags(moov))
+
+# ----------------------------------------------------------- Matroska EBML
+
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TITLE = 0x7BA9
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+TAGS = 0x1254C367
+TAG = 0x7373
+TARGETS = 0x63C0
+TARGET_UIDS = {0x63C5, 0x63C9, 0x63C4, 0x63C6}
+SIMPLE_TAG = 0x67C8
+TAG_NAME = 0x45A3
+TAG_STRING = 0x4487
+CLUSTER = 0x1F43B675
+UNKNOWN_SIZE = -1
+
+def _vint(data, pos, keep_marker):
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or len(data) < pos + length:
+        raise ValueError("bad EBML vint")
+    value = first if keep_marker else first & (mask - 1)
+    for b in data[pos + 1:pos + length]:
+        value = (value << 8) | b
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = UNKNOWN_SIZE
+    return value, pos + length
+
+def _read_element_header(f):
+    head = f.read(12)
+    if len(head) < 2:
+        return None
+    element_id, pos = _vint(head, 0, True)
+    size, pos = _vint(head, pos, False)
+    f.seek(pos - len(head), 1)
+    return element_id, size
+
+def _iter_elements(data, start, end):
+    pos = start
+    while pos < end:
+        element_id, pos = _vint(data, pos, True)
+        size, pos = _vint(data, pos, False)
+        if size == UNKNOWN_SIZE or pos + size > end:
+            size = end - pos
+        yield element_id, pos, pos + size
+        pos += size
+
+def _uint(data, start, end):
+    return int.from_bytes(data[start:end], "big") if end > start else 0
+
+def _float(data, start, end):
+    if end - start == 4:
+        return struct.unpack(">f", data[start:end])[0]
+    if end - start == 8:
+        return struct.unpack(">d", data[start:end])[0]
+    return 0.0
+
+def _text(data, start, end):
+    return data[start:end].rstrip(b"\x00").decode("utf-8", errors="replace")
+
+def _mkv_info(data, info):
+    scale = 1000000
+    duration = 0.0
+    for element_id, start, end in _iter_elements(data, 0, len(data)):
+        if element_id == TIMECODE_SCALE:
+            scale = _uint(data, start, end)
+        elif element_id == DURATION:
+            duration = _float(data, start, end)
+        elif element_id == TITLE:
+            info["tags"]["title"] = _text(data, start, end)
+    info["duration"] = duration * scale / 1e9
+
+def _mkv_tracks(data, info):
+    for element_id, start, end in _iter_elements(data, 0, len(data)):
+        if element_id != TRACK_ENTRY:
+            continue
+        stream = {}
+        for child_id, c_start, c_end in _iter_elements(data, start, end):
+            if child_id == TRACK_TYPE:
+                stream["codec_type"] = MKV_TRACK_TYPES.get(_uint(data, c_start, c_end), "data")
+            elif child_id == CODEC_ID:
+                codec_id = _text(data, c_start, c_end)
+                stream["codec_tag_string"] = codec_id
+                if codec_id in MKV_CODECS:
+                    stream["codec_name"] = MKV_CODECS[codec_id]
+            elif child_id == VIDEO:
+                for v_id, v_start, v_end in _iter_elements(data, c_start, c_end):
+                    if v_id == PIXEL_WIDTH:
+                        stream["width"] = _uint(data, v_start, v_end)
+                    elif v_id == PIXEL_HEIGHT:
+                        stream["height"] = _uint(data, v_start, v_end)
+        if "codec_type" in stream:
+            stream["index"] = len(info["streams"])
+            info["streams"].append(stream)
+
+def _mkv_tags(data, info):
+    for tag_id, t_start, t_end in _iter_elements(data, 0, len(data)):
+        if tag_id != TAG:
+            continue
+        global_tag = True
+        simple = []
+        for child_id, c_start, c_end in _iter_elements(data, t_start, t_end):
+            if child_id == TARGETS:
+                # Only global (untargeted) tags map to ffprobe's format tags.
+                target_ids = {e for e, _, _ in _iter_elements(data, c_start, c_end)}
+                global_tag = not target_ids & TARGET_UIDS
+            elif child_id == SIMPLE_TAG:
+                name = value = None
+                for s_id, s_start, s_end in _iter_elements(data, c_start, c_end):
+                    if s_id == TAG_NAME:
+                        name = _text(data, s_start, s_end)
+                    elif s_id == TAG_STRING:
+                        value = _text(data, s_start, s_end)
+                if name and value is not None:
+                    simple.append((name.lower(), value))
+        if global_tag:
+            for name, value in simple:
+                info["tags"].setdefault(name, value)
+
+def _read_mkv(f):
+    header = _read_element_header(f)
+    if header is None or header[0] != EBML_HEADER:
+        return None
+    f.seek(header[1], 1)
+    segment = _read_element_header(f)
+    if segment is None or segment[0] != SEGMENT:
+        return None
+    segment_start = f.tell()
+    f.seek(0, 2)
+    file_size = f.tell()
+    segment_end = file_size if segment[1] == UNKNOWN_SIZE else min(file_size, segment_start + segment[1])
+
+    handlers = {INFO: _mkv_info, TRACKS: _mkv_tracks, TAGS: _mkv_tags}
+    info = {"streams": [], "tags": {}, "duration": 0.0}
+    seen = set()
+    seek_targets = {}
+    pos = segment_start
+    while pos < segment_end:
+        f.seek(pos)
+        element = _read_element_header(f)
+        if element is None:
+            break
+        element_id, size = element
+        body = f.tell()
+        if element_id == CLUSTER or size == UNKNOWN_SIZE:
+            break
+        if element_id in handlers or element_id == SEEK_HEAD:
+            if size > MAX_EBML_ELEMENT:
+                return None
+            data = f.read(size)
+            if element_id == SEEK_HEAD:
+                for seek_id, s_start, s_end in _iter_elements(data, 0, len(data)):
+                    if seek_id != SEEK:
+                        continue
+                    target = position = None
+                    for child_id, c_start, c_end in _iter_elements(data, s_start, s_end):
+                        if child_id == SEEK_ID:
+                            target = _uint(data, c_start, c_end)
+                        elif child_id == SEEK_POSITION:
+                            position = _uint(data, c_start, c_end)
+                    if target in handlers and position is not None:
+                        seek_targets.setdefault(target, segment_start + position)
+            else:
+                handlers[element_id](data, info)
+                seen.add(element_id)
+        pos = body + size
+
+    # Tags (and sometimes Tracks) are often written after the clusters.
+    for element_id, position in seek_targets.items():
+        if element_id in seen or position >= segment_end:
+            continue
+        f.seek(position)
+        element = _read_element_header(f)
+        if element is None or element[0] != element_id or element[1] > MAX_EBML_ELEMENT:
+            continue
+        handlers[element_id](f.read(element[1]), info)
+        seen.add(element_id)
+
+    if TRACKS not in seen:
+        return None
+    return _result(info["streams"], info["duration"], info["tags"])
@@ -0,0 +1,299 @@
+"""
+media_probe.py
+
+Shared ffprobe layer for the ffprobe/ffmpeg/yt-dlp helper scripts.
+
+Every file is probed once with
+  ffprobe -v error -print_format json -show_format -show_streams
+and the parsed result is cached persistently in SQLite, keyed by absolute path,
+size and mtime. Repeated runs over the same library serve resolution, duration,
+audio and tag queries from the cache without spawning ffprobe.
+
+Cache location: $MEDIA_PROBE_CACHE, or ~/.media-probe-cache.sqlite.
+Set MEDIA_PROBE_CACHE to an empty string to disable the persistent cache.
+
+probe_many() probes a batch of files on a thread pool, limits how many ffprobe
+processes run against the same device at once, and yields results as they
+complete. Cache hits are yielded immediately without taking a worker.
+
+MP4/MOV and Matroska/WebM files are first read in-process by media_header.py,
+which covers streams, resolution, duration and title/comment tags; ffprobe is
+only spawned when that parse fails or when full=True asks for a real probe.
+If ffprobe is missing, probe() and probe_many() warn once and report such
+files as None instead of raising.
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import media_header
+
+FFPROBE_CANDIDATES = ["./ffprobe.exe", "ffprobe"]
+DEFAULT_CACHE_PATH = Path.home() / ".media-probe-cache.sqlite"
+
+PROBE_TIMEOUT = 120
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 4) * 2)
+PER_DEVICE_LIMIT = 8
+# In-process results kept on top of the SQLite cache, least recently used evicted first.
+MEMO_SIZE = 2048
+
+_ffprobe_cmd = None
+_ffprobe_lock = threading.Lock()
+_missing_warned = False
+
+def find_ffprobe():
+    global _ffprobe_cmd
+    with _ffprobe_lock:
+        if _ffprobe_cmd is None:
+            for cmd in FFPROBE_CANDIDATES:
+                try:
+                    subprocess.run([cmd, "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                    _ffprobe_cmd = cmd
+                    break
+                except Exception:
+                    continue
+        return _ffprobe_cmd
+
+def run_ffprobe(path, timeout=PROBE_TIMEOUT):
+    ffprobe = find_ffprobe()
+    if ffprobe is None:
+        raise RuntimeError("ffprobe not found. Make sure ./ffprobe.exe exists or ffprobe is on PATH.")
+    cmd = [
+        ffprobe,
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        str(path),
+    ]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f"media_probe: ffprobe timed out after {timeout}s: {path}")
+        return None
+    if proc.returncode != 0:
+        return None
+    try:
+        return json.loads(proc.stdout.decode("utf-8", errors="replace"))
+    except json.JSONDecodeError:
+        return None
+
+def _run_ffprobe_or_warn(path, timeout=PROBE_TIMEOUT):
+    global _missing_warned
+    if find_ffprobe() is None:
+        with _ffprobe_lock:
+            if not _missing_warned:
+                _missing_warned = True
+                print("media_probe: ffprobe not found (./ffprobe.exe or ffprobe on PATH); "
+                      "files the header parser cannot read are reported as unprobed.")
+        return None
+    return run_ffprobe(path, timeout=timeout)
+
+class ProbeCache:
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, path, size, mtime_ns):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, path, size, mtime_ns, info):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO probes (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, json.dumps(info, ensure_ascii=False)),
+            )
+            self.conn.commit()
+
+_cache = None
+_cache_lock = threading.Lock()
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            location = os.environ.get("MEDIA_PROBE_CACHE", str(DEFAULT_CACHE_PATH))
+            if not location:
+                return None
+            try:
+                _cache = ProbeCache(location)
+            except sqlite3.Error as e:
+                print(f"media_probe: cache disabled ({location}: {e})")
+                os.environ["MEDIA_PROBE_CACHE"] = ""
+                return None
+        return _cache
+
+def _memo_get(key):
+    with _memo_lock:
+        info = _memo.get(key)
+        if info is not None:
+            _memo.move_to_end(key)
+        return info
+
+def _memo_put(key, info):
+    with _memo_lock:
+        _memo[key] = info
+        _memo.move_to_end(key)
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+
+def _usable(info, full):
+    if info is None or info.get("_source") != "header":
+        return info is not None
+    # Header results without a duration (cached by older versions) are re-probed.
+    return not full and "duration" in (info.get("format") or {})
+
+def _lookup(path, full=False):
+    try:
+        abspath = os.path.abspath(str(path))
+        st = os.stat(abspath)
+    except OSError:
+        return None, None, None
+    key = (abspath, st.st_size, st.st_mtime_ns)
+    info = _memo_get(key)
+    if not _usable(info, full):
+        info = None
+        cache = get_cache()
+        if cache is not None:
+            info = cache.get(*key)
+            if not _usable(info, full):
+                info = None
+            elif info is not None:
+                _memo_put(key, info)
+    return key, st.st_dev, info
+
+def _probe_key(key, timeout=PROBE_TIMEOUT, full=False):
+    info = None if full else media_header.read_header(key[0])
+    if info is None:
+        info = _run_ffprobe_or_warn(key[0], timeout=timeout)
+    if info is None:
+        return None
+    cache = get_cache()
+    if cache is not None:
+        cache.put(*key, info)
+    _memo_put(key, info)
+    return info
+
+def probe(path, timeout=PROBE_TIMEOUT, full=False, cache=True):
+    """
+    Return ffprobe's format/streams JSON for path, or None if it cannot be probed.
+    cache=False bypasses the memo and the persistent cache, for temporary files
+    that are about to be renamed or deleted.
+    """
+    if not cache:
+        info = None if full else media_header.read_header(path)
+        return info if info is not None else _run_ffprobe_or_warn(path, timeout=timeout)
+    key, _, info = _lookup(path, full)
+    if key is None or info is not None:
+        return info
+    return _probe_key(key, timeout=timeout, full=full)
+
+def probe_many(paths, workers=DEFAULT_WORKERS, per_device=PER_DEVICE_LIMIT, timeout=PROBE_TIMEOUT, full=False):
+    """
+    Yield (path, info) for every path as results arrive; info is None on failure.
+    paths may be a lazy iterable: probes are submitted while it is still being
+    walked, so a large scan does not have to finish before work starts.
+    """
+    pending = {}
+    running = {}
+    per_dev_running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        def fill():
+            for device, queue in pending.items():
+                while queue and per_dev_running[device] < per_device and len(running) < workers:
+                    path, key = queue.popleft()
+                    fut = ex.submit(_probe_key, key, timeout, full)
+                    running[fut] = (path, device)
+                    per_dev_running[device] += 1
+
+        def collect(timeout):
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            results = []
+            for fut in done:
+                path, device = running.pop(fut)
+                per_dev_running[device] -= 1
+                results.append((path, fut.result()))
+            fill()
+            return results
+
+        for path in paths:
+            key, device, info = _lookup(path, full)
+            if key is None or info is not None:
+                yield path, info
+                continue
+            pending.setdefault(device, deque()).append((path, key))
+            per_dev_running.setdefault(device, 0)
+            fill()
+            yield from collect(0)
+        while running:
+            yield from collect(None)
+
+def streams(info, codec_type=None):
+    items = (info or {}).get("streams") or []
+    if codec_type is None:
+        return items
+    return [s for s in items if s.get("codec_type") == codec_type]
+
+def video_resolution(info):
+    for s in streams(info, "video"):
+        if (s.get("disposition") or {}).get("attached_pic"):
+            continue
+        return int(s.get("width") or 0), int(s.get("height") or 0)
+    return None, None
+
+def audio_stream_count(info):
+    return len(streams(info, "audio"))
+
+def has_audio(info):
+    return audio_stream_count(info) > 0
+
+def duration(info):
+    fmt = (info or {}).get("format") or {}
+    try:
+        return float(fmt["duration"])
+    except (KeyError, TypeError, ValueError):
+        pass
+    values = []
+    for s in streams(info):
+        try:
+            values.append(float(s["duration"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return max(values) if values else 0.0
+
+def format_tags(info):
+    return ((info or {}).get("format") or {}).get("tags") or {}
+
+def tag(info, name):
+    tags = format_tags(info)
+    if name in tags:
+        return str(tags[name])
+    lowered = name.lower()
+    for key, value in tags.items():
+        if key.lower() == lowered:
+            return str(value)
+    return None
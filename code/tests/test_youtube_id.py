@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import youtube_id
+
+
+class VideoIdTest(unittest.TestCase):
+    def test_accepted_url_forms(self):
+        cases = {
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ": "dQw4w9WgXcQ",
+            "see https://youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42s": "dQw4w9WgXcQ",
+            "youtu.be/dQw4w9WgXcQ?si=abc": "dQw4w9WgXcQ",
+            "(https://m.youtube.com/embed/dQw4w9WgXcQ)": "dQw4w9WgXcQ",
+            "https://music.youtube.com/v/dQw4w9WgXcQ": "dQw4w9WgXcQ",
+            "https://www.youtube.com/shorts/dQw4w9WgXcQ": "dQw4w9WgXcQ",
+            "https://www.youtube.com/live/dQw4w9WgXcQ": "dQw4w9WgXcQ",
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(youtube_id.video_id(text), expected)
+
+    def test_rejected(self):
+        for text in (
+            "https://evil.com/youtube.com/dQw4w9WgXcQ",
+            "https://evil.com/?u=https://youtu.be/dQw4w9WgXcQ",
+            "https://www.youtube.com/playlist/PLdQw4w9WgX",
+            "https://www.youtube.com/channel/UCdQw4w9WgX",
+            "no url here",
+            None,
+        ):
+            with self.subTest(text=text):
+                self.assertIsNone(youtube_id.video_id(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
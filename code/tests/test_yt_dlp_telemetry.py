@@ -0,0 +1,82 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+_spec = importlib.util.spec_from_file_location("yt_dlp_script", os.path.join(CODE_DIR, "yt-dlp.py"))
+yt_dlp_script = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(yt_dlp_script)
+
+# yt-dlp 2024.x output for a channel tab where the first video is downloaded
+# and the second is already in the --download-archive file.
+DOWNLOAD_THEN_ARCHIVE_SKIP = r"""[youtube:tab] Extracting URL: https://www.youtube.com/@chan/videos
+[youtube:tab] @chan/videos: Downloading webpage
+[download] Downloading playlist: chan - Videos
+[youtube:tab] Playlist chan - Videos: Downloading 2 items of 2
+[download] Downloading item 1 of 2
+[youtube] Extracting URL: https://www.youtube.com/watch?v=dQw4w9WgXcQ
+[youtube] dQw4w9WgXcQ: Downloading webpage
+[youtube] dQw4w9WgXcQ: Downloading ios player API JSON
+[youtube] dQw4w9WgXcQ: Downloading m3u8 information
+[info] dQw4w9WgXcQ: Downloading 1 format(s): 136+140
+[download] Destination: .\download\chan\Title_[dQw4w9WgXcQ].f136.mp4
+[download]   0.0% of   10.00MiB at  Unknown B/s ETA Unknown
+[download]  50.0% of   10.00MiB at    2.00MiB/s ETA 00:02
+[download] 100% of   10.00MiB in 00:00:05 at 2.00MiB/s
+[download] Destination: .\download\chan\Title_[dQw4w9WgXcQ].f140.m4a
+[download] 100% of    3.00MiB in 00:00:01 at 3.00MiB/s
+[Merger] Merging formats into ".\download\chan\Title_[dQw4w9WgXcQ].mp4"
+Deleting original file .\download\chan\Title_[dQw4w9WgXcQ].f136.mp4 (pass -k to keep)
+Deleting original file .\download\chan\Title_[dQw4w9WgXcQ].f140.m4a (pass -k to keep)
+[download] Downloading item 2 of 2
+[download] 9bZkp7q19f0: has already been recorded in the archive
+[download] Finished downloading playlist: chan - Videos
+"""
+
+DOWNLOAD_THEN_FILE_SKIP = r"""[youtube] dQw4w9WgXcQ: Downloading webpage
+[info] dQw4w9WgXcQ: Downloading 1 format(s): 18
+[download] Destination: .\download\chan\Title_[dQw4w9WgXcQ].mp4
+[download] 100% of    5.00MiB in 00:00:02 at 2.50MiB/s
+[youtube] 9bZkp7q19f0: Downloading webpage
+[info] 9bZkp7q19f0: Downloading 1 format(s): 18
+[download] .\download\chan\Other_[9bZkp7q19f0].mp4 has already been downloaded
+"""
+
+class DownloadTelemetryTest(unittest.TestCase):
+    def setUp(self):
+        self.saved_path = yt_dlp_script.telemetry_path
+        yt_dlp_script.telemetry_path = ""
+        yt_dlp_script._telemetry_records.clear()
+
+    def tearDown(self):
+        yt_dlp_script.telemetry_path = self.saved_path
+        yt_dlp_script._telemetry_records.clear()
+
+    def run_output(self, text):
+        telemetry = yt_dlp_script.DownloadTelemetry("chan", "job", {})
+        now = 0.0
+        for line in text.splitlines():
+            now += 1.0
+            telemetry.feed(line, yt_dlp_script.parse_progress(line), now)
+        telemetry.finish(now + 1.0)
+        return {r["video_id"]: r for r in yt_dlp_script._telemetry_records}
+
+    def test_archive_skip_after_download(self):
+        records = self.run_output(DOWNLOAD_THEN_ARCHIVE_SKIP)
+        self.assertEqual(set(records), {"dQw4w9WgXcQ", "9bZkp7q19f0"})
+        self.assertEqual(records["dQw4w9WgXcQ"]["status"], "downloaded")
+        self.assertEqual(records["dQw4w9WgXcQ"]["streams"], 2)
+        self.assertEqual(records["dQw4w9WgXcQ"]["bytes"], 13 * 1024 * 1024)
+        self.assertIsNotNone(records["dQw4w9WgXcQ"]["merge_seconds"])
+        self.assertEqual(records["9bZkp7q19f0"]["status"], "skipped")
+
+    def test_already_downloaded_after_download(self):
+        records = self.run_output(DOWNLOAD_THEN_FILE_SKIP)
+        self.assertEqual(records["dQw4w9WgXcQ"]["status"], "downloaded")
+        self.assertEqual(records["9bZkp7q19f0"]["status"], "skipped")
+        self.assertEqual(len(yt_dlp_script._telemetry_records), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+"""
+youtube_id.py
+
+The one YouTube URL pattern shared by the scripts that read video IDs out of
+comment tags (yt-dlp-rename-youtube-video.py, yt-dlp-extract-url-from-youtube-video.py,
+ffprobe-catalog.py), so they all extract the same ID from the same text.
+
+Accepted forms: youtu.be/ID, youtube.com/watch?...v=ID, /embed/ID, /v/ID and
+any other youtube.com path ending in an ID (shorts/, live/, ...) unless it is a
+playlist, channel, user or /c/ page; www., m. and music. hosts; with or without
+the scheme. A URL only counts when it starts the token, so a YouTube address
+embedded in another site's path or query (evil.com/youtube.com/ID) is ignored.
+"""
+
+import re
+
+YOUTUBE_URL_RE = re.compile(
+    r'(?<![\w.~/?#@=&%+-])(?:https?://)?'
+    r'(?:(?:www\.)?youtu\.be/+'
+    r'|(?:(?:www|m|music)\.)?youtube\.com/'
+    r'(?:watch/?\?(?:[^\s#]*?&)?v=|(?:embed|v)/|(?!(?:playlist|channel|user|c)/)(?:[^\s/?#]+/)*))'
+    r'([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])',
+    re.IGNORECASE
+)
+
+def find_first_youtube_video_url(text):
+    """Return (url, video_id) for the first YouTube video URL in text, or (None, None)."""
+    m = YOUTUBE_URL_RE.search(text or "")
+    if m is None:
+        return None, None
+    return m.group(0), m.group(1)
+
+def video_id(text):
+    return find_first_youtube_video_url(text)[1]
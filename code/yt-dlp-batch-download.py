@@ -1,53 +1,181 @@
+import argparse
+import json
+import os
+import random
+import shutil
 import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Path to your file with URLs (one URL per line)
 file_path = "./urls.txt"
 
-# Base command template. We use a placeholder {url} to substitute the URL from the file.
-# The original base string is:
+# yt-dlp is started directly (no PowerShell hop); the URL is appended after these arguments.
+# The original command was:
 # .\yt-dlp.exe "https://www.youtube.com/watch?v=xxxxxxxxx" --cookies-from-browser firefox
-# We replace the URL portion with {url}
-command_template = r'.\yt-dlp.exe "{url}" --cookies-from-browser firefox'
+YTDLP = os.path.join(".", "yt-dlp.exe")
+EXTRA_ARGS = ["--cookies-from-browser", "firefox"]
 
-def run_command(command):
-    print(f"Running command: {command}")
-    # Open the subprocess with stdout and stderr piped
+DEFAULT_WORKERS = 2
+# Token bucket: on average one new yt-dlp start every 60 / RATE_PER_MINUTE seconds, with bursts up to BURST.
+RATE_PER_MINUTE = 2.0
+BURST = 2
+RETRIES = 3
+BACKOFF_BASE = 30.0
+BACKOFF_MAX = 600.0
+
+print_lock = threading.Lock()
+
+def log(text):
+    with print_lock:
+        print(text, flush=True)
+
+def find_ytdlp():
+    if os.path.isfile(YTDLP):
+        return YTDLP
+    return shutil.which("yt-dlp.exe") or shutil.which("yt-dlp") or YTDLP
+
+class TokenBucket:
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class State:
+    """Per-URL status persisted next to the URL list, so finished URLs are skipped on restart."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable state file {path}: {e}")
+
+    def is_done(self, url):
+        with self.lock:
+            return self.entries.get(url, {}).get("status") == "done"
+
+    def update(self, url, **fields):
+        with self.lock:
+            entry = self.entries.setdefault(url, {})
+            entry.update(fields, time=time.time())
+            data = json.dumps(self.entries, ensure_ascii=False, indent=2)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+
+def run_command(ytdlp, url, index):
+    command = [ytdlp, url] + EXTRA_ARGS
+    log(f"[{index}] Running command: {' '.join(command)}")
     # Merging stderr into stdout so that we only have one stream to read from
-    process = subprocess.Popen(
-        ["powershell", "-Command", command],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        universal_newlines=True
-    )
+    try:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1,
+        )
+    except OSError as e:
+        log(f"[{index}] Could not start yt-dlp: {e}")
+        return -1, str(e)
 
     # Stream the output line by line in real time
+    last_line = ""
     with process.stdout:
         for line in iter(process.stdout.readline, ''):
-            print(line, end='')
-    # Wait for the process to terminate and get the exit code
+            line = line.rstrip()
+            if line:
+                last_line = line
+                log(f"[{index}] {line}")
     process.wait()
-    print(f"Completed with exit code: {process.returncode}\n")
+    log(f"[{index}] Completed with exit code: {process.returncode}\n")
+    return process.returncode, last_line
 
-def run_commands_from_file(filepath):
+def download_with_retries(ytdlp, url, index, bucket, state, retries):
+    for attempt in range(1, retries + 2):
+        bucket.acquire()
+        code, last_line = run_command(ytdlp, url, index)
+        if code == 0:
+            state.update(url, status="done", attempts=attempt)
+            return True
+        state.update(url, status="failed", attempts=attempt, last_error=last_line)
+        if attempt <= retries:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+            log(f"[{index}] Attempt {attempt} failed; retrying in {delay:.0f}s")
+            time.sleep(delay)
+    return False
+
+def read_urls(filepath):
+    with open(filepath, "r", encoding="utf-8") as file:
+        # Process each URL (skip empty lines, comments and duplicates)
+        urls = [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+    return list(dict.fromkeys(urls))
+
+def run_commands_from_file(filepath, workers=DEFAULT_WORKERS, rate_per_minute=RATE_PER_MINUTE, burst=BURST, retries=RETRIES):
     try:
-        with open(filepath, "r") as file:
-            lines = file.readlines()
+        urls = read_urls(filepath)
     except Exception as e:
         print(f"Error reading file: {e}")
-        return
+        return 1
+
+    state = State(filepath + ".state.json")
+    todo = [u for u in urls if not state.is_done(u)]
+    print(f"{len(urls)} URL(s), {len(urls) - len(todo)} already done, {len(todo)} to download")
+    if not todo:
+        return 0
 
-    # Process each URL (skip empty lines or whitespace only)
-    for line in lines:
-        url = line.strip()
-        if not url:
-            continue
+    ytdlp = find_ytdlp()
+    bucket = TokenBucket(rate_per_minute / 60.0, burst)
+    started = time.monotonic()
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = {ex.submit(download_with_retries, ytdlp, url, i, bucket, state, retries): url
+                for i, url in enumerate(todo, 1)}
+        for fut in as_completed(futs):
+            try:
+                ok = fut.result()
+            except Exception as e:
+                log(f"Error downloading {futs[fut]}: {e}")
+                ok = False
+            if not ok:
+                failed.append(futs[fut])
 
-        # Replace the placeholder with current URL
-        command = command_template.format(url=url)
-        run_command(command)
-        time.sleep(30)
+    print(f"\nFinished {len(todo) - len(failed)}/{len(todo)} URL(s) in {time.monotonic() - started:.0f}s")
+    for url in failed:
+        print(f"FAILED: {url}")
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    run_commands_from_file(file_path)
+    parser = argparse.ArgumentParser(description="Download every URL in a list with yt-dlp.")
+    parser.add_argument("file", nargs="?", default=file_path, help=f"URL list (default {file_path})")
+    parser.add_argument("--workers", "-j", type=int, default=DEFAULT_WORKERS, help="Concurrent yt-dlp processes")
+    parser.add_argument("--rate", type=float, default=RATE_PER_MINUTE, help="Average yt-dlp starts per minute (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=BURST, help="Starts allowed back to back before the rate applies")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="Retries per URL, with exponential backoff")
+    args = parser.parse_args()
+    sys.exit(run_commands_from_file(args.file, args.workers, args.rate, args.burst, args.retries))
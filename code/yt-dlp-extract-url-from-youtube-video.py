@@ -1,59 +1,33 @@
-import subprocess
+"""
+yt-dlp-extract-url-from-youtube-video.py
+
+Usage:
+  python yt-dlp-extract-url-from-youtube-video.py [DIR ...] [--batch] [--recursive] [--workers N]
+                                                   [--index FILE] [--archive-db [DB]]
+
+Reads the comment tag of every .mp4 in DIR and pulls out the YouTube video ID.
+Tags are read for all files at once on a thread pool through media_probe, which
+parses MP4 headers in-process and only falls back to ffprobe when that fails.
+
+For every folder an archive.txt ("youtube <id>" lines, as yt-dlp's
+--download-archive expects) and, if IDs repeat, a dedup.txt are written. All
+IDs also go to one JSON index mapping ID -> list of file paths, and with
+--archive-db into the shared download_archive.py database, one channel per folder.
+"""
+
+import argparse
 import json
 from pathlib import Path
-from typing import Optional
-from urllib.parse import urlparse, parse_qs, unquote
-
-FFPROBE = "./ffprobe.exe"
-
-def extract_video_id_from_query(qs):
-    vid_list = qs.get("v")
-    if not vid_list:
-        return None
-    vid = vid_list[0]
-    return vid[:11] if len(vid) >= 11 else None
-
-def find_first_youtube_video_url(text):
-    YOUTUBE_HOSTS = {
-        "www.youtube.com", "youtube.com", "m.youtube.com",
-        "youtu.be", "www.youtu.be", "music.youtube.com"
-    }
-    for token in text.split():
-        token = token.strip('\'"<>.,;:()[]{}')
-        if not (token.startswith("http://") or token.startswith("https://")):
-            if token.startswith("www.") or token.startswith("youtube.") or token.startswith("youtu.be"):
-                token = "https://" + token
-            else:
-                continue
-        try:
-            p = urlparse(token)
-        except Exception:
-            continue
-        host = p.netloc.lower()
-        if host in YOUTUBE_HOSTS:
-            if host.endswith("youtu.be"):
-                video_id = p.path.lstrip('/')
-                if len(video_id) >= 11:
-                    return token, video_id[:11]
-            if host.endswith("youtube.com") or host.endswith("m.youtube.com") or host.endswith("music.youtube.com"):
-                if p.path == "/watch":
-                    qs = parse_qs(p.query)
-                    vid = extract_video_id_from_query(qs)
-                    if vid:
-                        return token, vid
-                parts = [part for part in p.path.split("/") if part]
-                if parts:
-                    if parts[0] in ("embed", "v") and len(parts) > 1:
-                        candidate = parts[1]
-                        if len(candidate) >= 11:
-                            return token, candidate[:11]
-                    last = parts[-1]
-                    if len(last) >= 11 and parts[0] not in ("playlist", "channel", "user", "c"):
-                        return token, last[:11]
-    return None, None
-    
+from typing import Dict, List, Optional, Tuple
+
+import download_archive
+import media_probe
+import youtube_id
+
+DEFAULT_INDEX = "youtube-id-index.json"
+
 def custom_script(comment: str) -> str:
-    url, id = find_first_youtube_video_url(comment)
+    url, id = youtube_id.find_first_youtube_video_url(comment)
     if id is None:
         print("error on " + str(comment))
         return ""
@@ -61,65 +35,42 @@ def custom_script(comment: str) -> str:
 
 
 def get_comment_from_mp4(path: Path) -> Optional[str]:
-    cmd = [
-        FFPROBE,
-        "-v", "error",
-        "-print_format", "json",
-        "-show_entries", "format_tags",
-        str(path)
-    ]
-    try:
-        proc = subprocess.run(cmd, capture_output=True, check=True)
-    except subprocess.CalledProcessError:
-        return None
-    out_bytes = proc.stdout or b""
-    out_text = out_bytes.decode("utf-8", errors="replace")
-    try:
-        data = json.loads(out_text)
-    except json.JSONDecodeError:
-        return None
-    tags = data.get("format", {}).get("tags", {}) or {}
-    for key in ("comment", "Comment", "COMMENT"):
-        if key in tags:
-            val = tags[key]
-            if isinstance(val, bytes):
-                return val.decode("utf-8", errors="replace")
-            return str(val)
-    return None
-
-def process_video(video_dir: str) -> None:
-    dir_path = Path(video_dir)
-    if not dir_path.is_dir():
-        return
-
-    print("entering " + str(dir_path))
-    mp4_files = sorted(dir_path.glob("*.mp4"))
-    out_path = dir_path / "archive.txt"
-    dedup_path = dir_path / "dedup.txt"
+    return media_probe.tag(media_probe.probe(path), "comment")
 
-    line_to_files: dict[str, List[str]] = {}
-    ordered_lines: List[str] = []
+def collect_mp4s(dirs: List[Path], recursive: bool) -> List[Path]:
+    files = []
+    for d in dirs:
+        files.extend(sorted(d.rglob("*.mp4") if recursive else d.glob("*.mp4")))
+    return files
 
-    for mp4 in mp4_files:
-        try:
-            comment = get_comment_from_mp4(mp4)
-        except Exception as e:
-            print(f"ffprobe error for {mp4.name}: {e}")
+def extract_ids(files: List[Path], workers: int = media_probe.DEFAULT_WORKERS) -> Dict[Path, Optional[str]]:
+    """Read every file's comment in parallel; maps path -> video ID, or None."""
+    ids: Dict[Path, Optional[str]] = {}
+    for mp4, info in media_probe.probe_many(files, workers=workers):
+        if info is None:
+            print(f"could not read tags of {mp4}")
+            ids[mp4] = None
             continue
+        comment = media_probe.tag(info, "comment")
         if comment is None:
             print("no comment in " + str(mp4))
+            ids[mp4] = None
             continue
-        try:
-            result = custom_script(comment)
-        except Exception as e:
-            print(f"custom_script error for {mp4.name}: {e}")
-            continue
-        result_line = result.replace("\r", " ").replace("\n", " ")
-        ordered_lines.append(result_line)
-        line_to_files.setdefault(result_line, []).append(mp4.name)
+        ids[mp4] = youtube_id.video_id(comment)
+        if ids[mp4] is None:
+            print(f"no YouTube URL in comment of {mp4}")
+    return ids
+
+def write_folder_archive(dir_path: Path, entries: List[Tuple[Path, str]]) -> None:
+    out_path = dir_path / "archive.txt"
+    dedup_path = dir_path / "dedup.txt"
+
+    line_to_files: Dict[str, List[str]] = {}
+    for mp4, vid in entries:
+        line_to_files.setdefault("youtube " + vid, []).append(mp4.name)
 
     with out_path.open("w", encoding="utf-8") as f:
-        for line in ordered_lines:
+        for line in line_to_files:
             f.write(line + "\n")
 
     dedup_entries = {line: files for line, files in line_to_files.items() if len(files) > 1}
@@ -130,14 +81,61 @@ def process_video(video_dir: str) -> None:
 
     total_repeated_lines = len(dedup_entries)
     total_repeated_files = sum(len(files) for files in dedup_entries.values())
-    print(f"dedupe: {total_repeated_lines} repeated lines across {total_repeated_files} files")
+    print(f"{dir_path}: {len(line_to_files)} IDs, dedupe: {total_repeated_lines} repeated lines across {total_repeated_files} files")
+
+def write_index(index_path: str, ids: Dict[Path, Optional[str]]) -> None:
+    index: Dict[str, List[str]] = {}
+    for mp4 in sorted(p for p, vid in ids.items() if vid):
+        index.setdefault(ids[mp4], []).append(str(mp4))
+    tmp = index_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    Path(tmp).replace(index_path)
+    print(f"index: {len(index)} IDs written to {index_path}")
+
+def process_videos(dirs: List[Path], recursive: bool = False, workers: int = media_probe.DEFAULT_WORKERS,
+                   index_path: str = DEFAULT_INDEX, archive_db=False) -> None:
+    dirs = [d for d in dirs if d.is_dir()]
+    files = collect_mp4s(dirs, recursive)
+    print(f"reading tags of {len(files)} files in {len(dirs)} folder(s)")
+    ids = extract_ids(files, workers)
+
+    by_folder: Dict[Path, List[Tuple[Path, str]]] = {}
+    for mp4 in files:
+        if ids.get(mp4):
+            by_folder.setdefault(mp4.parent, []).append((mp4, ids[mp4]))
+    for folder in sorted(by_folder):
+        write_folder_archive(folder, by_folder[folder])
+
+    if index_path:
+        write_index(index_path, ids)
+    if archive_db is not False:
+        archive = download_archive.ArchiveIndex(archive_db)
+        new = sum(archive.add_many([("youtube", vid) for _, vid in entries], folder.name)
+                  for folder, entries in by_folder.items())
+        print(f"archive db: {new} new IDs added to {archive.db_path}")
+
+    missing = sum(1 for vid in ids.values() if vid is None)
+    print(f"done: {len(ids) - missing} IDs found, {missing} files without an ID")
+
+def process_video(video_dir: str) -> None:
+    process_videos([Path(video_dir)])
 
 def main():
-    root = Path(str("./youtube"))
-    for child in sorted(root.iterdir()):
-        if child.is_dir():
-            process_video(str(child))
+    parser = argparse.ArgumentParser(description="Extract YouTube IDs from mp4 comment tags into archive files and an ID index.")
+    parser.add_argument("dirs", nargs="*", default=["./youtube/1"], help="Folders of mp4 files (default ./youtube/1)")
+    parser.add_argument("--batch", action="store_true", help="Treat each DIR as a root and process its subfolders")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Include mp4s in subfolders of each DIR")
+    parser.add_argument("--workers", type=int, default=media_probe.DEFAULT_WORKERS, help="Parallel tag readers")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help=f'ID -> paths JSON index (default {DEFAULT_INDEX}; "" disables it)')
+    parser.add_argument("--archive-db", nargs="?", default=False, const=None,
+                        help="Also add the IDs to the shared archive database (default location if no path is given)")
+    args = parser.parse_args()
+
+    dirs = [Path(d) for d in args.dirs]
+    if args.batch:
+        dirs = [child for root in dirs for child in sorted(root.iterdir()) if child.is_dir()]
+    process_videos(dirs, args.recursive, args.workers, args.index, args.archive_db)
 
 if __name__ == "__main__":
-   #main()
-   process_video(str("./youtube/1"))
+    main()
@@ -1,157 +1,15 @@
-import subprocess
+import argparse
 import json
-import unicodedata
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import shutil
 import os
-import re
-from urllib.parse import urlparse, parse_qs, unquote
-import itertools
-FFPROBE = "./ffprobe.exe"
 
-MAX_BYTES=255
+import filename_sanitize
+import media_probe
+import youtube_id
 
-def extract_video_id_from_query(qs):
-    vid_list = qs.get("v")
-    if not vid_list:
-        return None
-    vid = vid_list[0]
-    return vid[:11] if len(vid) >= 11 else None
-
-def find_first_youtube_video_url(text):
-    YOUTUBE_HOSTS = {
-        "www.youtube.com", "youtube.com", "m.youtube.com",
-        "youtu.be", "www.youtu.be", "music.youtube.com"
-    }
-    for token in text.split():
-        token = token.strip('\'"<>.,;:()[]{}')
-        if not (token.startswith("http://") or token.startswith("https://")):
-            if token.startswith("www.") or token.startswith("youtube.") or token.startswith("youtu.be"):
-                token = "https://" + token
-            else:
-                continue
-        try:
-            p = urlparse(token)
-        except Exception:
-            continue
-        host = p.netloc.lower()
-        if host in YOUTUBE_HOSTS:
-            if host.endswith("youtu.be"):
-                video_id = p.path.lstrip('/')
-                if len(video_id) >= 11:
-                    return token, video_id[:11]
-            if host.endswith("youtube.com") or host.endswith("m.youtube.com") or host.endswith("music.youtube.com"):
-                if p.path == "/watch":
-                    qs = parse_qs(p.query)
-                    vid = extract_video_id_from_query(qs)
-                    if vid:
-                        return token, vid
-                parts = [part for part in p.path.split("/") if part]
-                if parts:
-                    if parts[0] in ("embed", "v") and len(parts) > 1:
-                        candidate = parts[1]
-                        if len(candidate) >= 11:
-                            return token, candidate[:11]
-                    last = parts[-1]
-                    if len(last) >= 11 and parts[0] not in ("playlist", "channel", "user", "c"):
-                        return token, last[:11]
-    return None, None
-    
-    
-def sanitize_filename(s, restricted=False, is_id=False):
-    NO_DEFAULT = False
-    ACCENT_CHARS = dict(zip('ÂÃÄÀÁÅÆÇÈÉÊËÌÍÎÏÐÑÒÓÔÕÖŐØŒÙÚÛÜŰÝÞßàáâãäåæçèéêëìíîïðñòóôõöőøœùúûüűýþÿ',
-                        itertools.chain('AAAAAA', ['AE'], 'CEEEEIIIIDNOOOOOOO', ['OE'], 'UUUUUY', ['TH', 'ss'],
-                                        'aaaaaa', ['ae'], 'ceeeeiiiionooooooo', ['oe'], 'uuuuuy', ['th'], 'y')))
-    """Sanitizes a string so it could be used as part of a filename.
-    @param restricted   Use a stricter subset of allowed characters
-    @param is_id        Whether this is an ID that should be kept unchanged if possible.
-                        If unset, yt-dlp's new sanitization rules are in effect
-    """
-    if s == '':
-        return ''
-
-    def replace_insane(char):
-        if restricted and char in ACCENT_CHARS:
-            return ACCENT_CHARS[char]
-        elif not restricted and char == '\n':
-            return '\0 '
-        elif is_id is NO_DEFAULT and not restricted and char in '"*:<>?|/\\':
-            # Replace with their full-width unicode counterparts
-            return {'/': '\u29F8', '\\': '\u29f9'}.get(char, chr(ord(char) + 0xfee0))
-        elif char == '?' or ord(char) < 32 or ord(char) == 127:
-            return ''
-        elif char == '"':
-            return '' if restricted else '\''
-        elif char == ':':
-            return '\0_\0-' if restricted else '\0 \0-'
-        elif char in '\\/|*<>':
-            return '\0_'
-        if restricted and (char in '!&\'()[]{}$;`^,#' or char.isspace() or ord(char) > 127):
-            return '' if unicodedata.category(char)[0] in 'CM' else '\0_'
-        return char
-
-    # Replace look-alike Unicode glyphs
-    if restricted and (is_id is NO_DEFAULT or not is_id):
-        s = unicodedata.normalize('NFKC', s)
-    s = re.sub(r'[0-9]+(?::[0-9]+)+', lambda m: m.group(0).replace(':', '_'), s)  # Handle timestamps
-    result = ''.join(map(replace_insane, s))
-    if is_id is NO_DEFAULT:
-        result = re.sub(r'(\0.)(?:(?=\1)..)+', r'\1', result)  # Remove repeated substitute chars
-        STRIP_RE = r'(?:\0.|[ _-])*'
-        result = re.sub(f'^\0.{STRIP_RE}|{STRIP_RE}\0.$', '', result)  # Remove substitute chars from start/end
-    result = result.replace('\0', '') or '_'
-
-    if not is_id:
-        while '__' in result:
-            result = result.replace('__', '_')
-        result = result.strip('_')
-        # Common case of "Foreign band name - English song title"
-        if restricted and result.startswith('-_'):
-            result = result[2:]
-        if result.startswith('-'):
-            result = '_' + result[len('-'):]
-        result = result.lstrip('.')
-        if not result:
-            result = '_'
-    return result
-    
-def _yt_dlp_style_sanitize(name: str) -> str:
-    if name is None:
-        return None
-    # Normalize (NFC)
-    name = unicodedata.normalize("NFC", name)
-
-    # Remove NUL and control chars (0x00-0x1F and DEL), replace with space
-    name = "".join(ch if (31 < ord(ch) < 0x7f or ord(ch) > 0x9f) else " " for ch in name)
-
-    # Collapse newlines and carriage returns to spaces
-    name = name.replace("\r", " ").replace("\n", " ")
-
-    # Replace path separators and common unsafe chars with underscore
-    for bad in ('/', '\\', ':', '*', '?', '"', '<', '>', '|'):
-        name = name.replace(bad, "_")
-
-    # Prevent path traversal and repeated dots
-    while ".." in name:
-        name = name.replace("..", "_")
-
-    # Strip leading/trailing whitespace and leading dot (avoid hidden files)
-    name = name.strip()
-    name = name.lstrip(".")
-
-    # Truncate to MAX_BYTES without breaking UTF-8
-    encoded = name.encode("utf-8", errors="ignore")
-    if len(encoded) > MAX_BYTES:
-        encoded = encoded[:MAX_BYTES]
-        name = encoded.decode("utf-8", errors="ignore")
-    else:
-        name = encoded.decode("utf-8", errors="ignore")
-
-    if not name:
-        return None
-    return name
+RENAME_JOURNAL = ".rename-journal.json"
 
 def custom_script(title: str, id: str) -> str:
     """
@@ -168,7 +26,7 @@ def custom_script(title: str, id: str) -> str:
     id_safe = str(id).replace("/", "_").replace("\\", "_").strip()
 
     combined = f"{truncated}_[{id_safe}]"
-    safe = sanitize_filename(combined)
+    safe = filename_sanitize.yt_dlp(combined)
     return safe
 
 def _decode_tag_value(val) -> str:
@@ -176,58 +34,21 @@ def _decode_tag_value(val) -> str:
         return val.decode("utf-8", errors="replace")
     return str(val)
 
-def get_comment_from_mp4(path: Path) -> Optional[str]:
-    cmd = [
-        FFPROBE,
-        "-v", "error",
-        "-print_format", "json",
-        "-show_entries", "format_tags",
-        str(path)
-    ]
-    try:
-        proc = subprocess.run(cmd, capture_output=True, check=True)
-    except subprocess.CalledProcessError:
-        # ffprobe returned non-zero -> treat as skip
+def _probe_tags(path: Path) -> Optional[dict]:
+    # Title and comment lookups share one cached ffprobe run per file.
+    info = media_probe.probe(path)
+    if info is None:
         return None
-    out_bytes = proc.stdout or b""
-    out_text = out_bytes.decode("utf-8", errors="replace")
-    try:
-        data = json.loads(out_text)
-    except json.JSONDecodeError:
-        return None
-    tags = data.get("format", {}).get("tags", {}) or {}
+    return media_probe.format_tags(info)
+
+def comment_from_tags(tags: dict) -> Optional[str]:
     for key in ("comment", "Comment", "COMMENT"):
         if key in tags:
             return _decode_tag_value(tags[key])
     return None
 
 
-def get_title_from_mp4(path: Path) -> Optional[str]:
-    cmd = [
-        FFPROBE,
-        "-v", "error",
-        "-print_format", "json",
-        "-show_entries", "format_tags",
-        str(path)
-    ]
-    try:
-        proc = subprocess.run(cmd, capture_output=True, check=True)
-    except subprocess.CalledProcessError:
-        return None
-
-    out_bytes = proc.stdout or b""
-    try:
-        out_text = out_bytes.decode("utf-8", errors="replace")
-    except Exception:
-        out_text = ""
-
-    try:
-        data = json.loads(out_text)
-    except json.JSONDecodeError:
-        return None
-
-    tags = data.get("format", {}).get("tags", {}) or {}
-
+def title_from_tags(tags: dict) -> Optional[str]:
     if "title" in tags:
         return _decode_tag_value(tags["title"]).strip() or None
 
@@ -271,83 +92,234 @@ def get_title_from_mp4(path: Path) -> Optional[str]:
     return title or None
 
 
-def rename_videos(video_dir: str, dry_run: bool = True) -> None:
-    dir_path = Path(video_dir)
-    if not dir_path.is_dir():
-        return
-    print("entering " + str(dir_path))
-    mp4_files = sorted(dir_path.glob("*.mp4"))
+def get_comment_from_mp4(path: Path) -> Optional[str]:
+    tags = _probe_tags(path)
+    if tags is None:
+        # ffprobe returned non-zero -> treat as skip
+        return None
+    return comment_from_tags(tags)
 
-    failed_dir = dir_path / "failed"
-    failures: List[Tuple[Path, str]] = []
 
-    if not dry_run:
-        try:
-            failed_dir.mkdir(parents=True, exist_ok=True)
-            try:
-                os.chmod(failed_dir, 0o777)
-            except Exception:
-                pass
-        except Exception as e:
-            err = f"could not create failed dir {failed_dir}: {e}"
-            print(err)
-            failures.append((dir_path, err))
+def get_title_from_mp4(path: Path) -> Optional[str]:
+    tags = _probe_tags(path)
+    if tags is None:
+        return None
+    return title_from_tags(tags)
 
-    for mp4 in mp4_files:
-        title = get_title_from_mp4(mp4)
-        if title is None:
-            print("no title in " + str(mp4))
-            failures.append((mp4, "no title in file"))
-            _move_to_failed(mp4, failed_dir, dry_run, failures)
+
+def plan_file(mp4: Path, info: Optional[dict]) -> Tuple[Optional[Path], Optional[str]]:
+    """Return (new_path, None) or (None, failure reason) from one probe result."""
+    tags = media_probe.format_tags(info) if info is not None else None
+    if tags is None:
+        return None, "could not probe file"
+
+    title = title_from_tags(tags)
+    if title is None:
+        return None, "no title in file"
+
+    comment = comment_from_tags(tags)
+    if comment is None:
+        return None, "no title in file comment"
+
+    id = youtube_id.find_first_youtube_video_url(comment)
+    if id is None or id[1] is None:
+        return None, "no id in comments"
+
+    try:
+        result = custom_script(title, id[1])
+    except Exception as e:
+        return None, f"custom_script exception: {e}"
+
+    if not result:
+        return None, "custom_script returned empty result"
+
+    safe_name = str(result).strip().replace("/", "_").replace("\\", "_")
+    return mp4.with_name(f"{safe_name}.mp4"), None
+
+
+def plan_renames(dirs: List[Path], workers: int = media_probe.DEFAULT_WORKERS) -> Dict[Path, dict]:
+    """
+    Probe every mp4 under dirs once, in parallel, and work out all renames
+    before anything is touched. Targets are compared case-insensitively, since
+    the archives live on Windows filesystems; two files aiming at one name, or
+    a target that is taken by a file that is not itself being renamed, are
+    reported as collisions and left alone.
+    """
+    plans = {d: {"renames": [], "same": [], "failures": [], "collisions": []} for d in dirs}
+    files = {mp4: d for d in dirs for mp4 in sorted(d.glob("*.mp4"))}
+    targets: Dict[Path, List[Tuple[Path, Path]]] = {}
+    for mp4, info in media_probe.probe_many(list(files), workers=workers):
+        plan = plans[files[mp4]]
+        new_path, reason = plan_file(mp4, info)
+        if new_path is None:
+            plan["failures"].append((mp4, reason))
+        elif new_path.name == mp4.name:
+            plan["same"].append(mp4)
+        else:
+            targets.setdefault(files[mp4], []).append((mp4, new_path))
+
+    for d, pairs in targets.items():
+        plan = plans[d]
+        moving = {src.name.casefold() for src, _ in pairs}
+        staying = {p.name.casefold() for p in d.iterdir() if p.name.casefold() not in moving}
+        by_target: Dict[str, List[Tuple[Path, Path]]] = {}
+        for src, dst in pairs:
+            by_target.setdefault(dst.name.casefold(), []).append((src, dst))
+        for key, group in sorted(by_target.items()):
+            if len(group) > 1:
+                for src, dst in group:
+                    plan["collisions"].append((src, f"{len(group)} files would be renamed to '{dst.name}'"))
+            elif key in staying and group[0][0].name.casefold() != key:
+                plan["collisions"].append((group[0][0], f"'{group[0][1].name}' already exists"))
+            else:
+                plan["renames"].append(group[0])
+        plan["renames"].sort()
+    return plans
+
+
+def _temp_name(i: int, src: Path) -> Path:
+    # The source name stays in the temp name, so a stray temp file can still be identified by hand.
+    return src.with_name(filename_sanitize.truncate_bytes(f".rename-{i}-{src.name}", suffix=".tmp"))
+
+
+def _write_journal(path: Path, entries: List[dict]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def recover_renames(dir_path: Path, dry_run: bool = True) -> int:
+    """
+    Finish a rename that was interrupted (killed, power loss) between its two
+    phases, using the journal apply_renames leaves in the folder. Files still
+    under their temporary name go to their target, or back to their source if
+    the target is taken. A file whose target and source are both taken, or
+    whose move fails, is reported and kept in the journal for the next run.
+    Returns the number of files moved.
+    """
+    journal = dir_path / RENAME_JOURNAL
+    if not journal.is_file():
+        return 0
+    try:
+        entries = json.loads(journal.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        print(f"unreadable rename journal {journal}: {e}")
+        return 0
+    moved = 0
+    failed = []
+    for entry in entries:
+        src, tmp, dst = (dir_path / entry[k] for k in ("src", "tmp", "dst"))
+        if not tmp.exists():
             continue
-            
-        comment = get_comment_from_mp4(mp4)
-        if comment is None:
-            print("no title in comment " + str(mp4))
-            failures.append((mp4, "no title in file comment"))
-            _move_to_failed(mp4, failed_dir, dry_run, failures)
+        if not dst.exists():
+            target = dst
+        elif not src.exists():
+            target = src
+        else:
+            print(f"cannot recover '{tmp.name}': both '{dst.name}' and '{src.name}' exist")
+            failed.append(entry)
             continue
-            
-        id = find_first_youtube_video_url(comment)
-        if id is None:
-            print("no id in " + str(mp4))
-            failures.append((mp4, "no id in comments"))
-            _move_to_failed(mp4, failed_dir, dry_run, failures)
+        print(f"{'DRY-RUN: would recover' if dry_run else 'recover'} '{tmp.name}' -> '{target.name}'")
+        if dry_run:
+            moved += 1
             continue
+        try:
+            tmp.rename(target)
+            moved += 1
+        except OSError as e:
+            print(f"cannot recover '{tmp.name}': {e}")
+            failed.append(entry)
+    if dry_run:
+        return moved
+    try:
+        if failed:
+            _write_journal(journal, failed)
+        else:
+            journal.unlink()
+    except OSError as e:
+        print(f"could not update rename journal {journal}: {e}")
+    return moved
 
+
+def apply_renames(renames: List[Tuple[Path, Path]]) -> None:
+    """
+    Rename all files or none: every source is first moved to a temporary name,
+    then to its target, so chains and case-only renames cannot clobber each
+    other. Any failure rolls back the steps already taken; if the process dies
+    instead, the journal written up front lets recover_renames() finish the job.
+    """
+    if not renames:
+        return
+    dir_path = renames[0][0].parent
+    journal = dir_path / RENAME_JOURNAL
+    if journal.exists():
+        raise FileExistsError(f"unresolved rename journal {journal}; fix the files it lists and rerun")
+    planned = [(src, _temp_name(i, src), dst) for i, (src, dst) in enumerate(renames)]
+    _write_journal(journal, [{"src": s.name, "tmp": t.name, "dst": d.name} for s, t, d in planned])
+
+    staged: List[Tuple[Path, Path, Path]] = []
+    done: List[Tuple[Path, Path]] = []
+    try:
+        for src, tmp, dst in planned:
+            src.rename(tmp)
+            staged.append((src, tmp, dst))
+        for src, tmp, dst in staged:
+            if dst.exists():
+                raise FileExistsError(f"target appeared while renaming: {dst}")
+            tmp.rename(dst)
+            done.append((tmp, dst))
+    except Exception:
+        for tmp, dst in reversed(done):
+            dst.rename(tmp)
+        for src, tmp, _ in reversed(staged):
+            tmp.rename(src)
+        journal.unlink()
+        raise
+    journal.unlink()
+
+
+def _prepare_failed_dir(failed_dir: Path, failures: List[Tuple[Path, str]]) -> None:
+    try:
+        failed_dir.mkdir(parents=True, exist_ok=True)
         try:
-            result = custom_script(title, id[1])
-        except Exception as e:
-            print(f"custom_script failed for {mp4}: {e}")
-            failures.append((mp4, f"custom_script exception: {e}"))
-            _move_to_failed(mp4, failed_dir, dry_run, failures)
-            continue
+            os.chmod(failed_dir, 0o777)
+        except Exception:
+            pass
+    except Exception as e:
+        err = f"could not create failed dir {failed_dir}: {e}"
+        print(err)
+        failures.append((failed_dir.parent, err))
 
-        if not result:
-            print(f"custom_script returned empty result for {mp4}")
-            failures.append((mp4, "custom_script returned empty result"))
-            _move_to_failed(mp4, failed_dir, dry_run, failures)
-            continue
 
-        safe_name = str(result).strip().replace("/", "_").replace("\\", "_")
-        new_path = mp4.with_name(f"{safe_name}.mp4")
+def execute_plan(dir_path: Path, plan: dict, dry_run: bool = True) -> None:
+    print("entering " + str(dir_path))
+    failed_dir = dir_path / "failed"
+    failures: List[Tuple[Path, str]] = list(plan["collisions"])
 
-        if mp4.resolve() == new_path.resolve():
-            print(f"skip rename (same name): {mp4.name}")
-            continue
+    for mp4 in plan["same"]:
+        print(f"skip rename (same name): {mp4.name}")
+    for src, dst in plan["renames"]:
+        print(f"{'DRY-RUN: would rename' if dry_run else 'rename'} '{src.name}' -> '{dst.name}'")
+    for src, reason in plan["collisions"]:
+        print(f"collision, left in place: {src.name}: {reason}")
 
-        if dry_run:
-            print(f"DRY-RUN: would rename '{mp4.name}' -> '{new_path.name}'")
-            continue
-        else:
-            try:
-                mp4.rename(new_path)
-                print(f"renamed '{mp4.name}' -> '{new_path.name}'")
-            except Exception as e:
-                print(f"failed to rename '{mp4.name}' -> '{new_path.name}': {e}")
-                failures.append((mp4, f"rename failed: {e}"))
-                _move_to_failed(mp4, failed_dir, dry_run, failures, after_rename=True)
+    if not dry_run and plan["renames"]:
+        try:
+            apply_renames(plan["renames"])
+            print(f"renamed {len(plan['renames'])} file(s)")
+        except Exception as e:
+            print(f"rename failed, all renames in {dir_path} rolled back: {e}")
+            failures.append((dir_path, f"rename failed and was rolled back: {e}"))
 
+    if plan["failures"] and not dry_run:
+        _prepare_failed_dir(failed_dir, failures)
+    for mp4, reason in plan["failures"]:
+        print(f"{reason}: {mp4}")
+        failures.append((mp4, reason))
+        _move_to_failed(mp4, failed_dir, dry_run, failures)
 
     if failures:
         print("\nSummary of failures: " + str(len(failures)))
@@ -355,6 +327,15 @@ def rename_videos(video_dir: str, dry_run: bool = True) -> None:
             print(f"- {path}: {reason}")
 
 
+def rename_videos(video_dir: str, dry_run: bool = True, workers: int = media_probe.DEFAULT_WORKERS) -> None:
+    dir_path = Path(video_dir)
+    if not dir_path.is_dir():
+        return
+    recover_renames(dir_path, dry_run)
+    plans = plan_renames([dir_path], workers)
+    execute_plan(dir_path, plans[dir_path], dry_run)
+
+
 def _move_to_failed(mp4_path: Path, failed_dir: Path, dry_run: bool, failures: List[Tuple[Path, str]], after_rename: bool = False) -> None:
     target = failed_dir / mp4_path.name
     if dry_run:
@@ -421,13 +402,24 @@ def create_empty_files(video_dir: str, dry_run: bool = True) -> None:
                 print(f"failed to create '{target}': {e}")
 
 
-def batch_rename(video_dir: str, dry_run: bool = True):
+def batch_rename(video_dir: str, dry_run: bool = True, workers: int = media_probe.DEFAULT_WORKERS):
     root = Path(str(video_dir))
-    for child in sorted(root.iterdir()):
-        if child.is_dir():
-            rename_videos(str(child), dry_runs)
-            input("finished" + str(child) + "\n")
+    dirs = [child for child in sorted(root.iterdir()) if child.is_dir()]
+    for child in dirs:
+        recover_renames(child, dry_run)
+    # Probe every folder in one pool, then apply folder by folder.
+    plans = plan_renames(dirs, workers)
+    for child in dirs:
+        execute_plan(child, plans[child], dry_run)
 
 if __name__ == "__main__":
-   rename_videos(str("./LAYERS_CLASSIC"), dry_run=False)
-   # batch_rename(str("./youtube"), dry_run=False)
+    parser = argparse.ArgumentParser(description="Rename YouTube mp4s to '<title>_[<id>].mp4' from their embedded tags.")
+    parser.add_argument("path", nargs="?", default="./LAYERS_CLASSIC", help="Folder of mp4 files (default ./LAYERS_CLASSIC)")
+    parser.add_argument("--batch", action="store_true", help="Treat PATH as a root and rename inside each subfolder")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the planned renames")
+    parser.add_argument("--workers", type=int, default=media_probe.DEFAULT_WORKERS, help="Parallel probes")
+    args = parser.parse_args()
+    if args.batch:
+        batch_rename(args.path, dry_run=args.dry_run, workers=args.workers)
+    else:
+        rename_videos(args.path, dry_run=args.dry_run, workers=args.workers)
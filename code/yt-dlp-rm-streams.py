@@ -1,13 +1,22 @@
 #!/usr/bin/env python3
+import argparse
+import hashlib
+import json
 import subprocess
 import shutil
 import sys
 import logging
 import re
+import time
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set
+
+import download_archive
 
 YTDLP = ".\\yt-dlp.exe"
+CACHE_DIR = Path.home() / ".cache" / "yt-dlp-rm-streams"
+CACHE_TTL = 6 * 3600
+VIDEO_ID_RE = re.compile(r"[A-Za-z0-9_-]{11}")
 
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
@@ -16,17 +25,22 @@ def get_video_ids(url: str) -> List[str]:
     logger.info("Running yt-dlp to get IDs for URL: %s", url)
     proc = subprocess.Popen(
         [YTDLP, "--flat-playlist", "--get-id", url],
-        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        stdout=subprocess.PIPE, stderr=None,
         bufsize=1, text=True, universal_newlines=True,
     )
     ids = []
     assert proc.stdout is not None
+    # Warnings and errors go straight to the console on stderr; stdout should hold only IDs.
     for line in proc.stdout:
         line = line.strip()
-        if line:
-            logger.debug("yt-dlp output: %s", line)
-            ids.append(line)
-            print(line)
+        if not line:
+            continue
+        if not VIDEO_ID_RE.fullmatch(line):
+            logger.warning("Ignoring non-ID yt-dlp output: %s", line)
+            continue
+        logger.debug("yt-dlp output: %s", line)
+        ids.append(line)
+        print(line)
     ret = proc.wait()
     if ret != 0:
         logger.error("yt-dlp exited with code %d", ret)
@@ -34,29 +48,61 @@ def get_video_ids(url: str) -> List[str]:
     logger.info("Collected %d ids", len(ids))
     return ids
 
-def compile_id_regex_chunks(ids: List[str], chunk_size: int = 1000):
-    escaped = [re.escape(i) for i in ids]
-    for i in range(0, len(escaped), chunk_size):
-        chunk = escaped[i:i+chunk_size]
-        pattern = "(" + "|".join(chunk) + ")"
-        yield re.compile(pattern)
+def _cache_file(url: str) -> Path:
+    return CACHE_DIR / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+def get_video_ids_cached(url: str, ttl: float = CACHE_TTL, refresh: bool = False) -> List[str]:
+    path = _cache_file(url)
+    if not refresh and ttl > 0:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            age = time.time() - data["fetched"]
+            if data["url"] == url and age < ttl and all(VIDEO_ID_RE.fullmatch(i) for i in data["ids"]):
+                logger.info("Using %d cached ids for %s (%.0f min old)", len(data["ids"]), url, age / 60)
+                return data["ids"]
+        except (OSError, ValueError, KeyError):
+            pass
+    ids = get_video_ids(url)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"url": url, "fetched": time.time(), "ids": ids}), encoding="utf-8")
+        tmp.replace(path)
+    except OSError as e:
+        logger.warning("Could not write id cache %s: %s", path, e)
+    return ids
+
+class IdMatcher:
+    """
+    Finds which ID occurs in a string by looking up every substring of each
+    ID length in a set. YouTube IDs are all 11 characters, so a filename costs
+    one set lookup per character instead of one regex pass per ID chunk.
+    """
+
+    def __init__(self, ids: Iterable[str]):
+        self.by_length: Dict[int, Set[str]] = {}
+        for i in ids:
+            if i:
+                self.by_length.setdefault(len(i), set()).add(i)
+
+    def search(self, text: str) -> Optional[str]:
+        for length, ids in self.by_length.items():
+            for start in range(len(text) - length + 1):
+                token = text[start:start + length]
+                if token in ids:
+                    return token
+        return None
 
 def move_files_for_ids(ids: List[str], target_dir: Path):
     cwd = Path.cwd()
     target_dir.mkdir(exist_ok=True)
     files = [p for p in cwd.iterdir() if p.is_file()]
     logger.info("Scanning %d files against %d ids", len(files), len(ids))
-    regexes = list(compile_id_regex_chunks(ids, chunk_size=1000))
+    matcher = IdMatcher(ids)
     moved = []
     for p in files:
         name = p.name
-        matched = False
-        for rx in regexes:
-            m = rx.search(name)
-            if m:
-                matched = True
-                break
-        if matched:
+        if matcher.search(name) is not None:
             dest = target_dir / name
             if dest.exists():
                 stem, suf = p.stem, p.suffix
@@ -72,16 +118,34 @@ def move_files_for_ids(ids: List[str], target_dir: Path):
             moved.append((p.name, str(dest)))
     return moved
 
-def main(id: str = None):
-    if id is None:
-        if len(sys.argv) < 2:
-            logger.error("No id provided and no URL argument")
-            sys.exit(1)
-        url = sys.argv[1]
+def report_archived_elsewhere(ids: List[str], moved, archive: download_archive.ArchiveIndex) -> None:
+    """Log stream IDs the shared archive has downloaded but that had no file here, with their channel."""
+    matcher = IdMatcher(ids)
+    found_here = {matcher.search(src) for src, _ in moved}
+    archived = archive.known(ids)
+    logger.info("%d of %d ids are in the archive %s", len(archived), len(ids), archive.db_path)
+    for i in ids:
+        if i in archived and i not in found_here:
+            logger.info("%s is archived (channel %s) but has no file here", i, archive.channel_of(i) or "?")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Move files whose names contain an ID from a playlist/channel tab into ./temp.")
+    parser.add_argument("url", nargs="?", help="Playlist or channel tab URL")
+    parser.add_argument("--id", help="Channel ID without '@'; uses its /streams tab")
+    parser.add_argument("--ttl", type=float, default=CACHE_TTL / 3600, help="Reuse a cached ID listing younger than this many hours (default 6, 0 disables)")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the cached ID listing")
+    parser.add_argument("--archive-db", nargs="?", default=False, const=None,
+                        help="Report stream IDs the shared archive database has but that have no file here (default location if no path is given)")
+    args = parser.parse_args(argv)
+    if args.id:
+        url = f"https://www.youtube.com/@{args.id}/streams"
+    elif args.url:
+        url = args.url
     else:
-        url = f"https://www.youtube.com/@{id}/streams"
+        logger.error("No id provided and no URL argument")
+        sys.exit(1)
     try:
-        ids = get_video_ids(url)
+        ids = get_video_ids_cached(url, ttl=args.ttl * 3600, refresh=args.refresh)
     except Exception as e:
         logger.exception("Error getting video ids: %s", e)
         sys.exit(2)
@@ -93,6 +157,8 @@ def main(id: str = None):
     logger.info("Found %d ids. Moved %d files to %s.", len(ids), len(moved), target.resolve())
     for src, dst in moved:
         print(f"{src} -> {dst}")
+    if args.archive_db is not False:
+        report_archived_elsewhere(ids, moved, download_archive.ArchiveIndex(args.archive_db))
 
 if __name__ == "__main__":
-    main(id="")
+    main()
@@ -1,12 +1,67 @@
 from __future__ import annotations
 import argparse
+import asyncio
+import json
+import locale
 import os
+import re
 import sys
 import shutil
 import subprocess
 import threading
-import queue
+import time
+from collections import Counter, deque
 from typing import Optional
+from urllib.parse import urlsplit
+
+import download_archive
+
+DEFAULT_JOBS = 4
+DEFAULT_PER_HOST = 3
+CHANNEL_TABS = ("videos", "shorts", "streams")
+# Progress lines are echoed at most this often per job (completion lines always are).
+PROGRESS_INTERVAL = 1.0
+STREAM_LIMIT = 1024 * 1024
+OUTPUT_ENCODING = locale.getpreferredencoding(False)
+
+PROGRESS_RE = re.compile(r"^\[download\]\s+([\d.]+)%")
+SIZE_RE = re.compile(r"\bof\s+~?\s*([\d.]+)\s*([KMGTP]?i?B)\b")
+SPEED_RE = re.compile(r"\bat\s+([\d.]+)\s*([KMGTP]?i?B)/s")
+ETA_RE = re.compile(r"\bETA\s+([\d:]+)")
+FRAG_RE = re.compile(r"\(frag\s+(\d+)/(\d+)\)")
+VIDEO_ID_RE = re.compile(r"^\[youtube\] ([A-Za-z0-9_-]{11}): ")
+# Skip lines name their video themselves; the archive one comes without a [youtube] line before it.
+ARCHIVE_SKIP_RE = re.compile(r"^\[download\] ([A-Za-z0-9_-]{11}): has already been recorded in the archive")
+DOWNLOADED_SKIP_RE = re.compile(r"^\[download\] (.+) has already been downloaded")
+FILENAME_ID_RE = re.compile(r"\[([A-Za-z0-9_-]{11})\]")
+STEP_RE = re.compile(r"^\[(\w+)\] ")
+POSTPROCESSORS = {"Merger", "VideoRemuxer", "VideoConvertor", "EmbedThumbnail", "EmbedSubtitle", "Metadata",
+                  "FixupM3u8", "FixupM4a", "FixupStretched", "ThumbnailsConvertor", "MoveFiles"}
+RETRIES = 30
+DEFAULT_TELEMETRY = "yt-dlp-telemetry.jsonl"
+UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "TiB": 1024 ** 4,
+         "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4}
+
+_archive_lock = threading.Lock()
+# Side files (telemetry, members-only/age-restricted lists) are written from worker threads.
+_side_file_lock = threading.Lock()
+_archive_index = None
+# None: download_archive's default location; "": text archives only.
+archive_db_path: Optional[str] = None
+# "": no telemetry file (records are still summarised).
+telemetry_path: str = DEFAULT_TELEMETRY
+_telemetry_records: list[dict] = []
+
+def get_archive_index():
+    global _archive_index
+    with _archive_lock:
+        if _archive_index is None and archive_db_path != "":
+            try:
+                _archive_index = download_archive.ArchiveIndex(archive_db_path)
+            except Exception as e:
+                print(f"WARNING: archive index disabled: {e}", file=sys.stderr)
+                globals()["archive_db_path"] = ""
+        return _archive_index
 
 
 def print_cmd(cmd: list[str]) -> None:
@@ -20,46 +75,280 @@ def print_cmd(cmd: list[str]) -> None:
             safe_parts.append(part)
     print("cmd = " + " ".join(safe_parts))
     
-def _handle_line(tag: str, line: str, members_path: str, age_path: str):
-    if tag == "stderr":
-        if not line.endswith("\n"):
-            line_to_print = line + "\n"
-        else:
-            line_to_print = line
-        try:
-            sys.stderr.write(line_to_print)
-            sys.stderr.flush()
-        except Exception:
-            pass
-    else:
-        if not line.endswith("\n"):
-            line_to_print = line + "\n"
-        else:
-            line_to_print = line
+def _to_bytes(value: str, unit: str) -> Optional[int]:
+    scale = UNITS.get(unit)
+    return int(float(value) * scale) if scale else None
+
+def _to_seconds(text: str) -> int:
+    total = 0
+    for part in text.split(":"):
+        total = total * 60 + int(part)
+    return total
+
+def parse_progress(line: str) -> Optional[dict]:
+    """Turn a yt-dlp '[download]  42.0% of ...' line into a progress event."""
+    m = PROGRESS_RE.match(line)
+    if not m:
+        return None
+    event = {"percent": float(m.group(1)), "total_bytes": None, "downloaded_bytes": None,
+             "speed": None, "eta": None, "frag": None, "frags": None}
+    size = SIZE_RE.search(line)
+    if size:
+        event["total_bytes"] = _to_bytes(*size.groups())
+        if event["total_bytes"] is not None:
+            event["downloaded_bytes"] = int(event["total_bytes"] * event["percent"] / 100)
+    speed = SPEED_RE.search(line)
+    if speed:
+        event["speed"] = _to_bytes(*speed.groups())
+    eta = ETA_RE.search(line)
+    if eta:
+        event["eta"] = _to_seconds(eta.group(1))
+    frag = FRAG_RE.search(line)
+    if frag:
+        event["frag"], event["frags"] = int(frag.group(1)), int(frag.group(2))
+    return event
+
+def _append_telemetry(path: str, line: str) -> None:
+    try:
+        with _side_file_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        print(f"WARNING: could not write telemetry: {e}", file=sys.stderr)
+
+def record_telemetry(record: dict) -> None:
+    _telemetry_records.append(record)
+    if not telemetry_path:
+        return
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _append_telemetry(telemetry_path, line)
+        return
+    # Called while parsing child output on the event loop: write from the default executor instead.
+    loop.run_in_executor(None, _append_telemetry, telemetry_path, line)
+
+class DownloadTelemetry:
+    """Follows one yt-dlp process's output and records one telemetry entry per video."""
+
+    def __init__(self, channel: Optional[str], job: str, context: dict):
+        self.channel = channel
+        self.job = job
+        self.context = context
+        self.current: Optional[dict] = None
+        self.step: Optional[tuple[str, float]] = None
+
+    def _start(self, video_id: str, now: float) -> None:
+        self.finish(now)
+        self.current = {"video_id": video_id, "status": "extracted", "started": now, "first_request": None,
+                        "first_byte": None, "last_progress": None, "bytes": 0, "peak_speed": 0, "retries": 0,
+                        "fragments": 0, "streams": 0, "postprocess": {}, "stream_bytes": None, "stream_frags": None}
+
+    def _close_stream(self) -> None:
+        cur = self.current
+        cur["bytes"] += cur["stream_bytes"] or 0
+        cur["fragments"] += cur["stream_frags"] or 0
+        cur["stream_bytes"] = cur["stream_frags"] = None
+
+    def _close_step(self, now: float) -> None:
+        if self.step is not None and self.current is not None:
+            name, started = self.step
+            spent = self.current["postprocess"]
+            spent[name] = round(spent.get(name, 0.0) + now - started, 3)
+        self.step = None
+
+    def _skip(self, video_id: Optional[str], now: float) -> None:
+        cur = self.current
+        if cur is not None and video_id in (None, cur["video_id"]):
+            cur["status"] = "skipped"
+            return
+        if video_id is None:
+            return
+        # A different video: leave the current record as it is and log the skip on its own.
+        self._start(video_id, now)
+        self.current["status"] = "skipped"
+        self.finish(now)
+
+    def feed(self, line: str, event: Optional[dict], now: float) -> None:
+        skip = ARCHIVE_SKIP_RE.match(line)
+        if skip:
+            self._skip(skip.group(1), now)
+            return
+        skip = DOWNLOADED_SKIP_RE.match(line)
+        if skip:
+            ids = FILENAME_ID_RE.findall(os.path.basename(skip.group(1)))
+            self._skip(ids[-1] if ids else None, now)
+            return
+
+        m = VIDEO_ID_RE.match(line)
+        if m and (self.current is None or self.current["video_id"] != m.group(1)):
+            self._start(m.group(1), now)
+        cur = self.current
+        if cur is None:
+            return
+
+        # Post-processing steps last until a line from a different step arrives.
+        step = STEP_RE.match(line)
+        name = step.group(1) if step else None
+        if name is not None and self.step is not None and name != self.step[0]:
+            self._close_step(now)
+        if name in POSTPROCESSORS and self.step is None:
+            self.step = (name, now)
+
+        if event is not None:
+            cur["last_progress"] = now
+            if cur["first_byte"] is None and event["percent"] > 0:
+                cur["first_byte"] = now
+            if event["speed"]:
+                cur["peak_speed"] = max(cur["peak_speed"], event["speed"])
+            if event["total_bytes"]:
+                cur["stream_bytes"] = event["total_bytes"]
+            if event["frags"]:
+                cur["stream_frags"] = event["frags"]
+            if event["percent"] >= 100:
+                cur["status"] = "downloaded"
+        elif line.startswith("[download] Destination:"):
+            self._close_stream()
+            cur["streams"] += 1
+            if cur["first_request"] is None:
+                cur["first_request"] = now
+        elif "Retrying" in line:
+            cur["retries"] += 1
+        elif line.startswith("ERROR:"):
+            cur["status"] = "error"
+
+    def finish(self, now: float) -> None:
+        cur = self.current
+        if cur is None:
+            return
+        self._close_step(now)
+        self._close_stream()
+        self.current = None
+        download_seconds = None
+        if cur["first_request"] is not None and cur["last_progress"] is not None:
+            download_seconds = round(cur["last_progress"] - cur["first_request"], 3)
+        record = {
+            "time": time.time(),
+            "channel": self.channel,
+            "job": self.job,
+            "video_id": cur["video_id"],
+            "status": cur["status"],
+            "ttfb": round(cur["first_byte"] - cur["first_request"], 3)
+                    if cur["first_byte"] is not None and cur["first_request"] is not None else None,
+            "download_seconds": download_seconds,
+            "bytes": cur["bytes"],
+            "avg_speed": int(cur["bytes"] / download_seconds) if download_seconds else None,
+            "peak_speed": cur["peak_speed"] or None,
+            "retries": cur["retries"],
+            "fragments": cur["fragments"],
+            "streams": cur["streams"],
+            "merge_seconds": cur["postprocess"].get("Merger"),
+            "remux_seconds": cur["postprocess"].get("VideoRemuxer"),
+            "postprocess": cur["postprocess"],
+            "total_seconds": round(now - cur["started"], 3),
+            **self.context,
+        }
+        record_telemetry(record)
+
+def _fmt_rate(value: Optional[float]) -> str:
+    return f"{value / (1024 * 1024):.2f} MiB/s" if value else "-"
+
+def _mean(values: list) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+def print_telemetry_summary(records: list[dict]) -> None:
+    if not records:
+        return
+    print("\n=== Telemetry ===")
+    by_channel: dict[str, list[dict]] = {}
+    for rec in records:
+        by_channel.setdefault(rec["channel"] or "-", []).append(rec)
+    for channel, recs in by_channel.items():
+        done = [r for r in recs if r["status"] == "downloaded"]
+        statuses = Counter(r["status"] for r in recs)
+        total_bytes = sum(r["bytes"] for r in done)
+        total_seconds = sum(r["download_seconds"] or 0 for r in done)
+        ttfb = _mean([r["ttfb"] for r in done])
+        merge = _mean([r["merge_seconds"] for r in done])
+        peak = max((r["peak_speed"] or 0 for r in done), default=0)
+        print(f"{channel}: " + ", ".join(f"{k} {v}" for k, v in sorted(statuses.items())))
+        if done:
+            print(f"  {total_bytes / (1024 * 1024):.1f} MiB, avg {_fmt_rate(total_bytes / total_seconds if total_seconds else None)}, "
+                  f"peak {_fmt_rate(peak)}, ttfb {ttfb if ttfb is not None else 0:.2f}s, "
+                  f"retries {sum(r['retries'] for r in done)}, fragments {sum(r['fragments'] for r in done)}, "
+                  f"merge {merge if merge is not None else 0:.2f}s avg")
+    if telemetry_path:
+        print(f"Per-video records appended to {telemetry_path}")
+
+class JobOutput:
+    """Echoes one child's output with a prefix, parses progress and buffers the members/age side files."""
+
+    def __init__(self, prefix: str = "", members_path: Optional[str] = None, age_path: Optional[str] = None,
+                 telemetry: Optional[DownloadTelemetry] = None):
+        self.prefix = prefix
+        self.members_path = members_path
+        self.age_path = age_path
+        self.telemetry = telemetry
+        self.pending: dict[str, list[str]] = {}
+        self.progress: Optional[dict] = None
+        self._last_echo = 0.0
+
+    def handle(self, tag: str, line: str) -> None:
+        line = line.rstrip("\r\n")
+        event = parse_progress(line) if tag == "stdout" else None
+        now = time.monotonic()
+        if self.telemetry is not None:
+            self.telemetry.feed(line, event, now)
+        if event is not None:
+            self.progress = event
+            if event["percent"] < 100 and now - self._last_echo < PROGRESS_INTERVAL:
+                return
+            self._last_echo = now
+        stream = sys.stderr if tag == "stderr" else sys.stdout
         try:
-            sys.stdout.write(line_to_print)
-            sys.stdout.flush()
+            stream.write(self.prefix + line + "\n")
+            stream.flush()
         except Exception:
             pass
+        if event is None and self.members_path:
+            self._check_restricted(line)
+
+    def _check_restricted(self, line: str) -> None:
+        lower = (line or "").lower()
+        tag_result = extract_youtube_tag_from_line(line)
+        if tag_result is not None:
+            if "members-only" in lower:
+                self.pending.setdefault(self.members_path, []).append(tag_result)
+            if "sign in to confirm your age" in lower or "age-restricted" in lower:
+                self.pending.setdefault(self.age_path, []).append(tag_result)
+
+    def flush(self) -> None:
+        """
+        Merge buffered lines into the side files, one write per file, without
+        duplicates. Blocking file I/O: async callers run it with asyncio.to_thread.
+        """
+        if self.telemetry is not None:
+            self.telemetry.finish(time.monotonic())
+        for path, lines in self.pending.items():
+            try:
+                with _side_file_lock:
+                    existing = []
+                    if os.path.isfile(path):
+                        with open(path, "r", encoding="utf-8") as f:
+                            existing = [ln.rstrip("\n") for ln in f]
+                    merged = list(dict.fromkeys(existing + lines))
+                    if merged == existing:
+                        continue
+                    parent = os.path.dirname(path)
+                    if parent:
+                        os.makedirs(parent, exist_ok=True)
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write("".join(ln + "\n" for ln in merged))
+            except Exception:
+                pass
+        self.pending.clear()
 
-    lower = (line or "").lower()
-    tag_result = extract_youtube_tag_from_line(line)
-    if tag_result is not None:
-        if "members-only" in lower:
-            _append_line_safe(members_path, tag_result)
-        if "sign in to confirm your age" in lower or "age-restricted" in lower:
-            _append_line_safe(age_path, tag_result)
-
-def _append_line_safe(path: str, text: str):
-    try:
-        parent = os.path.dirname(path)
-        if parent and not os.path.exists(parent):
-            os.makedirs(parent, exist_ok=True)
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(text + "\n")
-    except Exception:
-        pass
-        
 def extract_youtube_tag_from_line(line: str) -> Optional[str]:
     if line is None:
         return None
@@ -101,34 +390,6 @@ def extract_youtube_tag_from_line(line: str) -> Optional[str]:
     result = "".join(cleaned)
     return result
 
-def enqueue_lines(stream, q: queue.Queue, tag: str):
-    try:
-        for line in iter(stream.readline, ""):
-            if line == "":
-                break
-            q.put((tag, line))
-    finally:
-        stream.close()
-        
-def dedupe_file(path):
-    try:
-        if not os.path.isfile(path):
-            return
-        with open(path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        seen = set()
-        out_lines = []
-        for ln in lines:
-            key = ln.rstrip("\n")
-            if key not in seen:
-                seen.add(key)
-                out_lines.append(ln if ln.endswith("\n") else ln + "\n")
-        new_content = "".join(out_lines)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(new_content)
-    except Exception:
-        pass
-        
 def build_basic_cmd(resolution, force_ipvx) -> list[str]:
     yt_dlp_exe = os.path.join(".", "yt-dlp.exe")
     if not os.path.isfile(yt_dlp_exe):
@@ -164,70 +425,108 @@ def build_basic_cmd(resolution, force_ipvx) -> list[str]:
         "--remux-video", "mp4",
         "-t", "sleep",
         "--compat-options", "no-live-chat",
-        "--retries", "30"
+        "--retries", str(RETRIES),
+        "--newline",
     ]
     return cmd
         
-def download_single(url: str, resolution: str = "4K", force_ipvx = None) -> int:
-    cmd = build_basic_cmd(resolution, force_ipvx)
-
-    cmd += [
-        "--no-playlist",
-        "-o", fr".\download\%(title.0:50)s_[%(id)s].%(ext)s",
-        url,
-    ]
-
-    print_cmd(cmd)
-
+async def run_process_async(cmd: list[str], output: JobOutput) -> int:
     try:
-        proc = subprocess.Popen(
-            cmd,
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=subprocess.DEVNULL,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
+            limit=STREAM_LIMIT,
         )
     except FileNotFoundError:
-        print(f"ERROR: yt-dlp executable not found: {yt_dlp_exe}", file=sys.stderr)
+        print(f"ERROR: yt-dlp executable not found: {cmd[0]}", file=sys.stderr)
         return 1
     except Exception as e:
         print(f"ERROR: failed to start yt-dlp: {e}", file=sys.stderr)
         return 1
 
-    q: queue.Queue = queue.Queue()
-    t_out = threading.Thread(target=enqueue_lines, args=(proc.stdout, q, "stdout"), daemon=True)
-    t_err = threading.Thread(target=enqueue_lines, args=(proc.stderr, q, "stderr"), daemon=True)
-    t_out.start()
-    t_err.start()
+    async def pump(stream, tag):
+        while True:
+            raw = await stream.readline()
+            if not raw:
+                break
+            output.handle(tag, raw.decode(OUTPUT_ENCODING, errors="replace"))
 
     try:
-        while True:
-            try:
-                tag, line = q.get(timeout=0.1)
-            except queue.Empty:
-                if proc.poll() is not None:
-                    while not q.empty():
-                        tag, line = q.get_nowait()
-                        _handle_line(tag, line, None, None)
-                    break
-                continue
-            _handle_line(tag, line, None, None)
-    except KeyboardInterrupt:
+        await asyncio.gather(pump(proc.stdout, "stdout"), pump(proc.stderr, "stderr"))
+        return await proc.wait()
+    except asyncio.CancelledError:
         try:
             proc.terminate()
         except Exception:
             pass
         try:
-            proc.wait(timeout=5)
+            await asyncio.wait_for(proc.wait(), 5)
         except Exception:
             pass
+        raise
+    finally:
+        await asyncio.to_thread(output.flush)
+
+def _run_sync(coro) -> int:
+    try:
+        return asyncio.run(coro)
+    except KeyboardInterrupt:
         return 1
 
-    retcode = proc.wait()
-    return retcode
+def download_single(url: str, resolution: str = "4K", force_ipvx = None) -> int:
+    cmd = build_basic_cmd(resolution, force_ipvx)
 
-        
-def download_batch(archive_path: str, url: str, resolution: str = "720P", append_mode: bool = False, force_ipvx = None) -> int:
+    cmd += [
+        "--no-playlist",
+        "-o", fr".\download\%(title.0:50)s_[%(id)s].%(ext)s",
+        url,
+    ]
+
+    print_cmd(cmd)
+    telemetry = DownloadTelemetry(None, "single", telemetry_context(resolution, force_ipvx))
+    return _run_sync(run_process_async(cmd, JobOutput(telemetry=telemetry)))
+
+def job_archive_path(archive_path: str, url: str) -> str:
+    """Private archive file for one job, next to the channel archive."""
+    tab = urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1] or "url"
+    return os.path.join(os.path.dirname(archive_path), f".{os.path.basename(archive_path)}.{tab}.job")
+
+def _read_archive_records(path: str) -> list[tuple[str, str]]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return [r for r in map(download_archive.parse_line, f) if r]
+
+def seed_job_archive(archive_path: str, job_path: str, channel: str) -> None:
+    index = get_archive_index()
+    with _archive_lock:
+        if index is None:
+            shutil.copyfile(archive_path, job_path)
+            return
+        # archive.txt stays authoritative for hand edits; the index is the shared copy.
+        index.import_text(archive_path, channel)
+        index.export_text(job_path, channel)
+
+def merge_job_archive(archive_path: str, job_path: str, channel: str) -> int:
+    """Record the IDs the job downloaded in the index and the channel archive; returns how many were new."""
+    if not os.path.isfile(job_path):
+        return 0
+    index = get_archive_index()
+    with _archive_lock:
+        known = set(_read_archive_records(archive_path))
+        new = [r for r in dict.fromkeys(_read_archive_records(job_path)) if r not in known]
+        if index is not None:
+            index.add_many(new, channel)
+        if new:
+            with open(archive_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{e} {v}\n" for e, v in new))
+        os.remove(job_path)
+    return len(new)
+
+def telemetry_context(resolution: str, force_ipvx) -> dict:
+    return {"resolution": resolution, "ip": force_ipvx or "auto", "retries_setting": RETRIES}
+
+async def download_batch_async(archive_path: str, url: str, resolution: str = "720P", append_mode: bool = False, force_ipvx = None, prefix: str = "", job_tag: Optional[str] = None) -> int:
     if not os.path.isfile(archive_path):
         print(f"ERROR: archive file does not exist: {archive_path}", file=sys.stderr)
         return 1
@@ -245,114 +544,155 @@ def download_batch(archive_path: str, url: str, resolution: str = "720P", append
     tmp_channel_dir = os.path.join(".", "download", channel_name)
     os.makedirs(tmp_channel_dir, exist_ok=True)
 
+    # Each job writes its own copy of the archive, so concurrent jobs of one
+    # channel never append to the same file; new IDs are merged back afterwards.
+    job_path = job_archive_path(archive_path, url)
+    # Archive seeding and merging block on disk and SQLite; keep them off the loop that pumps every job's output.
+    await asyncio.to_thread(seed_job_archive, archive_path, job_path, channel_name)
+
     cmd = build_basic_cmd(resolution, force_ipvx)
-    
+
     if append_mode:
         cmd += ["--break-on-existing"]
-    
+
     cmd += [
-        "--download-archive", archive_path,
+        "--download-archive", job_path,
         "-o", fr".\download\{channel_name}\%(title.0:50)s_[%(id)s].%(ext)s",
         url
     ]
-    
-    print_cmd(cmd)
 
-    try:
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-        )
-    except FileNotFoundError:
-        print(f"ERROR: yt-dlp executable not found: {yt_dlp_exe}", file=sys.stderr)
-        return 1
-    except Exception as e:
-        print(f"ERROR: failed to start yt-dlp: {e}", file=sys.stderr)
-        return 1
-
-    q: queue.Queue = queue.Queue()
-    t_out = threading.Thread(target=enqueue_lines, args=(proc.stdout, q, "stdout"), daemon=True)
-    t_err = threading.Thread(target=enqueue_lines, args=(proc.stderr, q, "stderr"), daemon=True)
-    t_out.start()
-    t_err.start()
+    print_cmd(cmd)
 
     members_path = os.path.join(parent_dir, "members-only.txt")
     age_path = os.path.join(parent_dir, "age-restricted.txt")
 
     try:
-        while True:
-            try:
-                tag, line = q.get(timeout=0.1)
-            except queue.Empty:
-                if proc.poll() is not None:
-                    while not q.empty():
-                        tag, line = q.get_nowait()
-                        _handle_line(tag, line, members_path, age_path)
-                    break
-                continue
-            _handle_line(tag, line, members_path, age_path)
-    except KeyboardInterrupt:
-        try:
-            proc.terminate()
-        except Exception:
-            pass
+        telemetry = DownloadTelemetry(channel_name, job_tag or url, telemetry_context(resolution, force_ipvx))
+        return await run_process_async(cmd, JobOutput(prefix, members_path, age_path, telemetry))
+    finally:
+        await asyncio.to_thread(merge_job_archive, archive_path, job_path, channel_name)
+
+def download_batch(archive_path: str, url: str, resolution: str = "720P", append_mode: bool = False, force_ipvx = None, prefix: str = "") -> int:
+    return _run_sync(download_batch_async(archive_path, url, resolution, append_mode, force_ipvx, prefix))
+
+class Job:
+    def __init__(self, tag: str, url: str, archive_path: str):
+        self.tag = tag
+        self.url = url
+        self.archive_path = archive_path
+        self.host = (urlsplit(url).hostname or "").lower().removeprefix("www.")
+        self.retcode: Optional[int] = None
+        self.seconds = 0.0
+
+def channel_jobs(cid: str, archive_path: str, shorts: bool = True, streams: bool = True) -> list[Job]:
+    tabs = [t for t in CHANNEL_TABS if (t != "shorts" or shorts) and (t != "streams" or streams)]
+    return [Job(f"{cid}/{t}", f"https://youtube.com/@{cid}/{t}", archive_path) for t in tabs]
+
+async def run_jobs_async(jobs: list[Job], resolution: str, append_mode: bool, force_ipvx, max_jobs: int = DEFAULT_JOBS,
+                         per_host: int = DEFAULT_PER_HOST, tagged: bool = True) -> int:
+    """Run jobs with at most max_jobs yt-dlp processes overall and per_host against one host."""
+    async def run(job: Job) -> Job:
+        started = time.monotonic()
         try:
-            proc.wait(timeout=5)
-        except Exception:
-            pass
-        dedupe_file(members_path)
-        dedupe_file(age_path)
-        return 1
-
-    retcode = proc.wait()
-    dedupe_file(members_path)
-    dedupe_file(age_path)
-    return retcode
-
+            job.retcode = await download_batch_async(job.archive_path, job.url, resolution, append_mode, force_ipvx,
+                                                     prefix=f"[{job.tag}] " if tagged else "", job_tag=job.tag)
+        finally:
+            job.seconds = time.monotonic() - started
+        return job
+
+    pending = deque(jobs)
+    running: dict[asyncio.Task, Job] = {}
+    host_running: Counter = Counter()
+    final_ret = 0
+
+    def fill():
+        for _ in range(len(pending)):
+            if len(running) >= max_jobs:
+                break
+            job = pending.popleft()
+            if host_running[job.host] >= per_host:
+                pending.append(job)
+                continue
+            host_running[job.host] += 1
+            running[asyncio.ensure_future(run(job))] = job
+
+    fill()
+    while running:
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            job = running.pop(task)
+            host_running[job.host] -= 1
+            try:
+                task.result()
+            except Exception as e:
+                print(f"ERROR: job {job.tag} crashed: {e}", file=sys.stderr)
+                job.retcode = 1
+            if job.retcode != 0:
+                final_ret = job.retcode
+        fill()
+
+    if len(jobs) > 1:
+        print("\n=== Jobs ===")
+        for job in jobs:
+            print(f"{job.tag:<40} exit {job.retcode} in {job.seconds:.0f}s")
+    return final_ret
+
+def run_jobs(jobs: list[Job], resolution: str, append_mode: bool, force_ipvx, max_jobs: int = DEFAULT_JOBS,
+             per_host: int = DEFAULT_PER_HOST, tagged: bool = True) -> int:
+    return _run_sync(run_jobs_async(jobs, resolution, append_mode, force_ipvx, max_jobs, per_host, tagged))
+
+def resolve_archive(cid: str, archive: Optional[str], archive_root: str, multiple: bool) -> str:
+    if archive and not multiple:
+        return os.path.abspath(archive)
+    path = os.path.abspath(os.path.join(archive_root, cid, "archive.txt"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        open(path, "a", encoding="utf-8").close()
+    return path
 
 def main(argv):
     p = argparse.ArgumentParser(prog="yt-dlp.py")
     p.add_argument("--resolution", "-r", choices=["4K", "1080P", "720P", "480P", "360P"], help='Video resolution (default 720P)')
     p.add_argument("--archive", help='Path to archive.txt (download archive)')
+    p.add_argument("--archive-root", default=".", help='With several --id values: channel archives live in ARCHIVE_ROOT/<id>/archive.txt')
     group = p.add_mutually_exclusive_group(required=True)
     group.add_argument("--url", help='URL to download')
-    group.add_argument("--id", help='Channel ID without \'@\' (will be expanded to three URLs)')
+    group.add_argument("--id", nargs="+", help='Channel ID(s) without \'@\' (each expanded to three URLs)')
     group.add_argument("--single", help='Single URL download; if set, other args are ignored')
     p.add_argument("--append", "-a", action="store_true", help='If set, add --break-on-existing to yt-dlp')
     p.add_argument("--no-shorts", dest="shorts", action="store_false", default=True, help="Include /shorts when expanding a channel (default: true).")
     p.add_argument("--no-streams", dest="streams", action="store_false", default=True, help="Include /streams when expanding a channel (default: true).")
+    p.add_argument("--jobs", "-j", type=int, default=DEFAULT_JOBS, help=f"yt-dlp processes to run at once (default {DEFAULT_JOBS})")
+    p.add_argument("--archive-db", default=None, help='Shared SQLite archive index (default: $YT_DLP_ARCHIVE_DB or ~/.yt-dlp-archive.sqlite; "" disables it)')
+    p.add_argument("--telemetry", default=DEFAULT_TELEMETRY, help=f'Per-video telemetry JSONL file (default {DEFAULT_TELEMETRY}; "" disables it)')
+    p.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST, help=f"Concurrent yt-dlp processes per host (default {DEFAULT_PER_HOST})")
     ip_group = p.add_mutually_exclusive_group()
     ip_group.add_argument("-4", dest="ipv", action="store_const", const="-4", help="Force IPv4 when downloading.")
     ip_group.add_argument("-6", dest="ipv", action="store_const", const="-6", help="Force IPv6 when downloading.")
 
     args = p.parse_args(argv)
+    global archive_db_path, telemetry_path
+    archive_db_path = args.archive_db
+    telemetry_path = args.telemetry
     resolution = args.resolution if args.resolution is not None else "720P"
-    
-    if args.single:
-        return download_single(args.single, resolution)
-        
-    archive_path = os.path.abspath(args.archive) if args.archive else None
-    append_mode = args.append
-    
-    if args.url:
-        return download_batch(archive_path=archive_path, url=args.url, resolution=resolution, append_mode=append_mode, force_ipvx=args.ipv)
-    else:
-        cid = args.id
-        urls = [f"https://youtube.com/@{cid}/videos"]
-        if args.shorts:
-            urls.append(f"https://youtube.com/@{cid}/shorts")
-        if args.streams:
-            urls.append(f"https://youtube.com/@{cid}/streams")
-
-        final_ret = 0
-        for u in urls:
-            ret = download_batch(archive_path=archive_path, url=u, resolution=resolution, append_mode=append_mode, force_ipvx=args.ipv)
-            if ret != 0:
-                final_ret = ret
-        return final_ret
+
+    try:
+        if args.single:
+            return download_single(args.single, resolution)
+
+        archive_path = os.path.abspath(args.archive) if args.archive else None
+        append_mode = args.append
+
+        if args.url:
+            return download_batch(archive_path=archive_path, url=args.url, resolution=resolution, append_mode=append_mode, force_ipvx=args.ipv)
+        else:
+            multiple = len(args.id) > 1
+            jobs = []
+            for cid in args.id:
+                jobs += channel_jobs(cid, resolve_archive(cid, args.archive, args.archive_root, multiple), args.shorts, args.streams)
+            return run_jobs(jobs, resolution, append_mode, args.ipv, max(1, args.jobs), max(1, args.per_host))
+    finally:
+        print_telemetry_summary(_telemetry_records)
 
 if __name__ == "__main__":
     exit_code = main(sys.argv[1:])